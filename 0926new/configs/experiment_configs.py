@@ -27,6 +27,22 @@ class BaseConfig:
     CHANNEL_BANDWIDTH_MHz = 500.0  # チャネル帯域幅 (MHz)
     SYSTEM_NOISE_TEMPERATURE_K = 150.0 # システム雑音温度 (K)
 
+    # 確率的なチャネル（None: 自由空間損失だけの決定的なリンク容量, "stochastic": フェージングと降雨減衰を加える）
+    CHANNEL_MODEL = None
+    CHANNEL_SEED = None                # チャネルの乱数シード（Noneなら環境のシードを使う）
+    FADING_RICE_K_dB = 10.0            # ライスフェージングのKファクタ (dB)
+    FADING_COHERENCE_STEPS = 5.0       # フェージングの相関が1/eになるステップ数
+    RAIN_PROBABILITY = 0.05            # 降雨のある時間の割合
+    RAIN_ATTENUATION_MEDIAN_dB = 3.0   # 降雨時の減衰量の中央値 (dB)
+    RAIN_ATTENUATION_SIGMA = 1.0       # 降雨時の減衰量の対数のばらつき
+    RAIN_CORRELATION_STEPS = 500.0     # 降雨の相関が1/eになるステップ数
+
+    # トラフィッククラス（None: 1クラス。タプルなら到着パケットが各クラスになる割合で、番号の小さいクラスほど優先）
+    TRAFFIC_CLASS_SHARES = None
+    TRAFFIC_CLASS_BUFFER_LIMITS = None # クラスごとのバッファのパケット数の上限（Noneなら全体の上限だけ）
+    CLASS_SCHEDULING = "strict"        # 帯域幅のクラスへの割り当て（"strict": 完全優先, "wfq": 重み付き公平）
+    TRAFFIC_CLASS_WEIGHTS = None       # "wfq"の重み（Noneなら全クラス同じ）
+
 # class ConfigA(BaseConfig):
 #     """
 #     設定セットA: 標準的なテストシナリオ
@@ -65,7 +81,12 @@ class DqnTrainConfig(BaseConfig):
     BUFFER_PACKET_LIMIT = 20000
     BUFFER_BYTE_LIMIT = 100
 
-
+    # DQNの行動の種類（"packet": パケットごとに選ぶ, "macro": ステップごとに転送規則を選ぶ）
+    ACTION_MODE = "packet"
+    # 状態に加える、将来の帯域幅の予報のステップ数（0なら加えない）
+    STATE_FORECAST_HORIZON = 0
+    # 残り帯域幅への詰め込み（None: しない, "best_fit", "knapsack"）
+    PACKING_MODE = None
 
     # --- DQN専用ハイパーパラメータ ---
     HIDDEN_LAYER_SIZES = [128, 128]
@@ -76,4 +97,42 @@ class DqnTrainConfig(BaseConfig):
     EPSILON_START = 0.9
     EPSILON_END = 0.05
     EPSILON_DECAY = 20000
-    TARGET_UPDATE_FREQUENCY = 15
\ No newline at end of file
+    TARGET_UPDATE_FREQUENCY = 15
+    # Noneでなければ、TARGET_UPDATE_FREQUENCYごとに写す代わりに、学習ごとにこの割合だけ近づける
+    TARGET_UPDATE_TAU = None
+    DOUBLE_DQN = False     # 次の状態の行動をpolicy_netで選び、target_netで評価する
+    DUELING_DQN = False    # Qネットワークの出力を状態価値とアドバンテージに分ける
+    N_STEP_RETURNS = 1     # nステップ分の報酬をまとめてから学習する
+
+    # --- ヒューリスティック戦略の遷移による事前学習 ---
+    OFFLINE_DATASET_PATH = None    # データセットのフォルダ（Noneなら事前学習しない。無ければ最小TTL優先で作る）
+    OFFLINE_DATASET_STEPS = 20000  # データセットを作るときのシミュレーションのステップ数
+    PRETRAIN_MODE = "bc"           # "bc": 行動クローニング, "td": データセットの遷移でのオフラインTD学習
+    PRETRAIN_UPDATES = 2000        # 事前学習の更新回数
+    OFFLINE_REPLAY_SIZE = None     # リプレイバッファに入れておく遷移の数（Noneなら容量まで）
+    PRETRAIN_EPSILON_START = 0.2   # 事前学習した後のεの初期値
+
+class NetworkConfig(BaseConfig):
+    """
+    複数のGEO・LEO衛星からなるネットワーク（SatelliteNetworkEnv）用の設定。
+    各ノードが個別のバッファを持ち、パケットはLEOで発生してGEOまでホップごとに転送される。
+    """
+    NAME = "Satellite Network Config"
+
+    SIMULATION_STEPS = 10000
+
+    # ネットワーク構成
+    NUM_GEO_SATELLITES = 2       # 赤道上に等間隔で配置するGEO衛星の数（宛先）
+    NUM_LEO_ORBITS = 8           # LEOの軌道面の数（軌道傾斜角を等間隔にずらす）
+    NUM_LEOS_PER_ORBIT = 24      # 1軌道あたりのLEO衛星の数（同じ軌道の隣同士がISLで接続）
+
+    # 環境パラメータ（ノードごと）
+    MAX_PACKETS_PER_STEP = 3     # 1ステップあたりに各LEOで発生する最大パケット数
+    BUFFER_PACKET_LIMIT = 50
+    BUFFER_BYTE_LIMIT = 300
+    PACKET_TTL_RANGE = (5, 20)
+
+    # リンク容量 [Mbps] を1ステップに送れるデータ量に換算する係数
+    LINK_CAPACITY_SCALE = 0.015
+    # この値（換算後）未満の容量しかないリンクは使わない
+    MIN_LINK_CAPACITY = 5
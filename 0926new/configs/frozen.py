@@ -0,0 +1,169 @@
+import math
+from collections import namedtuple
+
+# 設定の値から一度だけ計算しておく定数（リンクモデルと状態の正規化で毎回計算していたもの）
+DerivedConstants = namedtuple('DerivedConstants', (
+    'r_geo_km',               # GEO衛星の軌道半径
+    'r_leo_km',               # LEO衛星の軌道半径
+    'frequency_db',           # FSPLの周波数の項 20*log10(周波数[Hz])
+    'power_and_gains_dbw',    # 送信電力[dBW] + 送信アンテナ利得 + 受信アンテナ利得
+    'channel_bandwidth_hz',   # チャネル帯域幅 [Hz]
+    'noise_power_w',          # ノイズ電力 N [W]
+    'initial_bandwidth',      # 環境のリセット時の帯域幅（MAX_BANDWIDTH、なければBANDWIDTH_CENTER、なければ100）
+    'max_ttl',                # 状態のTTLの正規化に使う最大TTL
+    'max_size',               # 状態のサイズの正規化に使う最大サイズ
+))
+
+BOLTZMANN_CONSTANT = 1.38e-23
+
+# どの設定にも必要な項目（名前, 種類, 条件の説明, 条件）
+_REQUIRED_FIELDS = (
+    ("SIMULATION_STEPS", int, "1以上", lambda v: v >= 1),
+    ("PACKET_SIZE_RANGE", tuple, "1 <= 最小 <= 最大", lambda v: len(v) == 2 and 1 <= v[0] <= v[1]),
+    ("PACKET_TTL_RANGE", tuple, "1 <= 最小 <= 最大", lambda v: len(v) == 2 and 1 <= v[0] <= v[1]),
+    ("MAX_PACKETS_PER_STEP", int, "0以上", lambda v: v >= 0),
+    ("BUFFER_PACKET_LIMIT", int, "1以上", lambda v: v >= 1),
+    ("BUFFER_BYTE_LIMIT", int, "1以上", lambda v: v >= 1),
+    ("EARTH_RADIUS_KM", (int, float), "正", lambda v: v > 0),
+    ("GEO_ALTITUDE_KM", (int, float), "正", lambda v: v > 0),
+    ("LEO_ALTITUDE_KM", (int, float), "正", lambda v: v > 0),
+    ("LEO_ORBITAL_PERIOD_STEPS", (int, float), "正", lambda v: v > 0),
+    ("TRANSMIT_POWER_W", (int, float), "正", lambda v: v > 0),
+    ("TRANSMIT_ANTENNA_GAIN_dBi", (int, float), "数値", lambda v: True),
+    ("RECEIVE_ANTENNA_GAIN_dBi", (int, float), "数値", lambda v: True),
+    ("FREQUENCY_GHz", (int, float), "正", lambda v: v > 0),
+    ("CHANNEL_BANDWIDTH_MHz", (int, float), "正", lambda v: v > 0),
+    ("SYSTEM_NOISE_TEMPERATURE_K", (int, float), "正", lambda v: v > 0),
+)
+
+# 衛星ネットワーク（SatelliteNetworkEnv）だけで必要な項目（書き方は_REQUIRED_FIELDSと同じ）
+NETWORK_REQUIRED_FIELDS = (
+    ("NUM_GEO_SATELLITES", int, "1以上", lambda v: v >= 1),
+    ("NUM_LEO_ORBITS", int, "1以上", lambda v: v >= 1),
+    ("NUM_LEOS_PER_ORBIT", int, "1以上", lambda v: v >= 1),
+)
+
+
+def _setting_names(config):
+    """設定クラス・インスタンスの項目名（大文字で始まる名前で、メソッドでないもの。FREQUENCY_GHzなども含む）"""
+    return [name for name in dir(config) if name[:1].isupper() and not callable(getattr(config, name))]
+
+
+def _frozen_value(value):
+    """リストや辞書を、書き換えられずハッシュできる形（タプル）に直す"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_frozen_value(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _frozen_value(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_frozen_value(v) for v in value)
+    return value
+
+
+class FrozenConfig:
+    """
+    設定クラス（またはそのインスタンス）の項目を写し取った、書き換えられない設定。
+    作るときに必須の項目を検査し、リンクモデルなどで使う派生定数をderivedに一度だけ計算しておく。
+    項目は普通の属性として読めるので（config.SIMULATION_STEPS, getattr(config, 'X', 既定値)）、
+    設定クラスの代わりにそのまま渡せる。ハッシュでき、pickleで別プロセスにも渡せる。
+    直接作らず、freeze()を使う。
+    """
+    def __init__(self, values):
+        errors = _validate(values)
+        if errors:
+            raise ValueError("設定が不正です: " + "; ".join(errors))
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, "_values", values)
+        object.__setattr__(self, "_hash", hash(tuple(sorted(values.items()))))
+        object.__setattr__(self, "derived", _derive(self))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"設定は書き換えられません（freeze(config, {name}=...)で作り直してください）: {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"設定は書き換えられません: {name}")
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, FrozenConfig):
+            return NotImplemented
+        return self._values == other._values
+
+    def __reduce__(self):
+        # 派生定数は受け取った側で計算し直す
+        return (FrozenConfig, (self._values,))
+
+    def __repr__(self):
+        return f"FrozenConfig({getattr(self, 'NAME', '?')!r})"
+
+    def replace(self, **overrides):
+        """一部の項目だけを変えた新しい設定を返す"""
+        return freeze(self, **overrides)
+
+
+def freeze(config, **overrides):
+    """
+    設定クラス・インスタンス（またはFrozenConfig）から、overridesで一部の項目を変えたFrozenConfigを作る。
+    既にFrozenConfigで変更もなければ、そのまま返す。
+
+    Raises:
+        ValueError: 必須の項目が無い、または値が条件を満たさない場合
+    """
+    if isinstance(config, FrozenConfig) and not overrides:
+        return config
+    values = {name: _frozen_value(getattr(config, name)) for name in _setting_names(config)}
+    for name, value in overrides.items():
+        values[name] = _frozen_value(value)
+    return FrozenConfig(values)
+
+
+def derived_constants(config):
+    """FrozenConfigなら保存済みの派生定数を、普通の設定クラスならその場で計算した派生定数を返す"""
+    derived = getattr(config, 'derived', None)
+    return derived if isinstance(derived, DerivedConstants) else _derive(config)
+
+
+def require_fields(config, fields):
+    """
+    FrozenConfigに、環境ごとに必要な項目（NETWORK_REQUIRED_FIELDSなど）があるかを検査する。
+
+    Raises:
+        ValueError: 項目が無い、または値が条件を満たさない場合
+    """
+    errors = _validate(config._values, fields)
+    if errors:
+        raise ValueError("設定が不正です: " + "; ".join(errors))
+
+
+def _validate(values, fields=_REQUIRED_FIELDS):
+    """必須の項目を検査し、問題の説明のリストを返す"""
+    errors = []
+    for name, kind, condition, check in fields:
+        if name not in values:
+            errors.append(f"{name}がありません")
+            continue
+        value = values[name]
+        if isinstance(value, bool) or not isinstance(value, kind):
+            errors.append(f"{name}の型が不正です: {value!r}")
+        elif not check(value):
+            errors.append(f"{name}は{condition}である必要があります: {value!r}")
+    return errors
+
+
+def _derive(config):
+    """設定の値から派生定数を計算する（calculate_shannon_capacityと同じ順序の演算で、結果が一致する）"""
+    return DerivedConstants(
+        r_geo_km=config.GEO_ALTITUDE_KM + config.EARTH_RADIUS_KM,
+        r_leo_km=config.LEO_ALTITUDE_KM + config.EARTH_RADIUS_KM,
+        frequency_db=20 * math.log10(config.FREQUENCY_GHz * 1e9),
+        power_and_gains_dbw=(10 * math.log10(config.TRANSMIT_POWER_W) + config.TRANSMIT_ANTENNA_GAIN_dBi
+                             + config.RECEIVE_ANTENNA_GAIN_dBi),
+        channel_bandwidth_hz=config.CHANNEL_BANDWIDTH_MHz * 1e6,
+        noise_power_w=BOLTZMANN_CONSTANT * config.SYSTEM_NOISE_TEMPERATURE_K * (config.CHANNEL_BANDWIDTH_MHz * 1e6),
+        initial_bandwidth=getattr(config, 'MAX_BANDWIDTH', getattr(config, 'BANDWIDTH_CENTER', 100)),
+        max_ttl=config.PACKET_TTL_RANGE[1],
+        max_size=config.PACKET_SIZE_RANGE[1],
+    )
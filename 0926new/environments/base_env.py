@@ -20,11 +20,11 @@ class BaseEnv(ABC):
         pass
 
     @abstractmethod
-    def reset(self):
+    def reset(self, seed=None, options=None):
         """
-        環境を初期状態にリセットする。
+        環境を初期状態にリセットする（Gymnasiumと同じ形式）。
         Returns:
-            最初の状態(state)
+            (state, dict): 最初の状態, 統計情報
         """
         pass
 
@@ -60,4 +60,14 @@ class BaseEnv(ABC):
         """
         現在の環境の状態を、エージェントが理解できる形式で返す。
         """
-        pass
\ No newline at end of file
+        pass
+
+    # 実装は任意
+    def step(self, action):
+        """
+        行動を1つ受け取り、転送と時間の経過をまとめて処理する（Gymnasiumと同じ形式）。
+
+        Returns:
+            (state, float, bool, bool, dict): 次の状態, 報酬, 終了フラグ, 打ち切りフラグ, 統計情報
+        """
+        raise NotImplementedError
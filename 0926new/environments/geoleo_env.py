@@ -1,108 +1,507 @@
 import math
 import random
-from collections import deque
+from collections import namedtuple
 import numpy as np
 
 # 同じフォルダにあるbase_envからBaseEnvをインポート
 from .base_env import BaseEnv
-# utilsフォルダから、分離したリンク容量の計算関数をインポート
-from utils.link_models import calculate_shannon_capacity
+# パケットは列ごとの配列で持つバッファに格納する
+from .packet_buffer import DataPacket, PacketBuffer
+# リンク容量はステップだけで決まるので、utilsのリンクモデルで前もって表にしておく
+from utils.capacity_table import CapacityTable
+from utils.channel_models import channel_capacity_fn
+from utils.class_scheduling import make_class_scheduler
+from configs.frozen import freeze
+from utils.event_trace import EVENT_ARRIVE, EVENT_DROP, EVENT_EXPIRE, EVENT_TRANSMIT
+from utils.packing import PACKING_MODES, pack_residual, top_ranked
 
-class DataPacket:
-    """
-    シミュレーション内で扱われる個々のデータパケットの情報。
-    このファイル内で閉じて使うため、ここに定義する。
-    """
-    def __init__(self, packet_id, size, ttl):
-        self.id = packet_id
-        self.size = size
-        self.ttl = ttl
-    def __repr__(self):
-        return f"P(id:{self.id},size:{self.size},ttl:{self.ttl})"
+# snapshot()で保存する環境の状態（バッファは (5, パケット数) の配列、乱数は random.Random.getstate() の値、
+# scheduler_stateはクラスのスケジューラが持ち越す状態）
+EnvSnapshot = namedtuple('EnvSnapshot', ('buffer', 'packet_id_counter', 'current_step',
+                                         'remaining_bandwidth', 'rng_state', 'scheduler_state'))
+
+# トラフィッククラスごとに数える統計情報
+CLASS_STAT_KEYS = ("generated", "transmitted", "expired", "dropped")
 
 class GeoLeoEnv(BaseEnv):
     """
     GEO-LEO衛星間のリンク容量変動をモデル化した具体的なシミュレーション環境。
     """
-    def __init__(self, config):
+    # step()で受け付ける行動の種類
+    #   packet: 行動 = 転送するパケットの位置。帯域幅が残っている間は同じステップ内で次の行動を待つ
+    #   macro : 行動 = macro_rulesの番号。選んだ規則でそのステップの転送をまとめて行い、時間を進める
+    ACTION_MODES = ("packet", "macro")
+
+    def __init__(self, config, tracer=None, action_mode=None, macro_rules=None, seed=None):
+        """
+        Args:
+            config: 実験設定オブジェクト（検査して固定したFrozenConfigにしてから使う）
+            tracer: パケットのイベントを記録するPacketEventTracer（省略時は記録しない）
+            action_mode (str): step()の行動の種類（省略時はconfig.ACTION_MODE、なければ"packet"）
+            macro_rules (list): macroモードで選べる規則（score_packets()を持つ戦略）。
+                省略時はdefault_macro_rules(config)
+            seed: パケット到着の乱数シード（省略時はランダム）。
+                乱数はこの環境専用のrandom.Randomで、他の環境やグローバルなrandomとは独立。
+                config.CHANNEL_MODELで確率的なチャネルを選んだ場合は、チャネルの系列もこのシードで決まる
+        """
+        config = freeze(config)
         self.config = config
-        self.buffer = deque()
+        self.tracer = tracer
+        self.rng = random.Random(seed)
+        # 確率的なチャネルなら、フェージング・降雨減衰の系列も前もって表にまとめておく
+        self.capacity_table = CapacityTable(config, config.SIMULATION_STEPS,
+                                            capacity_fn=channel_capacity_fn(config, seed))
+        # 設定すると、優先順に送って入らなくなった後の残り帯域幅に、入るパケットを詰め込む
+        self.packing_mode = getattr(config, 'PACKING_MODE', None)
+        if self.packing_mode is not None and self.packing_mode not in PACKING_MODES:
+            raise ValueError(f"未知のPACKING_MODE: {self.packing_mode}")
+        self.action_mode = action_mode or getattr(config, 'ACTION_MODE', 'packet')
+        if self.action_mode not in self.ACTION_MODES:
+            raise ValueError(f"未知のaction_mode: {self.action_mode}")
+        if self.action_mode == "macro":
+            self.macro_rules = macro_rules if macro_rules is not None else default_macro_rules(config)
+            self.num_actions = len(self.macro_rules)
+        else:
+            self.macro_rules = None
+            self.num_actions = config.BUFFER_PACKET_LIMIT
+        self._init_traffic_classes(config)
+        self.buffer = PacketBuffer(num_classes=self.num_classes)
         self.packet_id_counter = 0
+        self.current_step = 0
         
-        # 初期帯域幅を設定（configに最大値があればそれ、なければ中心値）
-        self.remaining_bandwidth = getattr(config, 'MAX_BANDWIDTH', getattr(config, 'BANDWIDTH_CENTER', 100))
+        # 初期帯域幅を設定（configに最大値があればそれ、なければ中心値。設定の派生定数）
+        self.remaining_bandwidth = config.derived.initial_bandwidth
+
+    def _init_traffic_classes(self, config):
+        """
+        トラフィッククラスの設定を読む（config.TRAFFIC_CLASS_SHARESがNoneなら1クラス）。
+            TRAFFIC_CLASS_SHARES: 到着パケットが各クラスになる割合（番号の小さいクラスほど優先度が高い）
+            TRAFFIC_CLASS_BUFFER_LIMITS: クラスごとのバッファのパケット数の上限（Noneなら全体の上限だけ）
+            CLASS_SCHEDULING: 帯域幅のクラスへの割り当て（"strict"または"wfq"、重みはTRAFFIC_CLASS_WEIGHTS）
+        """
+        shares = getattr(config, 'TRAFFIC_CLASS_SHARES', None)
+        if shares is not None and (len(shares) == 0 or min(shares) < 0 or sum(shares) <= 0):
+            raise ValueError(f"TRAFFIC_CLASS_SHARESは正の割合のタプルである必要があります: {shares}")
+        self.num_classes = len(shares) if shares is not None else 1
+        self.class_cum_shares = tuple(np.cumsum(shares).tolist()) if self.num_classes > 1 else None
+        self.class_buffer_limits = getattr(config, 'TRAFFIC_CLASS_BUFFER_LIMITS', None)
+        if self.class_buffer_limits is not None and len(self.class_buffer_limits) != self.num_classes:
+            raise ValueError(f"TRAFFIC_CLASS_BUFFER_LIMITSはクラスごとに指定する必要があります: "
+                             f"{self.class_buffer_limits}")
+        self.class_scheduler = make_class_scheduler(config, self.num_classes)
+        self.class_stats = self._empty_class_stats()
+
+    def _empty_class_stats(self):
+        """クラスごとの統計情報（CLASS_STAT_KEYSごとのクラス数の配列）。1クラスならNone"""
+        if self.num_classes <= 1:
+            return None
+        return {key: np.zeros(self.num_classes, dtype=np.int64) for key in CLASS_STAT_KEYS}
 
-    def reset(self):
-        """環境を初期状態にリセットする"""
+    def reset(self, seed=None, options=None):
+        """
+        環境を初期状態にリセットし、最初に行動を選ぶ時点（帯域幅があり、バッファにパケットがあるステップ）
+        まで時間を進める。
+
+        Args:
+            seed (int): 指定すると、パケット到着の乱数を初期化する
+            options: 未使用（Gymnasiumとの互換のため）
+
+        Returns:
+            (np.ndarray, dict): 最初の状態, それまでのステップの統計情報
+        """
+        if seed is not None:
+            self.rng.seed(seed)
         self.buffer.clear()
         self.packet_id_counter = 0
+        self.current_step = 0
+        self.class_scheduler = make_class_scheduler(self.config, self.num_classes)
+        self.class_stats = self._empty_class_stats()
 
         # リセット時も初期帯域幅を設定
-        self.remaining_bandwidth = getattr(self.config, 'MAX_BANDWIDTH', getattr(self.config, 'BANDWIDTH_CENTER', 100))
-        return self.get_state()
+        self.remaining_bandwidth = self.config.derived.initial_bandwidth
+
+        _, info = self.update_time(current_step=0)
+        info["transmitted"] = 0
+        self._advance_to_decision(info)
+        return self.get_state(), info
+
+    def step(self, action, priority=None):
+        """
+        行動を1つ受け取り、転送と時間の経過をまとめて処理する（Gymnasiumと同じ形式）。
+        ステップの転送が終わったら、次に行動を選ぶ時点まで時間を進めてから返す。
+
+        Args:
+            action (int): packetモードなら転送するパケットの位置、macroモードなら規則の番号
+            priority: packetモードでPACKING_MODEが設定されているとき、残り帯域幅に詰め込む順の優先度を
+                返す関数（戦略のpacket_priorities()）。省略時はバッファの前にあるほど優先
+
+        Returns:
+            (np.ndarray, float, bool, bool, dict):
+                次の状態, 報酬, 終了フラグ（常にFalse）, 打ち切りフラグ（SIMULATION_STEPSに達したらTrue）,
+                統計情報（transmitted, generated, expired, dropped）
+        """
+        if self.action_mode == "macro":
+            rule = self.macro_rules[action]
+            reward, transmitted = self.transmit_ranked(rule.score_packets(*self.packet_columns()))
+            step_done = True
+        else:
+            reward, transmitted, success = self.transmit_packet(action)
+            step_done = not success or self.remaining_bandwidth <= 0 or not self.buffer
+            if step_done:
+                packed = self.fill_residual(priority)
+                reward += 10 * packed
+                transmitted += packed
+
+        info = {"transmitted": transmitted, "generated": 0, "expired": 0, "dropped": 0}
+        truncated = False
+        if step_done:
+            time_reward, truncated = self._advance_to_decision(info, force=True)
+            reward += time_reward
+        return self.get_state(), reward, False, truncated, info
+
+    def _advance_to_decision(self, info, force=False):
+        """
+        行動を選ぶ必要のあるステップになるまで時間を進め、統計情報をinfoに足し込む。
+        force=Trueなら、今のステップで転送できる状態でも少なくとも1ステップ進める。
+
+        Returns:
+            (float, bool): 時間経過による報酬, シミュレーションの最後まで達したか
+        """
+        reward = 0
+        while force or self.remaining_bandwidth <= 0 or not self.buffer:
+            force = False
+            if self.current_step + 1 >= self.config.SIMULATION_STEPS:
+                return reward, True
+            time_reward, time_stats = self.update_time(current_step=self.current_step + 1)
+            reward += time_reward
+            for key in time_stats:
+                info[key] += time_stats[key]
+        return reward, False
 
     def update_time(self, current_step):
         """時間が1ステップ進んだ際の、環境の自動的な変化を処理する"""
         generated_count, expired_count, dropped_count = 0, 0, 0
         expired_reward = 0
+        self.current_step = current_step
+        tracer = self.tracer
 
         # --- 帯域幅の計算 ---
-        # 複雑な計算は外部のlink_models.pyに委任
-        current_bandwidth = calculate_shannon_capacity(current_step, self.config)
-        self.remaining_bandwidth = int(current_bandwidth)
+        # 複雑な計算は外部のlink_models.pyに委任し、その結果を前もって計算した表から引く
+        self.remaining_bandwidth = self.capacity_table[current_step]
 
         # --- パケット到着とTTL減少 ---
         # 1. 新しいパケットの到着
-        num_new_packets = random.randint(0, self.config.MAX_PACKETS_PER_STEP)
+        buffer = self.buffer
+        rng = self.rng
+        class_stats = self.class_stats
+        class_limits = self.class_buffer_limits
+        traffic_class = 0
+        num_new_packets = rng.randint(0, self.config.MAX_PACKETS_PER_STEP)
         for _ in range(num_new_packets):
-            size = random.randint(*self.config.PACKET_SIZE_RANGE)
-            ttl = random.randint(*self.config.PACKET_TTL_RANGE)
-            new_packet = DataPacket(self.packet_id_counter, size, ttl)
+            size = rng.randint(*self.config.PACKET_SIZE_RANGE)
+            ttl = rng.randint(*self.config.PACKET_TTL_RANGE)
+            if class_stats is not None:
+                # クラスは複数あるときだけ引く（1クラスなら乱数列はクラスの無い場合と同じ）
+                traffic_class = rng.choices(range(self.num_classes), cum_weights=self.class_cum_shares)[0]
+                class_stats["generated"][traffic_class] += 1
+            packet_id = self.packet_id_counter
             self.packet_id_counter += 1
             generated_count += 1
 
-            # 現在のバッファ内の合計サイズを計算
-            current_buffer_load = sum(p.size for p in self.buffer)
+            # パケット数と合計サイズの両方の上限をチェック（合計サイズはバッファが増減のたびに更新している）
+            if (len(buffer) < self.config.BUFFER_PACKET_LIMIT and
+                buffer.total_size + size <= self.config.BUFFER_BYTE_LIMIT and
+                (class_limits is None or buffer.class_count(traffic_class) < class_limits[traffic_class])):
 
-            # パケット数と合計サイズの両方の上限をチェック
-            if (len(self.buffer) < self.config.BUFFER_PACKET_LIMIT and
-                current_buffer_load + new_packet.size <= self.config.BUFFER_BYTE_LIMIT):
-                
-                self.buffer.append(new_packet) # 条件を満たせば追加
+                # 条件を満たせば追加（クラスの区間の末尾に入る）
+                position = buffer.append(packet_id, size, ttl, current_step, traffic_class)
+                if tracer is not None:
+                    tracer.record(current_step, packet_id, EVENT_ARRIVE, position, size, ttl)
             else:
-                dropped_count += 1 # どちらかの上限に達していれば破棄
-        
-        # 2. TTLの減少と期限切れの確認
-        for packet in list(self.buffer):
-            packet.ttl -= 1
-            if packet.ttl <= 0:
-                self.buffer.remove(packet)
-                expired_count += 1
-        
+                dropped_count += 1 # どれかの上限に達していれば破棄
+                if class_stats is not None:
+                    class_stats["dropped"][traffic_class] += 1
+                if tracer is not None:
+                    tracer.record(current_step, packet_id, EVENT_DROP, -1, size, ttl)
+
+        # 2. TTLの減少と期限切れの確認（全パケット分を配列演算でまとめて処理）
+        ttls = buffer.ttl
+        ttls -= 1
+        expired = ttls <= 0
+        expired_count = int(np.count_nonzero(expired))
+        if expired_count:
+            if tracer is not None:
+                positions = np.flatnonzero(expired)
+                tracer.record_many(current_step, buffer.id[positions], EVENT_EXPIRE, positions,
+                                   buffer.size[positions], ttls[positions])
+            if class_stats is not None:
+                class_stats["expired"] += np.bincount(buffer.traffic_class[expired], minlength=self.num_classes)
+            buffer.keep(~expired)
+
         expired_reward -= expired_count * 100
         
         stats = {"generated": generated_count, "expired": expired_count, "dropped": dropped_count}
         return expired_reward, stats
 
     def transmit_packet(self, action):
-        """エージェントから受け取ったactionを処理する"""
-        if action is None or not (0 <= action < len(self.buffer)):
+        """
+        エージェントから受け取ったactionを処理する。
+        トラフィッククラスが複数あるときは、action_range()（スケジューラが選んだクラス）の中のパケットだけを受け付ける。
+        """
+        start, end = self.action_range()
+        if action is None or not (start <= action < end):
             return -20, 0, False # 罰則, 転送数, 成功フラグ
         
         packet_to_send = self.buffer[action]
         if packet_to_send.size <= self.remaining_bandwidth:
+            if self.class_scheduler is not None:
+                self.class_scheduler.charge(self.buffer, packet_to_send.traffic_class, packet_to_send.size)
+                self.class_stats["transmitted"][packet_to_send.traffic_class] += 1
             self.remaining_bandwidth -= packet_to_send.size
-            self.buffer.remove(packet_to_send)
+            self.buffer.remove_at(action)
+            if self.tracer is not None:
+                self.tracer.record(self.current_step, packet_to_send.id, EVENT_TRANSMIT,
+                                   action, packet_to_send.size, packet_to_send.ttl)
             return 10, 1, True # 報酬, 転送数, 成功フラグ
         else:
             return -5, 0, False # 罰則, 転送数, 成功フラグ
 
+    def action_range(self):
+        """
+        select_action()で選んでよいパケットの位置の区間 (開始位置, 終了位置+1)。
+        1クラスならバッファ全体、複数のクラスがあればクラスのスケジューラ（CLASS_SCHEDULING）が
+        次に送るクラスの区間（パケットはクラス順に並んでいる）。
+        """
+        if self.class_scheduler is None:
+            return 0, len(self.buffer)
+        traffic_class = self.class_scheduler.serving_class(self.buffer)
+        return self.buffer.class_range(traffic_class) if traffic_class >= 0 else (0, 0)
+
+    # --- 状態の保存・復元と複製（先読みするスケジューラ用） ---
+    def snapshot(self):
+        """
+        環境の状態（バッファ・カウンタ・帯域幅・乱数・クラスのスケジューラの状態）を
+        小さな配列とタプルにまとめて返す。restore()に渡すと、この時点の状態に戻せる。
+        クラスごとの統計情報は含めない（先読みで状態を戻しても、数えた統計はそのまま）。
+        """
+        scheduler_state = self.class_scheduler.get_state() if self.class_scheduler is not None else None
+        return EnvSnapshot(self.buffer.snapshot(), self.packet_id_counter, self.current_step,
+                           self.remaining_bandwidth, self.rng.getstate(), scheduler_state)
+
+    def restore(self, snapshot):
+        """snapshot()で保存した状態に戻す"""
+        self.buffer.restore(snapshot.buffer)
+        self.packet_id_counter = snapshot.packet_id_counter
+        self.current_step = snapshot.current_step
+        self.remaining_bandwidth = snapshot.remaining_bandwidth
+        self.rng.setstate(snapshot.rng_state)
+        if self.class_scheduler is not None:
+            self.class_scheduler.set_state(snapshot.scheduler_state)
+
+    def clone(self, seed=None):
+        """
+        同じ状態を持つ独立した環境を返す。設定・転送規則は共有し、トレースは記録しない。
+
+        Args:
+            seed: 指定すると、複製の乱数をこのシードで初期化し直す
+                （省略時は元の環境と同じ乱数列、つまり同じ未来の到着系列になる）
+        """
+        env = GeoLeoEnv.__new__(GeoLeoEnv)
+        env.__dict__.update(self.__dict__)
+        env.tracer = None
+        env.buffer = self.buffer.copy()
+        if self.class_scheduler is not None:
+            env.class_scheduler = self.class_scheduler.copy()
+            env.class_stats = {key: counts.copy() for key, counts in self.class_stats.items()}
+        # random.Random()はOSの乱数で初期化する分だけ遅いので、初期化を省いて状態を直接設定する
+        env.rng = random.Random.__new__(random.Random)
+        if seed is None:
+            env.rng.setstate(self.rng.getstate())
+        else:
+            env.rng.seed(seed)
+        return env
+
+    # --- 将来のリンク容量 ---
+    def capacity_forecast(self, horizon):
+        """
+        現在のステップからhorizonステップ分の帯域幅（各ステップの開始時の値）を返す。
+        事前計算した表の読み取り専用ビューなので、コピーもリンクモデルの計算も発生しない。
+        """
+        return self.capacity_table.window(self.current_step, horizon)
+
+    def capacity_before_expiry(self, ttls=None):
+        """
+        残りTTLがttlsのパケットが期限切れになるまでに使える帯域幅の合計
+        （このステップの残り帯域幅 + 次のステップからTTL-1ステップ分の帯域幅）を返す。
+
+        Args:
+            ttls (np.ndarray): 残りTTLの配列（省略時はバッファ内の全パケット）
+        """
+        if ttls is None:
+            ttls = self.buffer.ttl
+        start = self.current_step + 1
+        return self.remaining_bandwidth + self.capacity_table.total(start, start + np.asarray(ttls) - 1)
+
+    def deadline_slack(self):
+        """
+        バッファ内の各パケットについて、締切（TTL）が早い順に送った場合の余裕を返す。
+        余裕 = 期限切れまでに使える帯域幅 - そのパケット以前に締切が来るパケットの合計サイズ。
+        負のパケットがあれば、どんな順番で送っても（ステップ内の詰め込みを理想化しても）
+        その締切までのパケットの一部は間に合わない。
+        """
+        ttls = self.buffer.ttl
+        order = np.argsort(ttls, kind="stable")
+        sorted_ttls = ttls[order]
+        cum_size = np.cumsum(self.buffer.size[order])
+        # 同じTTLのパケットは締切も同じなので、そのTTLまでの合計サイズを全員の需要とする
+        demand = cum_size[np.searchsorted(sorted_ttls, ttls, side="right") - 1]
+        return self.capacity_before_expiry(ttls) - demand
+
+    def deadline_feasible(self):
+        """バッファ内の各パケットが、締切順に送れば締切に間に合う見込みがあるかの真偽値配列"""
+        return self.deadline_slack() >= 0
+
+    def packet_columns(self):
+        """
+        バッファ内の全パケットの (サイズ, TTL, 待ち時間) を配列で返す。
+        戦略のscore_packets()にそのまま渡せる形（並び順はバッファ内の位置と同じ）。
+        """
+        buffer = self.buffer
+        return buffer.size, buffer.ttl, self.current_step - buffer.arrival
+
+    def transmit_ranked(self, scores):
+        """
+        スコアの大きい順にパケットを転送する。同じスコアならバッファの前にあるものを先に送る。
+        select_action()でスコア最大のパケットを1つずつ選んでtransmit_packet()を繰り返すのと同じ結果
+        （帯域幅に収まらないパケットに当たったらそこで止める）を、1回の部分ソートで求める。
+        PACKING_MODEが設定されていれば、止まった後の残り帯域幅にもスコア順を保って詰め込む。
+
+        Args:
+            scores (np.ndarray): バッファ内の各パケットのスコア（packet_columns()と同じ並び）
+
+        Returns:
+            (float, int): 報酬の合計, 転送数
+        """
+        buffer = self.buffer
+        if not buffer or self.remaining_bandwidth <= 0:
+            return 0, 0
+        scores = np.asarray(scores)
+        if self.class_scheduler is not None:
+            return self._transmit_by_class(scores)
+
+        # 送れるパケット数は「帯域幅 ÷ 最小サイズ」以下なので、その1つ先までの順位が分かれば十分
+        sizes = buffer.size
+        limit = min(len(buffer), self.remaining_bandwidth // int(sizes.min()) + 1)
+        order = top_ranked(scores, limit)
+
+        # 優先順に並べたサイズの累積和が帯域幅に収まる所までを送る
+        cum_size = np.cumsum(sizes[order])
+        num_sent = int(np.searchsorted(cum_size, self.remaining_bandwidth, side="right"))
+        sent = order[:num_sent]
+        if num_sent:
+            self.remaining_bandwidth -= int(cum_size[num_sent - 1])
+
+        if self.packing_mode is not None and num_sent < len(buffer) and self.remaining_bandwidth > 0:
+            available = np.ones(len(buffer), dtype=bool)
+            available[sent] = False
+            packed = pack_residual(sizes, scores, available, self.remaining_bandwidth, self.packing_mode)
+            self.remaining_bandwidth -= int(sizes[packed].sum())
+            sent = np.concatenate([sent, packed])
+
+        return self._finish_ranked(sent)
+
+    def _transmit_by_class(self, scores):
+        """
+        トラフィッククラスが複数あるときのtransmit_ranked()。帯域幅のクラスへの割り当ては
+        CLASS_SCHEDULINGのスケジューラが決め、クラスの中はスコアの順に送る。
+        PACKING_MODEが設定されていれば、残り帯域幅にクラスを問わずスコア順を保って詰め込む。
+        """
+        buffer = self.buffer
+        sizes = buffer.size
+        sent = self.class_scheduler.select(buffer, scores, self.remaining_bandwidth)
+        self.remaining_bandwidth -= int(sizes[sent].sum())
+        if self.packing_mode is not None and len(sent) < len(buffer) and self.remaining_bandwidth > 0:
+            available = np.ones(len(buffer), dtype=bool)
+            available[sent] = False
+            packed = pack_residual(sizes, scores, available, self.remaining_bandwidth, self.packing_mode)
+            self.remaining_bandwidth -= int(sizes[packed].sum())
+            sent = np.concatenate([sent, packed])
+        return self._finish_ranked(sent)
+
+    def _finish_ranked(self, sent):
+        """transmit_ranked()で選んだパケットを送り、(報酬, 転送数) を返す"""
+        reward = 10 * len(sent)
+        if len(sent) < len(self.buffer) and self.remaining_bandwidth > 0:
+            reward -= 5 # 帯域幅に収まらないパケットを選んだ分の罰則
+        self._remove_sent(sent)
+        return reward, len(sent)
+
+    def fill_residual(self, priority=None):
+        """
+        PACKING_MODEが設定されていれば、このステップの残り帯域幅に入るパケットを詰め込んで送る。
+        select_action()で1つずつ送る戦略が、入らないパケットを選んで止まった後に使う。
+        詰め込む順を戦略の優先度にそろえれば、transmit_ranked()で送った場合と同じパケットが送られる。
+
+        Args:
+            priority: 詰め込む順の優先度を返す関数（envを受け取り、バッファ内の各パケットのスコアを返す。
+                戦略のpacket_priorities()）。詰め込むときだけ呼ぶ。省略時、または関数がNoneを返したときは
+                バッファの前にあるほど優先
+
+        Returns:
+            int: 転送数
+        """
+        buffer = self.buffer
+        if self.packing_mode is None or not buffer or self.remaining_bandwidth <= 0:
+            return 0
+        sizes = buffer.size
+        scores = priority(self) if priority is not None else None
+        packed = pack_residual(sizes, scores, np.ones(len(buffer), dtype=bool),
+                               self.remaining_bandwidth, self.packing_mode)
+        self.remaining_bandwidth -= int(sizes[packed].sum())
+        self._remove_sent(packed)
+        return len(packed)
+
+    def _remove_sent(self, sent):
+        """送ったパケット（送った順の位置の配列）をバッファから取り除き、トレースに記録する"""
+        if len(sent) == 0:
+            return
+        buffer = self.buffer
+        if self.tracer is not None:
+            # 1つずつ送った場合の位置（先に送ったパケットの分だけ前に詰まる）を記録する
+            earlier = np.tril(sent[None, :] < sent[:, None], k=-1).sum(axis=1)
+            self.tracer.record_many(self.current_step, buffer.id[sent], EVENT_TRANSMIT,
+                                    sent - earlier, buffer.size[sent], buffer.ttl[sent])
+        if self.class_stats is not None:
+            self.class_stats["transmitted"] += np.bincount(buffer.traffic_class[sent], minlength=self.num_classes)
+        keep = np.ones(len(buffer), dtype=bool)
+        keep[sent] = False
+        buffer.keep(keep)
+
     def get_state(self):
         """現在の環境の状態を、エージェントが理解できる形式で返す"""
-        state = np.zeros((self.config.BUFFER_PACKET_LIMIT, 2), dtype=np.float32)
-        for i, packet in enumerate(self.buffer):
-            if i >= self.config.BUFFER_PACKET_LIMIT: break
-            # TTLとサイズを正規化して状態表現とする
-            state[i, 0] = packet.ttl / self.config.PACKET_TTL_RANGE[1]
-            state[i, 1] = packet.size / self.config.PACKET_SIZE_RANGE[1]
-        return state.flatten()
\ No newline at end of file
+        config = self.config
+        state = np.zeros((config.BUFFER_PACKET_LIMIT, 2), dtype=np.float32)
+        n = min(len(self.buffer), config.BUFFER_PACKET_LIMIT)
+        # TTLとサイズを正規化して状態表現とする（正規化の最大値は設定の派生定数）
+        state[:n, 0] = self.buffer.ttl[:n] / config.derived.max_ttl
+        state[:n, 1] = self.buffer.size[:n] / config.derived.max_size
+        horizon = getattr(config, 'STATE_FORECAST_HORIZON', 0)
+        if horizon:
+            # 将来の帯域幅を、表の最大値で正規化して状態の末尾に加える
+            forecast = self.capacity_forecast(horizon) / self.capacity_table.peak
+            return np.concatenate([state.flatten(), forecast.astype(np.float32)])
+        return state.flatten()
+
+
+def state_size(config):
+    """get_state()が返す状態の次元数（パケットごとの(TTL, サイズ) + 帯域幅の予報）"""
+    return config.BUFFER_PACKET_LIMIT * 2 + getattr(config, 'STATE_FORECAST_HORIZON', 0)
+
+
+def default_macro_rules(config):
+    """macroモードで選べる規則の既定値（FIFO・最小TTL優先・最小サイズ優先・価値密度優先）"""
+    # strategiesはenvironmentsを参照するので、循環しないよう使う時に読み込む
+    from strategies.simple_strategies import (
+        FifoStrategy, ShortestTtlFirstStrategy, SmallestSizeFirstStrategy, ValueDensityStrategy)
+    return [FifoStrategy(config), ShortestTtlFirstStrategy(config),
+            SmallestSizeFirstStrategy(config), ValueDensityStrategy(config)]
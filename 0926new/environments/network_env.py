@@ -0,0 +1,362 @@
+import math
+import numpy as np
+
+from .geoleo_env import GeoLeoEnv
+from .packet_buffer import PacketBuffer
+from configs.frozen import NETWORK_REQUIRED_FIELDS, freeze, require_fields
+from utils.link_models import shannon_capacity_from_distance
+
+
+class _NodeView:
+    """
+    既存の戦略（select_action）を1ノード分のスケジューラとして使うための、
+    GeoLeoEnv互換の窓口。buffer・remaining_bandwidth・current_step・get_state()・packet_columns()・
+    action_range()だけを持つ。
+    """
+    get_state = GeoLeoEnv.get_state
+    packet_columns = GeoLeoEnv.packet_columns
+
+    def __init__(self, config):
+        self.config = config
+        self.buffer = PacketBuffer()
+        self.remaining_bandwidth = 0
+        self.current_step = 0
+
+    def action_range(self):
+        """ノードのバッファは1クラスなので、全てのパケットから選べる"""
+        return 0, len(self.buffer)
+
+
+class SatelliteNetworkEnv:
+    """
+    複数のGEO・LEO衛星からなるネットワークのシミュレーション環境。
+    各ノードは個別のバッファを持ち、パケットはLEOで発生して、
+    リンク容量から決まる経路に沿ってGEO（宛先）までホップごとに転送される。
+
+    パケットはノードごとのdequeではなく、全ノード分をまとめた配列（ノード番号・サイズ・TTLなど）で持つ。
+    到着・TTL減少・経路計算・転送を全ノード・全リンクについて配列演算で一度に処理するため、
+    数百ノード × 数万ステップでも現実的な時間で終わる。
+    """
+    def __init__(self, config, scheduler_class, seed=None, router=None):
+        """
+        Args:
+            config: NetworkConfigなどの設定オブジェクト
+            scheduler_class: 各ノードで使う転送戦略のクラス（全ノード共通、ノードごとに独立に適用）
+            seed (int): パケット到着の乱数シード
+            router (ContactGraphRouter): 指定すると、毎ステップの幾何計算と経路計算の代わりに
+                コンタクトプランから作った経路表を引いて次ホップと送信レートを決める。
+                経路表はシミュレーションする全ステップをカバーしていること
+        """
+        # 設定は検査して固定し、派生定数（軌道半径・ノイズ電力など）を一度だけ計算しておく
+        config = freeze(config)
+        require_fields(config, NETWORK_REQUIRED_FIELDS)
+        self.config = config
+        self.scheduler = scheduler_class(config)
+        self.seed = seed
+        self.router = router
+
+        # --- ノードの構成 ---
+        # ノード番号 0 ~ G-1 がGEO、G ~ G+L-1 がLEO（軌道面ごとに連番）
+        self.num_geo = config.NUM_GEO_SATELLITES
+        num_orbits = config.NUM_LEO_ORBITS
+        per_orbit = config.NUM_LEOS_PER_ORBIT
+        self.num_leo = num_orbits * per_orbit
+        self.num_nodes = self.num_geo + self.num_leo
+        self.is_geo = np.arange(self.num_nodes) < self.num_geo
+        self.leo_nodes = np.arange(self.num_geo, self.num_nodes)
+
+        # GEO衛星は赤道面上に等間隔で静止していると仮定
+        r_geo = config.derived.r_geo_km
+        geo_angles = 2 * math.pi * np.arange(self.num_geo) / self.num_geo
+        self.geo_positions = np.stack(
+            [r_geo * np.cos(geo_angles), r_geo * np.sin(geo_angles), np.zeros(self.num_geo)], axis=1)
+
+        # LEO衛星の軌道要素（軌道傾斜角と、軌道上の初期位相）
+        orbit = np.repeat(np.arange(num_orbits), per_orbit)
+        slot = np.tile(np.arange(per_orbit), num_orbits)
+        self.leo_inclination = math.pi * orbit / num_orbits
+        self.leo_phase = 2 * math.pi * (slot + orbit / num_orbits) / per_orbit
+        self.r_leo = config.derived.r_leo_km
+
+        # --- リンク（有向） ---
+        # 各LEO → 各GEO と、同じ軌道で隣り合うLEO同士（前後両方向）
+        leo_src = np.repeat(self.leo_nodes, self.num_geo)
+        geo_dst = np.tile(np.arange(self.num_geo), self.num_leo)
+        ring_next = self.num_geo + orbit * per_orbit + (slot + 1) % per_orbit
+        ring_prev = self.num_geo + orbit * per_orbit + (slot - 1) % per_orbit
+        self.link_src = np.concatenate([leo_src, self.leo_nodes, self.leo_nodes])
+        self.link_dst = np.concatenate([geo_dst, ring_next, ring_prev])
+
+        self.reset()
+
+    def reset(self):
+        """環境を初期状態にリセットする"""
+        self.rng = np.random.default_rng(self.seed)
+        # 全ノードのパケットを1組の配列で持つ（1要素 = 1パケット）
+        self.packet_node = np.zeros(0, dtype=np.int64)    # 現在いるノード
+        self.packet_size = np.zeros(0, dtype=np.int64)
+        self.packet_ttl = np.zeros(0, dtype=np.int64)
+        self.packet_seq = np.zeros(0, dtype=np.int64)     # 現在のノードに到着した順番（FIFO用）
+        self.packet_arrival = np.zeros(0, dtype=np.int64) # 現在のノードに到着したステップ
+        self.packet_id = np.zeros(0, dtype=np.int64)
+        self.packet_birth = np.zeros(0, dtype=np.int64)   # 発生したステップ
+        self.packet_id_counter = 0
+        self.seq_counter = 0
+
+    # --- 軌道とリンク容量 ---
+    def node_positions(self, current_step):
+        """
+        全ノードの3次元座標 (km) を返す。
+        current_stepが整数なら (ノード数, 3)、ステップの配列なら (ステップ数, ノード数, 3) の配列。
+        """
+        steps = np.asarray(current_step, dtype=np.float64)
+        theta = 2 * math.pi * steps[..., None] / self.config.LEO_ORBITAL_PERIOD_STEPS + self.leo_phase
+        leo_positions = np.stack([
+            self.r_leo * np.cos(theta),
+            self.r_leo * np.sin(theta) * np.cos(self.leo_inclination),
+            self.r_leo * np.sin(theta) * np.sin(self.leo_inclination),
+        ], axis=-1)
+        geo_positions = np.broadcast_to(self.geo_positions, steps.shape + self.geo_positions.shape)
+        return np.concatenate([geo_positions, leo_positions], axis=-2)
+
+    def link_capacities(self, current_step):
+        """
+        全リンクの容量（1ステップに送れるデータ量）を計算する。
+        2衛星を結ぶ線分が地球に遮られるリンクの容量は0とする。
+        current_stepにステップの配列を渡すと、(ステップ数, リンク数) の配列をまとめて返す。
+        """
+        positions = self.node_positions(current_step)
+        p = positions[..., self.link_src, :]
+        q = positions[..., self.link_dst, :]
+        d = q - p
+        distance_km = np.linalg.norm(d, axis=-1)
+
+        # 線分上で地球の中心に最も近い点までの距離が地球半径より小さければ見通し外
+        u = np.clip(-np.einsum("...ij,...ij->...i", p, d) / distance_km**2, 0.0, 1.0)
+        closest = np.linalg.norm(p + u[..., None] * d, axis=-1)
+        visible = closest > self.config.EARTH_RADIUS_KM
+
+        capacity = shannon_capacity_from_distance(distance_km, self.config)
+        capacity *= getattr(self.config, 'LINK_CAPACITY_SCALE', 1.0)
+        return np.where(visible, capacity, 0.0).astype(np.int64)
+
+    def compute_routes(self, capacities):
+        """
+        各ノードの次ホップを決める。GEOまでのホップ数が最小になる経路のうち、
+        最初のリンクの容量が最も大きいものを選ぶ（ホップ数は配列化したBellman-Ford法で計算）。
+
+        Returns:
+            (np.ndarray, np.ndarray): 各ノードの次ホップ（なければ-1）, そのリンクの容量
+        """
+        usable = capacities >= getattr(self.config, 'MIN_LINK_CAPACITY', 1)
+        src, dst = self.link_src[usable], self.link_dst[usable]
+        link_capacity = capacities[usable]
+
+        hops = np.where(self.is_geo, 0.0, np.inf)
+        for _ in range(self.num_nodes):
+            new_hops = hops.copy()
+            np.minimum.at(new_hops, src, hops[dst] + 1)
+            if np.array_equal(new_hops, hops):
+                break
+            hops = new_hops
+
+        # 最短経路上のリンクのうち、送信元ごとに容量最大のものを1本選ぶ
+        on_path = np.isfinite(hops[src]) & (hops[dst] + 1 == hops[src])
+        candidates = np.flatnonzero(on_path)
+        candidates = candidates[np.lexsort((-link_capacity[candidates], src[candidates]))]
+        _, first = np.unique(src[candidates], return_index=True)
+        chosen = candidates[first]
+
+        next_hop = np.full(self.num_nodes, -1, dtype=np.int64)
+        hop_capacity = np.zeros(self.num_nodes, dtype=np.int64)
+        next_hop[src[chosen]] = dst[chosen]
+        hop_capacity[src[chosen]] = link_capacity[chosen]
+        return next_hop, hop_capacity
+
+    # --- バッファ操作 ---
+    def _admit(self, nodes, sizes):
+        """
+        各ノードのバッファ上限（パケット数・合計サイズ）を満たす分だけ受け入れる。
+        同じノードに複数届いた場合は、配列の先頭から順に収まる分までを受け入れる。
+
+        Returns:
+            np.ndarray: 受け入れるかどうかの真偽値配列（nodesと同じ順番）
+        """
+        count = np.bincount(self.packet_node, minlength=self.num_nodes)
+        load = np.bincount(self.packet_node, weights=self.packet_size, minlength=self.num_nodes)
+
+        order = np.argsort(nodes, kind="stable")
+        sorted_nodes = nodes[order]
+        sorted_sizes = sizes[order]
+        rank, cum_size = _group_rank_and_cumsum(sorted_nodes, sorted_sizes)
+
+        fits = ((count[sorted_nodes] + rank + 1 <= self.config.BUFFER_PACKET_LIMIT) &
+                (load[sorted_nodes] + cum_size <= self.config.BUFFER_BYTE_LIMIT))
+        accepted = np.empty(len(nodes), dtype=bool)
+        accepted[order] = fits
+        return accepted
+
+    def _append(self, nodes, sizes, ttls, ids, births, current_step):
+        """受け入れたパケットをバッファ（配列）の末尾に追加する"""
+        n = len(nodes)
+        seqs = np.arange(self.seq_counter, self.seq_counter + n)
+        self.seq_counter += n
+        self.packet_node = np.concatenate([self.packet_node, nodes])
+        self.packet_size = np.concatenate([self.packet_size, sizes])
+        self.packet_ttl = np.concatenate([self.packet_ttl, ttls])
+        self.packet_seq = np.concatenate([self.packet_seq, seqs])
+        self.packet_arrival = np.concatenate([self.packet_arrival, np.full(n, current_step)])
+        self.packet_id = np.concatenate([self.packet_id, ids])
+        self.packet_birth = np.concatenate([self.packet_birth, births])
+
+    def _keep(self, mask):
+        """maskがTrueのパケットだけを残す"""
+        self.packet_node = self.packet_node[mask]
+        self.packet_size = self.packet_size[mask]
+        self.packet_ttl = self.packet_ttl[mask]
+        self.packet_seq = self.packet_seq[mask]
+        self.packet_arrival = self.packet_arrival[mask]
+        self.packet_id = self.packet_id[mask]
+        self.packet_birth = self.packet_birth[mask]
+
+    # --- 転送するパケットの選択 ---
+    def _select_transmissions(self, next_hop, hop_capacity, current_step):
+        """
+        各ノードで、次ホップのリンク容量に収まる分だけ転送するパケットを選ぶ。
+        戦略がscore_packets()を実装していれば、全ノード分のスコアを一度に計算し、
+        (ノード, スコアの降順, 到着順) のソートで全ノードの転送順をまとめて決める。
+        それ以外の戦略は各ノードでselect_action()を繰り返し呼ぶ。
+
+        Returns:
+            np.ndarray: 転送するかどうかの真偽値配列
+        """
+        scores = self.scheduler.score_packets(self.packet_size, self.packet_ttl,
+                                              current_step - self.packet_arrival)
+        if scores is None:
+            return self._select_with_strategy(next_hop, hop_capacity, current_step)
+
+        # ノードごとに優先順で並べ、先頭から容量に収まる分だけ送る
+        order = np.lexsort((self.packet_seq, -np.asarray(scores), self.packet_node))
+        sorted_nodes = self.packet_node[order]
+        _, cum_size = _group_rank_and_cumsum(sorted_nodes, self.packet_size[order])
+        send_sorted = (next_hop[sorted_nodes] >= 0) & (cum_size <= hop_capacity[sorted_nodes])
+        send = np.empty(len(order), dtype=bool)
+        send[order] = send_sorted
+        return send
+
+    def _select_with_strategy(self, next_hop, hop_capacity, current_step):
+        """各ノードのバッファをGEO互換の窓口に詰め替え、戦略のselect_action()で選ぶ"""
+        send = np.zeros(len(self.packet_node), dtype=bool)
+        view = _NodeView(self.config)
+        view.current_step = current_step
+        order = np.lexsort((self.packet_seq, self.packet_node))
+        sorted_nodes = self.packet_node[order]
+        boundaries = np.flatnonzero(np.diff(sorted_nodes)) + 1
+        for indices in np.split(order, boundaries):
+            if len(indices) == 0:
+                continue
+            node = self.packet_node[indices[0]]
+            if next_hop[node] < 0:
+                continue
+            view.buffer.clear()
+            view.buffer.extend(self.packet_id[indices], self.packet_size[indices],
+                               self.packet_ttl[indices], self.packet_arrival[indices])
+            view.remaining_bandwidth = int(hop_capacity[node])
+            positions = list(indices)
+            while view.remaining_bandwidth > 0 and view.buffer:
+                action = self.scheduler.select_action(view)
+                if action is None or not (0 <= action < len(view.buffer)):
+                    break
+                packet = view.buffer[action]
+                if packet.size > view.remaining_bandwidth:
+                    break
+                view.remaining_bandwidth -= packet.size
+                del view.buffer[action]
+                send[positions.pop(action)] = True
+        return send
+
+    # --- 1ステップの処理 ---
+    def advance(self, current_step):
+        """
+        時間を1ステップ進め、パケット到着・TTL減少・経路計算・転送を全ノードについて処理する。
+
+        Returns:
+            dict: このステップの統計情報
+                (generated, dropped, expired, forwarded, delivered, delivered_latency)
+        """
+        config = self.config
+
+        # 1. 各LEOで新しいパケットが発生
+        counts = self.rng.integers(0, config.MAX_PACKETS_PER_STEP + 1, size=self.num_leo)
+        num_new = int(counts.sum())
+        nodes = np.repeat(self.leo_nodes, counts)
+        sizes = self.rng.integers(config.PACKET_SIZE_RANGE[0], config.PACKET_SIZE_RANGE[1] + 1, size=num_new)
+        ttls = self.rng.integers(config.PACKET_TTL_RANGE[0], config.PACKET_TTL_RANGE[1] + 1, size=num_new)
+        ids = np.arange(self.packet_id_counter, self.packet_id_counter + num_new)
+        self.packet_id_counter += num_new
+
+        accepted = self._admit(nodes, sizes)
+        self._append(nodes[accepted], sizes[accepted], ttls[accepted], ids[accepted],
+                     np.full(int(accepted.sum()), current_step), current_step)
+        dropped = num_new - int(accepted.sum())
+
+        # 2. TTLの減少と期限切れの確認
+        self.packet_ttl -= 1
+        alive = self.packet_ttl > 0
+        expired = len(alive) - int(alive.sum())
+        self._keep(alive)
+
+        # 3. リンク容量と経路の計算（経路表があれば表引きだけで済ませる）
+        if self.router is not None:
+            next_hop, hop_capacity = self.router.next_hops(current_step)
+        else:
+            next_hop, hop_capacity = self.compute_routes(self.link_capacities(current_step))
+
+        # 4. 転送するパケットを選び、GEOに届いたものは配送完了、それ以外は次ホップのバッファへ
+        send = self._select_transmissions(next_hop, hop_capacity, current_step)
+        destination = next_hop[self.packet_node[send]]
+        delivered_mask = self.is_geo[destination]
+        delivered = int(delivered_mask.sum())
+        delivered_latency = int((current_step - self.packet_birth[send][delivered_mask]).sum())
+
+        relay = ~delivered_mask
+        relay_nodes = destination[relay]
+        relay_sizes = self.packet_size[send][relay]
+        relay_ttls = self.packet_ttl[send][relay]
+        relay_ids = self.packet_id[send][relay]
+        relay_births = self.packet_birth[send][relay]
+        self._keep(~send)
+
+        accepted = self._admit(relay_nodes, relay_sizes)
+        self._append(relay_nodes[accepted], relay_sizes[accepted], relay_ttls[accepted],
+                     relay_ids[accepted], relay_births[accepted], current_step)
+        dropped += len(relay_nodes) - int(accepted.sum())
+
+        return {
+            "generated": num_new, "dropped": dropped, "expired": expired,
+            "forwarded": int(send.sum()), "delivered": delivered,
+            "delivered_latency": delivered_latency,
+        }
+
+    def buffer_occupancy(self):
+        """各ノードのバッファ内パケット数を返す"""
+        return np.bincount(self.packet_node, minlength=self.num_nodes)
+
+
+def _group_rank_and_cumsum(groups, values):
+    """
+    ソート済みのグループ番号の配列について、グループ内での順位と累積和を返す。
+    例: groups=[0,0,1,1,1], values=[2,3,1,1,1] → rank=[0,1,0,1,2], cumsum=[2,5,1,2,3]
+    """
+    n = len(groups)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=values.dtype)
+    is_start = np.empty(n, dtype=bool)
+    is_start[0] = True
+    is_start[1:] = groups[1:] != groups[:-1]
+    starts = np.flatnonzero(is_start)
+    group_index = np.cumsum(is_start) - 1
+    rank = np.arange(n) - starts[group_index]
+    cumsum = np.cumsum(values)
+    cumsum -= (cumsum[starts] - values[starts])[group_index]
+    return rank, cumsum
@@ -0,0 +1,246 @@
+import numpy as np
+
+
+class DataPacket:
+    """
+    シミュレーション内で扱われる個々のデータパケットの情報。
+    バッファ内では列ごとの配列で保持し、戦略などが1つずつ参照するときだけこの形で取り出す。
+    """
+    def __init__(self, packet_id, size, ttl, traffic_class=0):
+        self.id = packet_id
+        self.size = size
+        self.ttl = ttl
+        self.traffic_class = traffic_class  # トラフィッククラス（番号が小さいほど優先度が高い）
+
+    def __eq__(self, other):
+        # バッファから取り出すたびに新しいオブジェクトになるので、IDで同じパケットかを判定する
+        return isinstance(other, DataPacket) and self.id == other.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"P(id:{self.id},size:{self.size},ttl:{self.ttl},class:{self.traffic_class})"
+
+
+class PacketBuffer:
+    """
+    パケットを「ID・サイズ・TTL・到着ステップ・トラフィッククラス」の列ごとのNumPy配列で保持するバッファ。
+    dequeと同じように len()・添字・for文で使えるほか、各列を配列のまま参照できるので、
+    TTLの一括減少や戦略のスコア計算を配列演算で行える。
+    並び順はクラス順（番号の小さいクラスが前）で、同じクラスの中は到着順。
+    クラスごとのパケットは連続した区間に並ぶので、クラスの区間（class_range()）を混ざったバッファを
+    走査せずに引ける。パケットのあるクラスはビットマスクで持ち、最も優先度の高いクラスをO(1)で求める。
+    5つの列は1つの (5, 容量) の配列の各行なので、バッファ全体の複製も配列1つのコピーで済む。
+    """
+    NUM_COLUMNS = 5  # ID, サイズ, TTL, 到着ステップ, トラフィッククラス
+
+    def __init__(self, capacity=64, num_classes=1):
+        self._set_storage(np.empty((self.NUM_COLUMNS, capacity), dtype=np.int64))
+        self._n = 0
+        # バッファ内の合計サイズ（到着のたびに全体を足し直さなくて済むよう、増減で管理する）
+        self.total_size = 0
+        self.num_classes = num_classes
+        # クラスcのパケットは位置 _class_ends[c-1] ~ _class_ends[c]-1 に並ぶ（1クラスなら使わない）
+        self._class_ends = np.zeros(num_classes, dtype=np.int64)
+        # パケットのあるクラスのビットマスク（ビットcがクラスc）
+        self._backlog = 0
+
+    def _set_storage(self, data):
+        """列をまとめた配列を差し替え、各列のビューを作り直す"""
+        self._data = data
+        self._ids, self._sizes, self._ttls, self._arrivals, self._classes = data
+
+    # --- 列の参照（コピーではなく配列のビューを返す） ---
+    @property
+    def id(self):
+        return self._ids[:self._n]
+
+    @property
+    def size(self):
+        return self._sizes[:self._n]
+
+    @property
+    def ttl(self):
+        return self._ttls[:self._n]
+
+    @property
+    def arrival(self):
+        return self._arrivals[:self._n]
+
+    @property
+    def traffic_class(self):
+        return self._classes[:self._n]
+
+    # --- トラフィッククラスごとの区間 ---
+    def class_range(self, traffic_class):
+        """クラスtraffic_classのパケットが並ぶ区間 (開始位置, 終了位置+1)"""
+        if self.num_classes == 1:
+            return 0, self._n
+        end = int(self._class_ends[traffic_class])
+        return (int(self._class_ends[traffic_class - 1]) if traffic_class else 0), end
+
+    def class_count(self, traffic_class):
+        """クラスtraffic_classのパケット数"""
+        start, end = self.class_range(traffic_class)
+        return end - start
+
+    @property
+    def backlog(self):
+        """パケットのあるクラスのビットマスク（ビットcがクラスc）"""
+        return self._backlog if self.num_classes > 1 else int(self._n > 0)
+
+    def first_class(self):
+        """パケットのある最も優先度の高い（番号の小さい）クラス。空なら-1"""
+        backlog = self.backlog
+        return (backlog & -backlog).bit_length() - 1
+
+    def _rebuild_classes(self):
+        """クラスの列から、クラスごとの区間とビットマスクを作り直す"""
+        if self.num_classes == 1:
+            return
+        counts = np.bincount(self._classes[:self._n], minlength=self.num_classes)
+        np.cumsum(counts, out=self._class_ends)
+        self._backlog = sum(1 << int(c) for c in np.flatnonzero(counts))
+
+    # --- dequeと同じ使い方 ---
+    def __len__(self):
+        return self._n
+
+    def __bool__(self):
+        return self._n > 0
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._n
+        if not 0 <= index < self._n:
+            raise IndexError("PacketBuffer index out of range")
+        return DataPacket(int(self._ids[index]), int(self._sizes[index]), int(self._ttls[index]),
+                          int(self._classes[index]))
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield DataPacket(int(self._ids[i]), int(self._sizes[i]), int(self._ttls[i]), int(self._classes[i]))
+
+    def __delitem__(self, index):
+        self.remove_at(index)
+
+    def index(self, packet):
+        """パケットのバッファ内での位置を返す"""
+        positions = np.flatnonzero(self.id == packet.id)
+        if len(positions) == 0:
+            raise ValueError(f"{packet} is not in buffer")
+        return int(positions[0])
+
+    def remove(self, packet):
+        """指定したパケットをバッファから取り除く"""
+        self.remove_at(self.index(packet))
+
+    # --- 追加・削除 ---
+    def _reserve(self, needed):
+        """容量が足りなければ配列を倍々に広げる"""
+        capacity = self._data.shape[1]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        data = np.empty((self.NUM_COLUMNS, capacity), dtype=np.int64)
+        data[:, :self._n] = self._data[:, :self._n]
+        self._set_storage(data)
+
+    def append(self, packet_id, size, ttl, arrival_step, traffic_class=0):
+        """パケットをそのクラスの末尾に追加し、追加した位置を返す"""
+        n = self._n
+        self._reserve(n + 1)
+        position = n
+        if self.num_classes > 1:
+            # 後ろのクラスの区間を1つずつ後ろにずらして、クラスの末尾に入れる
+            position = int(self._class_ends[traffic_class])
+            if position < n:
+                self._data[:, position + 1:n + 1] = self._data[:, position:n]
+            self._class_ends[traffic_class:] += 1
+            self._backlog |= 1 << traffic_class
+        self._ids[position] = packet_id
+        self._sizes[position] = size
+        self._ttls[position] = ttl
+        self._arrivals[position] = arrival_step
+        self._classes[position] = traffic_class
+        self._n = n + 1
+        self.total_size += size
+        return position
+
+    def extend(self, ids, sizes, ttls, arrivals, classes=0):
+        """複数のパケットを配列のまま追加する（複数クラスなら、追加後にクラス順に並べ直す）"""
+        n, k = self._n, len(ids)
+        self._reserve(n + k)
+        self._ids[n:n + k] = ids
+        self._sizes[n:n + k] = sizes
+        self._ttls[n:n + k] = ttls
+        self._arrivals[n:n + k] = arrivals
+        self._classes[n:n + k] = classes
+        self._n = n + k
+        self.total_size += int(np.sum(sizes))
+        if self.num_classes > 1:
+            order = np.argsort(self._classes[:n + k], kind="stable")
+            self._data[:, :n + k] = self._data[:, order]
+            self._rebuild_classes()
+
+    def remove_at(self, index):
+        """index番目のパケットを取り除き、後ろのパケットを詰める"""
+        n = self._n
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("PacketBuffer index out of range")
+        self.total_size -= int(self._sizes[index])
+        if self.num_classes > 1:
+            traffic_class = int(self._classes[index])
+            self._class_ends[traffic_class:] -= 1
+            if self.class_count(traffic_class) == 0:
+                self._backlog &= ~(1 << traffic_class)
+        self._data[:, index:n - 1] = self._data[:, index + 1:n]
+        self._n = n - 1
+
+    def keep(self, mask):
+        """maskがTrueのパケットだけを、順番を保ったまま残す"""
+        k = int(np.count_nonzero(mask))
+        self._data[:, :k] = self._data[:, :self._n][:, mask]
+        self._n = k
+        self.total_size = int(self._sizes[:k].sum())
+        # 順番を保って詰めるので、クラスごとに連続した並びはそのまま
+        self._rebuild_classes()
+
+    def clear(self):
+        """バッファを空にする"""
+        self._n = 0
+        self.total_size = 0
+        self._class_ends[:] = 0
+        self._backlog = 0
+
+    # --- 状態の保存と復元 ---
+    def snapshot(self):
+        """
+        バッファの中身を (5, パケット数) の配列1つにコピーして返す。
+        行は順にID・サイズ・TTL・到着ステップ・トラフィッククラス。
+        """
+        return self._data[:, :self._n].copy()
+
+    def restore(self, data):
+        """snapshot()で保存した中身に戻す"""
+        n = data.shape[1]
+        self._reserve(n)
+        self._data[:, :n] = data
+        self._n = n
+        self.total_size = int(data[1].sum())
+        self._rebuild_classes()
+
+    def copy(self):
+        """同じ中身を持つ独立したバッファを返す"""
+        buffer = PacketBuffer.__new__(PacketBuffer)
+        buffer._set_storage(self._data[:, :max(self._n, 1)].copy())
+        buffer._n = self._n
+        buffer.total_size = self.total_size
+        buffer.num_classes = self.num_classes
+        buffer._class_ends = self._class_ends.copy()
+        buffer._backlog = self._backlog
+        return buffer
@@ -0,0 +1,225 @@
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from configs.frozen import freeze
+from environments.geoleo_env import GeoLeoEnv
+from main0926 import (CONFIGS, DEFAULT_RESULTS_DB, DEFAULT_STRATEGIES, load_object, load_strategies,
+                      open_results_store, simulate_strategy)
+
+# 探索するDQNハイパーパラメータと、その候補・範囲
+# ----------------------------------------------------
+SEARCH_SPACE = {
+    "HIDDEN_LAYER_SIZES": [[64, 64], [128, 128], [256, 256], [128, 128, 128]],
+    "LEARNING_RATE": (1e-5, 1e-3),          # 対数一様分布
+    "EPSILON_DECAY": (2000, 40000),         # 対数一様分布（整数）
+    "BATCH_SIZE": [32, 64, 128, 256],
+    "TARGET_UPDATE_FREQUENCY": [5, 15, 50, 100, 250],
+    "DOUBLE_DQN": [False, True],
+    "DUELING_DQN": [False, True],
+    "N_STEP_RETURNS": [1, 3, 5],
+    "TARGET_UPDATE_TAU": [None, 0.005, 0.01, 0.05],  # Noneなら TARGET_UPDATE_FREQUENCY ごとに丸ごと写す
+}
+# ----------------------------------------------------
+
+
+def sample_params(rng):
+    """探索空間からハイパーパラメータを1組サンプリングする"""
+    low, high = SEARCH_SPACE["LEARNING_RATE"]
+    learning_rate = math.exp(rng.uniform(math.log(low), math.log(high)))
+    low, high = SEARCH_SPACE["EPSILON_DECAY"]
+    epsilon_decay = int(math.exp(rng.uniform(math.log(low), math.log(high))))
+    return {
+        "HIDDEN_LAYER_SIZES": rng.choice(SEARCH_SPACE["HIDDEN_LAYER_SIZES"]),
+        "LEARNING_RATE": learning_rate,
+        "EPSILON_DECAY": epsilon_decay,
+        "BATCH_SIZE": rng.choice(SEARCH_SPACE["BATCH_SIZE"]),
+        "TARGET_UPDATE_FREQUENCY": rng.choice(SEARCH_SPACE["TARGET_UPDATE_FREQUENCY"]),
+        "DOUBLE_DQN": rng.choice(SEARCH_SPACE["DOUBLE_DQN"]),
+        "DUELING_DQN": rng.choice(SEARCH_SPACE["DUELING_DQN"]),
+        "N_STEP_RETURNS": rng.choice(SEARCH_SPACE["N_STEP_RETURNS"]),
+        "TARGET_UPDATE_TAU": rng.choice(SEARCH_SPACE["TARGET_UPDATE_TAU"]),
+    }
+
+
+def make_config(config_class, params):
+    """設定クラスのハイパーパラメータを上書きした、固定済みの設定を作る（プロセス間で受け渡せる）"""
+    return freeze(config_class, **params)
+
+
+def success_rate(stats):
+    """統計情報から転送成功率(%)を計算する"""
+    if stats["generated"] == 0:
+        return 0.0
+    return stats["transmitted"] / stats["generated"] * 100
+
+
+def evaluate(strategy, config, eval_steps, eval_seed):
+    """固定したシードの到着系列で戦略を評価し、統計情報を返す"""
+    eval_config = freeze(config, SIMULATION_STEPS=eval_steps)
+    env = GeoLeoEnv(eval_config, seed=eval_seed)
+    return simulate_strategy(env, strategy, eval_steps)
+
+
+def run_trial(trial_id, config, train_steps, checkpoint_path, eval_steps, eval_seed, results_db=None, rung=0):
+    """
+    ワーカープロセスで1試行分の学習と評価を行う。
+    前の段で保存したチェックポイント（ネットワーク・最適化器・リプレイバッファ）があれば、そこから学習を再開する。
+    学習の到着系列は段ごとに変える（段rungのシードは「試行番号-段」）。
+    results_dbを指定すると、評価結果をワーカーから直接そのファイルに記録する。
+
+    Returns:
+        (int, float, float): 試行番号, 転送成功率(%), 学習にかかった秒数
+    """
+    import torch
+    from strategies.dqn_strategy import DqnStrategy
+
+    # 複数のワーカーが同時に動くので、1プロセスが使うスレッドは1つに絞る
+    torch.set_num_threads(1)
+    train_seed = f"{trial_id}-{rung}"
+    random.seed(train_seed)
+    torch.manual_seed(trial_id * 1000 + rung)
+
+    strategy = DqnStrategy(config)
+    if os.path.exists(checkpoint_path):
+        strategy.load_checkpoint(checkpoint_path)
+
+    start_time = time.perf_counter()
+    strategy.train(GeoLeoEnv(config, seed=train_seed), num_steps=train_steps)
+    elapsed = time.perf_counter() - start_time
+    strategy.save_checkpoint(checkpoint_path)
+
+    eval_start = time.perf_counter()
+    stats = evaluate(strategy, config, eval_steps, eval_seed)
+    if results_db is not None:
+        with open_results_store(results_db) as store:
+            store.add("hparam_search", config, "DQN Strategy", stats, seed=eval_seed,
+                      elapsed=time.perf_counter() - eval_start, trial=trial_id, train_seconds=elapsed)
+    return trial_id, success_rate(stats), elapsed
+
+
+def rung_budgets(min_steps, max_steps, eta):
+    """各段の累積学習ステップ数（min_stepsからeta倍ずつ増やし、max_stepsで打ち切る）"""
+    budgets = []
+    budget = min_steps
+    while budget < max_steps:
+        budgets.append(budget)
+        budget *= eta
+    budgets.append(max_steps)
+    return budgets
+
+
+def successive_halving(config_class, num_trials, min_steps, max_steps, eta,
+                       eval_steps, eval_seed, workers, seed, results_db=None):
+    """
+    Successive Halving によるハイパーパラメータ探索。
+    全試行を少ない学習ステップで並列に学習・評価し、上位1/etaだけを残して
+    学習ステップを増やす、という段を繰り返す。成績の悪い試行は早い段で打ち切られる。
+
+    Returns:
+        list: 各試行の記録（ハイパーパラメータ・段ごとの成功率など）を成績順に並べたもの
+    """
+    rng = random.Random(seed)
+    trials = {i: {"trial": i, "params": sample_params(rng), "scores": [], "train_seconds": 0.0}
+              for i in range(num_trials)}
+    budgets = rung_budgets(min_steps, max_steps, eta)
+    alive = list(trials)
+    # オフラインデータセットを使う設定なら、ワーカーが同時に作り始めないよう先にここで作っておく
+    if getattr(config_class, 'OFFLINE_DATASET_PATH', None):
+        from strategies.dqn_strategy import ensure_offline_dataset
+        ensure_offline_dataset(freeze(config_class))
+    checkpoint_dir = tempfile.mkdtemp(prefix="hparam_search_")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            trained_steps = 0
+            for rung, budget in enumerate(budgets):
+                print(f"\n--- 段 {rung}: {len(alive)}試行 × 累積{budget}ステップ ---")
+                futures = [
+                    executor.submit(run_trial, i, make_config(config_class, trials[i]["params"]),
+                                    budget - trained_steps,
+                                    os.path.join(checkpoint_dir, f"trial{i}.pt"),
+                                    eval_steps, eval_seed, results_db, rung)
+                    for i in alive
+                ]
+                for future in futures:
+                    trial_id, score, elapsed = future.result()
+                    trials[trial_id]["scores"].append(score)
+                    trials[trial_id]["train_seconds"] += elapsed
+                    print(f"試行{trial_id:>3}: 成功率 {score:6.2f}%  {trials[trial_id]['params']}")
+                trained_steps = budget
+
+                if rung == len(budgets) - 1:
+                    break
+                # 成績上位 1/eta だけを次の段に進め、残りは打ち切る
+                alive.sort(key=lambda i: trials[i]["scores"][-1], reverse=True)
+                survivors = max(1, len(alive) // eta)
+                for i in alive[survivors:]:
+                    checkpoint_path = os.path.join(checkpoint_dir, f"trial{i}.pt")
+                    if os.path.exists(checkpoint_path):
+                        os.remove(checkpoint_path)
+                alive = alive[:survivors]
+    finally:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+
+    # 到達した段が深いほど、同じ段なら成功率が高いほど上位
+    return sorted(trials.values(), key=lambda t: (len(t["scores"]), t["scores"][-1]), reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DQNハイパーパラメータのSuccessive Halving探索")
+    parser.add_argument("--config", choices=sorted(CONFIGS), default="dqn_train")
+    parser.add_argument("--trials", type=int, default=27, help="最初にサンプリングする試行数")
+    parser.add_argument("--eta", type=int, default=3, help="各段で残す割合の逆数")
+    parser.add_argument("--min-steps", type=int, default=2000, help="最初の段の学習ステップ数")
+    parser.add_argument("--max-steps", type=int, default=None,
+                        help="最後の段の学習ステップ数（省略時は設定のSIMULATION_STEPS）")
+    parser.add_argument("--eval-steps", type=int, default=5000, help="評価に使うステップ数")
+    parser.add_argument("--eval-seed", type=int, default=12345, help="評価用の到着系列のシード")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="並列ワーカー数")
+    parser.add_argument("--seed", type=int, default=0, help="ハイパーパラメータのサンプリング用シード")
+    parser.add_argument("--out", default="hparam_search_results.json", help="結果の保存先")
+    parser.add_argument("--results-db", default=DEFAULT_RESULTS_DB,
+                        help="各試行の評価結果を記録するSQLiteファイル")
+    parser.add_argument("--no-results-db", action="store_true", help="評価結果を記録しない")
+    args = parser.parse_args()
+
+    config_class = load_object(CONFIGS[args.config])
+    max_steps = args.max_steps or config_class.SIMULATION_STEPS
+
+    # 比較対象として、ヒューリスティック戦略の成功率を同じ評価系列で求めておく
+    print("=============== ヒューリスティック戦略の評価 ===============")
+    baselines = {}
+    for strategy_name, strategy_class in load_strategies(DEFAULT_STRATEGIES):
+        config = freeze(config_class)
+        baselines[strategy_name] = success_rate(evaluate(strategy_class(config), config,
+                                                         args.eval_steps, args.eval_seed))
+        print(f"{strategy_name:<30}: {baselines[strategy_name]:>6.2f}%")
+    best_baseline = max(baselines.values())
+
+    print("\n=============== DQNハイパーパラメータ探索 ===============")
+    ranking = successive_halving(config_class, args.trials, args.min_steps, max_steps, args.eta,
+                                 args.eval_steps, args.eval_seed, args.workers, args.seed,
+                                 None if args.no_results_db else args.results_db)
+
+    print("\n=============== 探索結果（上位5件） ===============")
+    for trial in ranking[:5]:
+        score = trial["scores"][-1]
+        print(f"試行{trial['trial']:>3}: 成功率 {score:6.2f}% "
+              f"(ヒューリスティック最良との差 {score - best_baseline:+.2f}pt) {trial['params']}")
+    total_seconds = sum(t["train_seconds"] for t in ranking)
+    print(f"学習に使ったCPU時間の合計: {total_seconds:.1f}秒")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"baselines": baselines, "trials": ranking}, f, ensure_ascii=False, indent=2)
+    print(f"結果を保存しました: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
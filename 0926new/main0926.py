@@ -1,102 +1,475 @@
-# 実験シナリオ設定
-from configs.experiment_configs import DqnTrainConfig 
+import argparse
+import importlib
+import os
+import random
+import sys
+import tempfile
+import time
 
 # シミュレーション環境
 from environments.geoleo_env import GeoLeoEnv
+# 検査して固定した設定
+from configs.frozen import freeze
 
-# 比較手法と提案手法（戦略）
-from strategies.simple_strategies import FifoStrategy, ShortestTtlFirstStrategy
-# from strategies.dqn_strategy import DqnStrategy
+# パケット単位のイベントトレース
+from utils.event_trace import PacketEventTracer, load_trace, build_timelines, summarize_fates
+# 実験結果のキャッシュ
+from utils.result_cache import ResultCache
+# 転送数の上界（オフライン最適解）
+from utils.oracle import arrivals_from_trace, max_deliverable
+# 逐次的な打ち切り（バッチ平均法による信頼区間）
+from utils.sequential_stats import BatchMeans
+# 残り帯域幅への詰め込み
+from utils.packing import PACKING_MODES
+# 確率的なチャネル（フェージング・降雨減衰）
+from utils.channel_models import CHANNEL_MODELS
+# トラフィッククラスのスケジューリング
+from utils.class_scheduling import CLASS_SCHEDULING_MODES
 
+# 実験シナリオ設定と戦略は、名前から「モジュール:クラス」を引いて必要な時だけ読み込む。
+# DQN（torch）やプロット（matplotlib）のような重いライブラリは、
+# それを使う戦略・機能が選ばれた時にだけインポートされる。
+# ----------------------------------------------------
+CONFIGS = {
+    "dqn_train": "configs.experiment_configs:DqnTrainConfig",
+}
+STRATEGIES = {
+    "fifo": ("FIFO Strategy", "strategies.simple_strategies:FifoStrategy"),
+    "stf": ("Shortest TTL First Strategy", "strategies.simple_strategies:ShortestTtlFirstStrategy"),
+    "ssf": ("Smallest Size First Strategy", "strategies.simple_strategies:SmallestSizeFirstStrategy"),
+    "vd": ("Value Density Strategy", "strategies.simple_strategies:ValueDensityStrategy"),
+    "dqn": ("DQN Strategy", "strategies.dqn_strategy:DqnStrategy"),
+    "rollout": ("Rollout Strategy", "strategies.rollout_strategy:RolloutStrategy"),
+}
+DEFAULT_STRATEGIES = ["fifo", "stf"]
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".result_cache")
+DEFAULT_RESULTS_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.sqlite")
+# ----------------------------------------------------
 
-def run_experiment(config):
+
+def load_object(spec):
+    """「モジュール名:属性名」形式の文字列から、クラスなどのオブジェクトを読み込む"""
+    module_name, attr_name = spec.split(":")
+    return getattr(importlib.import_module(module_name), attr_name)
+
+
+def load_strategies(names):
+    """戦略名のリストから、(表示名, 戦略クラス) のリストを作る"""
+    return [(STRATEGIES[name][0], load_object(STRATEGIES[name][1])) for name in names]
+
+
+def import_shared(module_name):
+    """リポジトリ直下にある、旧版と共有のモジュール（telemetry.py・results_store.pyなど）を読み込む"""
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if repo_root not in sys.path:
+        sys.path.append(repo_root)
+    return importlib.import_module(module_name)
+
+
+def start_telemetry(port):
+    """進み具合をローカルのHTTP/WebSocketで配信するサーバーを起動する"""
+    return import_shared("telemetry").TelemetryServer(port).start()
+
+
+def open_results_store(path):
+    """実験結果を記録するSQLiteファイルを開く"""
+    return import_shared("results_store").ResultsStore(path)
+
+
+def simulate_strategy(env, strategy, num_steps, start_step=0, telemetry=None, label=None):
+    """
+    一つの戦略で環境をnum_stepsだけ動かし、集計した統計情報を返す。
+    start_stepを指定すると、そのステップから続きを動かす（環境の状態はそのまま引き継ぐ）。
+    telemetry（TelemetryServer）を渡すと、TELEMETRY_INTERVALステップごとに途中経過を記録する
+    （labelは記録に付ける戦略名）。
+
+    Returns:
+        dict: {"transmitted", "expired", "dropped", "generated"} の各総数
+    """
+    stats = {"transmitted": 0, "expired": 0, "dropped": 0, "generated": 0}
+    telemetry_interval = getattr(env.config, 'TELEMETRY_INTERVAL', 100)
+    next_telemetry = start_step + telemetry_interval if telemetry is not None else None
+
+    for step in range(start_step, start_step + num_steps):
+        # 時間を進め、環境の変化を処理
+        _, time_stats = env.update_time(current_step=step)
+        for key in time_stats:
+            stats[key] += time_stats[key]
+
+        if step == next_telemetry:
+            telemetry.publish(strategy=label, step=step, buffer_packets=len(env.buffer),
+                              link_capacity=env.remaining_bandwidth, **stats)
+            next_telemetry += telemetry_interval
+
+        # スコアを配列で計算できる戦略は、1回の部分ソートでこのステップの転送をまとめて行う
+        # （規則を切り替える戦略は、ステップごとに1回だけ規則を選び、その規則のスコアを使う）
+        if env.remaining_bandwidth > 0 and env.buffer:
+            scores = strategy.select_rule(env).score_packets(*env.packet_columns())
+            if scores is not None:
+                _, transmitted_count = env.transmit_ranked(scores)
+                stats["transmitted"] += transmitted_count
+                continue
+
+        # 帯域幅が尽きるまでパケット転送
+        while env.remaining_bandwidth > 0 and env.buffer:
+            # 戦略に行動を選択させる（DQNは学習済みモデルで推論）
+            action = strategy.select_action(env)
+
+            # 転送を試みる
+            _, transmitted_count, success = env.transmit_packet(action)
+            stats["transmitted"] += transmitted_count
+
+            if not success:
+                break
+
+        # 詰め込みモードなら、止まった後の残り帯域幅に入るパケットを送る
+        stats["transmitted"] += env.fill_residual(strategy.packet_priorities)
+    return stats
+
+
+def report_stats(stats):
+    """一つの戦略の統計情報を表示し、転送成功率(%)を返す"""
+    if stats["generated"] == 0:
+        print("結果: パケットは生成されませんでした。")
+        return 0
+    success_rate = (stats["transmitted"] / stats["generated"]) * 100
+    print(f"結果: 総生成パケット数 = {stats['generated']}")
+    print(f"　　  転送パケット数　 = {stats['transmitted']}")
+    print(f"　　  破棄パケット数　 = {stats['dropped']}")
+    print(f"　　  転送成功率　　　 = {success_rate:.2f}%")
+    if "classes" in stats:
+        classes = stats["classes"]
+        for traffic_class, (generated, transmitted) in enumerate(zip(classes["generated"],
+                                                                     classes["transmitted"])):
+            class_rate = transmitted / generated * 100 if generated else 0
+            print(f"　　  クラス{traffic_class}の成功率　 = {class_rate:.2f}% ({transmitted}/{generated}, "
+                  f"期限切れ {classes['expired'][traffic_class]}, 破棄 {classes['dropped'][traffic_class]})")
+    if "oracle" in stats:
+        bound_rate = (stats["oracle"] / stats["generated"]) * 100
+        print(f"　　  転送数の上界　　 = {stats['oracle']} (成功率 {bound_rate:.2f}%, "
+              f"差 {bound_rate - success_rate:.2f}pt)")
+    return success_rate
+
+
+def run_experiment(config, strategies=None, seed=None, trace_dir=None, cache=None, oracle=False,
+                   telemetry=None, store=None):
     """
     一つの設定（config）に基づき、複数の戦略を評価する実験を実行する。
+
+    Args:
+        config: 実験設定オブジェクト
+        strategies (list): (表示名, 戦略クラス) のリスト。省略時はFIFOと最小TTL優先
+        seed (int): 指定すると、各戦略の評価用の環境の乱数をこのシードで初期化し、
+            全ての戦略に同じパケット到着系列を与える
+        trace_dir (str): 指定すると、戦略ごとのパケットイベントトレースを
+            このフォルダに「<戦略クラス名>.trace」として書き出す
+        cache (ResultCache): 指定すると、シードが固定されたジョブの結果を保存・再利用する。
+            トレースを取る場合と、結果が再現しない戦略（DQNなど）では使わない
+        oracle (bool): Trueなら、各戦略が受けた到着系列とリンク容量から
+            どんなスケジューラでも超えられない転送数の上界を計算し、その差を表示する
+        telemetry (TelemetryServer): 指定すると、評価中の途中経過をこのサーバーから配信する
+        store (ResultsStore): 指定すると、シミュレーションした各戦略の結果を記録する
+            （キャッシュから読んだ結果は新しい実行ではないので記録しない）
+
+    Returns:
+        dict: {戦略の表示名: 転送成功率(%)}
     """
     print(f"=============== 実験開始: {config.NAME} ===============")
 
     # 実験で使う環境を初期化
     # ----------------------------------------------------
-    env = GeoLeoEnv(config)
+    env = GeoLeoEnv(config, seed=seed)
     # ----------------------------------------------------
 
     # 3. 比較したい戦略をリストアップ
     # ----------------------------------------------------
-    strategies_to_test = [
-        ("FIFO Strategy", FifoStrategy),
-        ("Shortest TTL First Strategy", ShortestTtlFirstStrategy)
-        # ("DQN Strategy", DqnStrategy)
-    ]
+    if strategies is None:
+        strategies = load_strategies(DEFAULT_STRATEGIES)
     # ----------------------------------------------------
 
     # 4. 全ての戦略の結果を保存するための辞書
     # ----------------------------------------------------
     results = {}
+    bounds = {}
     # ----------------------------------------------------
 
     # 5. 各戦略を順番にテストするループ
     # ----------------------------------------------------
-    for strategy_name, strategy_class in strategies_to_test:
+    for strategy_name, strategy_class in strategies:
         print(f"\n--- 戦略 '{strategy_name}' の評価を開始 ---")
-        
+
+        # 同じ設定・戦略・シード・コードの結果が保存済みなら、シミュレーションを省略
+        cache_key = None
+        if (cache is not None and seed is not None and trace_dir is None
+                and strategy_class.CACHEABLE):
+            cache_key = cache.make_key(config, strategy_class, seed)
+            stats = cache.get(cache_key)
+            if stats is not None and (not oracle or "oracle" in stats):
+                print("保存済みの結果を使用します（キャッシュ）")
+                results[strategy_name] = report_stats(stats)
+                if oracle:
+                    bounds[strategy_name] = stats["oracle"] / max(stats["generated"], 1) * 100
+                continue
+
+        if seed is not None:
+            random.seed(seed)
+
         # 戦略を初期化
         strategy = strategy_class(config) # configを渡す (DQNなどで利用)
 
-        # # 5a. もし戦略がDQNなら、学習フェーズを実行
-        # if isinstance(strategy, DqnStrategy):
-        #     print("DQNの学習を開始します...")
-        #     strategy.train(env) # 学習ループはDQNクラス内にカプセル化
-        #     print("DQNの学習が完了しました。")
+        # 5a. 学習が必要な戦略（DQNなど）なら学習フェーズを実行（他の戦略では何もしない）
+        strategy.train(env)
 
         # 5b. 評価フェーズ（全戦略で共通）
         print("評価シミュレーションを開始します...")
-        env.reset()
-        stats = {"transmitted": 0, "expired": 0, "dropped": 0, "generated": 0}
-        
-        for step in range(config.SIMULATION_STEPS):
-            # 時間を進め、環境の変化を処理
-            _, time_stats = env.update_time(current_step=step)
-            for key in time_stats:
-                stats[key] += time_stats[key]
-            
-            # 帯域幅が尽きるまでパケット転送
-            while env.remaining_bandwidth > 0 and env.buffer:
-                # 戦略に行動を選択させる（DQNは学習済みモデルで推論）
-                action = strategy.select_action(env)
-                
-                # 転送を試みる
-                _, transmitted_count, success = env.transmit_packet(action)
-                stats["transmitted"] += transmitted_count
-                
-                if not success:
-                    break
-        
+        tracer = None
+        if trace_dir is not None:
+            os.makedirs(trace_dir, exist_ok=True)
+            tracer = PacketEventTracer(os.path.join(trace_dir, f"{strategy_class.__name__}.trace"))
+        elif oracle:
+            # 上界の計算には到着系列が必要なので、一時ファイルにトレースを取る
+            fd, trace_path = tempfile.mkstemp(suffix=".trace")
+            os.close(fd)
+            tracer = PacketEventTracer(trace_path)
+        # 学習で使った環境とは別に、初期状態の環境で評価する（シードが同じなら全戦略で同じ到着系列）
+        env = GeoLeoEnv(config, tracer=tracer, seed=seed)
+        start_time = time.perf_counter()
+        stats = simulate_strategy(env, strategy, config.SIMULATION_STEPS,
+                                  telemetry=telemetry, label=strategy_name)
+        elapsed = time.perf_counter() - start_time
+        if env.class_stats is not None:
+            stats["classes"] = {key: counts.tolist() for key, counts in env.class_stats.items()}
+
+        if tracer is not None:
+            tracer.close()
+            records = load_trace(tracer.path)
+            if trace_dir is not None:
+                fates = summarize_fates(build_timelines(records))
+                print(f"トレース: {tracer.path} ({tracer.total_records}件) {fates}")
+            else:
+                os.remove(tracer.path)
+            if oracle:
+                stats["oracle"] = max_deliverable(
+                    *arrivals_from_trace(records), env.capacity_table.window(0, config.SIMULATION_STEPS))
+                bounds[strategy_name] = stats["oracle"] / max(stats["generated"], 1) * 100
+
+        if cache_key is not None:
+            cache.put(cache_key, stats, config=config.NAME, strategy=strategy_name,
+                      seed=seed, elapsed=elapsed)
+        if store is not None:
+            store.add("run_experiment", config, strategy_name, stats, seed=seed, elapsed=elapsed,
+                      series=tracer.path if trace_dir is not None else None,
+                      strategy_class=strategy_class.__name__, oracle=stats.get("oracle"))
+
         # 5c. 結果を保存
-        if stats["generated"] > 0:
-            success_rate = (stats["transmitted"] / stats["generated"]) * 100
-            results[strategy_name] = success_rate
-            print(f"結果: 総生成パケット数 = {stats["generated"]}")
-            print(f"　　  転送パケット数　 = {stats["transmitted"]}")
-            print(f"　　  破棄パケット数　 = {stats["dropped"]}")
-            print(f"　　  転送成功率　　　 = {success_rate:.2f}%")
-        else:
-            results[strategy_name] = 0
-            print("結果: パケットは生成されませんでした。")
+        results[strategy_name] = report_stats(stats)
+        print(f"　　  実行時間　　　　 = {elapsed:.2f}秒")
 
     # 6. 最終結果をまとめて表示
     # ----------------------------------------------------
     print("\n=============== 全戦略の最終結果比較 ===============")
     for strategy_name, success_rate in results.items():
-        print(f"{strategy_name:<30}: {success_rate:>6.2f}%")
+        if strategy_name in bounds:
+            gap = bounds[strategy_name] - success_rate
+            print(f"{strategy_name:<30}: {success_rate:>6.2f}%  "
+                  f"(上界 {bounds[strategy_name]:>6.2f}%, 差 {gap:>5.2f}pt)")
+        else:
+            print(f"{strategy_name:<30}: {success_rate:>6.2f}%")
     print("=====================================================")
+    return results
 
 
-if __name__ == "__main__":
-    # 7. 実行したい実験シナリオを選択
+def run_sequential_experiment(config, strategies=None, seed=None, precision=1.0,
+                              batch_steps=500, confidence=0.95, min_batches=5):
+    """
+    全ての戦略を同じ到着系列のバッチで並行して動かし、成功率の信頼区間（バッチ平均法）を見ながら、
+    必要な精度に達するか、戦略間の順位が統計的に確定した時点で打ち切る。
+    バッチごとに各環境の乱数を「シード-バッチ番号」で初期化し直すので、どの戦略も同じ到着系列を受け、
+    戦略間の差はバッチごとの対応のある差から推定できる。
+
+    Args:
+        config: 実験設定オブジェクト（SIMULATION_STEPSは打ち切らなかった場合の上限）
+        strategies (list): (表示名, 戦略クラス) のリスト。省略時はFIFOと最小TTL優先
+        seed (int): 到着系列の元になる乱数シード（省略時はランダム）
+        precision (float): 成功率の信頼区間の半幅（ポイント）の目標。Noneなら順位の確定だけで打ち切る
+        batch_steps (int): 1バッチのステップ数
+        confidence (float): 信頼係数
+        min_batches (int): 打ち切りを判定する前に最低限実行するバッチ数
+
+    Returns:
+        dict: {戦略の表示名: 転送成功率(%)（バッチ平均）}
+    """
+    print(f"=============== 逐次実験開始: {config.NAME} ===============")
+    if strategies is None:
+        strategies = load_strategies(DEFAULT_STRATEGIES)
+    if seed is None:
+        seed = random.getrandbits(32)
+
+    # 戦略ごとに学習（必要なら）を済ませ、評価用の環境を用意する
+    runners = []
+    for strategy_name, strategy_class in strategies:
+        random.seed(seed)
+        strategy = strategy_class(config)
+        strategy.train(GeoLeoEnv(config, seed=seed))
+        # 到着の乱数はバッチごとに設定し直す。確率的なチャネルの系列は全戦略で同じシードにそろえる
+        runners.append((strategy_name, strategy, GeoLeoEnv(config, seed=seed)))
+
+    tracker = BatchMeans([name for name, _, _ in runners], confidence)
+    max_batches = max(config.SIMULATION_STEPS // batch_steps, 1)
+    stop_reason = "最大ステップ数に到達"
+    start_time = time.perf_counter()
+    for batch in range(max_batches):
+        for strategy_name, strategy, env in runners:
+            env.rng.seed(f"{seed}-{batch}")
+            stats = simulate_strategy(env, strategy, batch_steps, start_step=batch * batch_steps)
+            tracker.add(strategy_name, stats["transmitted"], stats["generated"])
+
+        if batch + 1 < min_batches:
+            continue
+        if precision is not None and tracker.precision_reached(precision):
+            stop_reason = f"信頼区間の半幅が{precision}pt以下"
+            break
+        if tracker.ranking_settled():
+            stop_reason = "順位が確定"
+            break
+    elapsed = time.perf_counter() - start_time
+
+    steps_used = tracker.num_batches * batch_steps
+    print(f"{steps_used}/{config.SIMULATION_STEPS}ステップで終了（{stop_reason}）, 実行時間 {elapsed:.2f}秒")
+    print(f"\n=============== 全戦略の最終結果比較（{confidence:.0%}信頼区間） ===============")
+    results = {}
+    ranked = tracker.ranking()
+    for strategy_name in ranked:
+        mean, half_width = tracker.interval(strategy_name)
+        results[strategy_name] = mean
+        print(f"{strategy_name:<30}: {mean:>6.2f}% ± {half_width:.2f}pt")
+    for better, worse in zip(ranked, ranked[1:]):
+        mean, half_width = tracker.difference(better, worse)
+        print(f"差 {better} - {worse}: {mean:+.2f} ± {half_width:.2f}pt")
+    print("=====================================================")
+    return results
+
+
+def plot_capacity(config, num_steps, path):
+    """実験で使うリンク容量の時間変化を、間引いてから画像ファイルpathに描く（matplotlibはここで初めて読み込む）"""
+    import numpy as np
+    from utils.link_models import calculate_shannon_capacity_series
+    from utils.plotting import plot_series
+
+    capacities = calculate_shannon_capacity_series(np.arange(num_steps), config)
+    series = [(None, capacities)]
+    if getattr(config, 'CHANNEL_MODEL', None):
+        # 確率的なチャネルなら、複数の実現値を1回の呼び出しでまとめて作って重ね、
+        # 決定的なリンク容量はその上にラベル付きの線として描く
+        from utils.channel_models import StochasticChannel
+        realizations = StochasticChannel(config).capacity(np.arange(num_steps), num_realizations=20,
+                                                          seed=getattr(config, 'CHANNEL_SEED', None))
+        series = [(None, capacity) for capacity in realizations] + [("Free-space path loss only", capacities)]
+    plot_series(path, series, title=f"Link Capacity ({config.NAME})", ylabel="Capacity (Mbps)", ymin=0)
+    print(f"リンク容量のプロットを保存しました: {path}")
+
+
+def parse_args(argv=None):
+    """コマンドライン引数を解釈する"""
+    parser = argparse.ArgumentParser(description="GEO-LEO転送戦略の比較実験")
+    parser.add_argument("--config", choices=sorted(CONFIGS), default="dqn_train",
+                        help="実験シナリオ設定の名前")
+    parser.add_argument("--strategies", nargs="+", choices=sorted(STRATEGIES),
+                        default=DEFAULT_STRATEGIES, help="評価する戦略の名前")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[None],
+                        help="乱数シード（複数指定するとシードごとに実験する）")
+    parser.add_argument("--steps", type=int, default=None,
+                        help="シミュレーションステップ数（省略時は設定の値）")
+    parser.add_argument("--trace-dir", default=None,
+                        help="パケットイベントトレースの出力先フォルダ")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help="実験結果キャッシュの保存先フォルダ")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="結果キャッシュを使わずに必ず再計算する")
+    parser.add_argument("--oracle", action="store_true",
+                        help="転送数の上界（オフライン最適解）を計算し、各戦略との差を表示する")
+    parser.add_argument("--packing", choices=PACKING_MODES, default=None,
+                        help="優先順に送って入らなくなった後の残り帯域幅に、入るパケットを詰め込む")
+    parser.add_argument("--channel", choices=CHANNEL_MODELS, default=None,
+                        help="リンク容量にフェージングと降雨減衰を加える（系列はシードごとに決まる）")
+    parser.add_argument("--traffic-classes", nargs="+", type=float, default=None, metavar="SHARE",
+                        help="到着パケットを各クラスに分ける割合（先のクラスほど優先度が高い）")
+    parser.add_argument("--class-scheduling", choices=CLASS_SCHEDULING_MODES, default=None,
+                        help="帯域幅のクラスへの割り当て（strict: 完全優先, wfq: 重み付き公平）")
+    parser.add_argument("--class-weights", nargs="+", type=float, default=None, metavar="WEIGHT",
+                        help="--class-scheduling wfq のクラスごとの重み（省略時は全クラス同じ）")
+    parser.add_argument("--sequential", action="store_true",
+                        help="バッチごとに信頼区間を計算し、精度に達するか順位が確定したら打ち切る")
+    parser.add_argument("--precision", type=float, default=1.0,
+                        help="--sequential時の、成功率の信頼区間の半幅の目標（ポイント）")
+    parser.add_argument("--batch-steps", type=int, default=500,
+                        help="--sequential時の1バッチのステップ数")
+    parser.add_argument("--confidence", type=float, default=0.95,
+                        help="--sequential時の信頼係数")
+    parser.add_argument("--results-db", default=DEFAULT_RESULTS_DB,
+                        help="実験結果を記録するSQLiteファイル")
+    parser.add_argument("--no-results-db", action="store_true",
+                        help="実験結果を記録しない")
+    parser.add_argument("--telemetry-port", type=int, default=None,
+                        help="評価中の途中経過を、このポートのローカルHTTP/WebSocketで配信する")
+    parser.add_argument("--offline-dataset", default=None, metavar="PATH",
+                        help="実験の代わりに、--strategiesの戦略の遷移を記録したDQN事前学習用のデータセットをPATHに作る")
+    parser.add_argument("--plot", nargs="?", const="link_capacity.png", default=None, metavar="PATH",
+                        help="リンク容量の時間変化を画像ファイルに描く（省略時はlink_capacity.png）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # 7. 実行したい実験シナリオと戦略を名前から選択
     # ----------------------------------------------------
-    # ConfigAで実験を実行
-    run_experiment(config = DqnTrainConfig())
-    
-    # ConfigBで実験したい場合は、以下のコメントを外す
-    # print("\n\n")
-    # run_experiment(config=ConfigB())
\ No newline at end of file
+    overrides = {}
+    if args.steps is not None:
+        overrides["SIMULATION_STEPS"] = args.steps
+    if args.packing is not None:
+        overrides["PACKING_MODE"] = args.packing
+    if args.channel is not None:
+        overrides["CHANNEL_MODEL"] = args.channel
+    if args.traffic_classes is not None:
+        overrides["TRAFFIC_CLASS_SHARES"] = tuple(args.traffic_classes)
+    if args.class_weights is not None:
+        overrides["TRAFFIC_CLASS_WEIGHTS"] = tuple(args.class_weights)
+    if args.class_scheduling is not None:
+        overrides["CLASS_SCHEDULING"] = args.class_scheduling
+    # 必須の項目を検査して固定し、派生定数を一度だけ計算しておく
+    config = freeze(load_object(CONFIGS[args.config]), **overrides)
+    strategies = load_strategies(args.strategies)
+    if args.offline_dataset:
+        from strategies.dqn_strategy import make_offline_dataset
+        make_offline_dataset(config, args.offline_dataset, [strategy_class for _, strategy_class in strategies],
+                             config.SIMULATION_STEPS, seed=args.seeds[0])
+        return
+    cache = None if args.no_cache else ResultCache(args.cache_dir)
+    telemetry = None if args.telemetry_port is None else start_telemetry(args.telemetry_port)
+    store = None if args.no_results_db else open_results_store(args.results_db)
+
+    for seed in args.seeds:
+        if seed is not None:
+            print(f"\n##### シード: {seed} #####")
+        if args.sequential:
+            run_sequential_experiment(config, strategies=strategies, seed=seed,
+                                      precision=args.precision, batch_steps=args.batch_steps,
+                                      confidence=args.confidence)
+        else:
+            run_experiment(config, strategies=strategies, seed=seed,
+                           trace_dir=args.trace_dir, cache=cache, oracle=args.oracle,
+                           telemetry=telemetry, store=store)
+
+    if telemetry is not None:
+        telemetry.close()
+    if store is not None:
+        store.close()
+
+    if args.plot:
+        plot_capacity(config, config.SIMULATION_STEPS, args.plot)
+
+
+if __name__ == "__main__":
+    # 例: python main0926.py --config dqn_train --strategies fifo stf --seeds 0 1 --steps 10000
+    main()
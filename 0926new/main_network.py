@@ -0,0 +1,86 @@
+import argparse
+import time
+
+from configs.experiment_configs import NetworkConfig
+from configs.frozen import freeze
+from environments.network_env import SatelliteNetworkEnv
+from utils.contact_plan import ContactPlan, ContactGraphRouter
+from main0926 import DEFAULT_STRATEGIES, STRATEGIES, load_strategies
+
+# ノードごとのスケジューラとして使えない戦略
+#   dqn: GeoLeoEnvで学習する前提で、NetworkConfigにはDQNのハイパーパラメータも無い
+#   rollout: 環境を複製して先読みするが、ノードの窓口（_NodeView）は複製も時間の進行もできない
+_UNSUPPORTED_STRATEGIES = ("dqn", "rollout")
+NETWORK_STRATEGIES = sorted(name for name in STRATEGIES if name not in _UNSUPPORTED_STRATEGIES)
+
+
+def build_router(config):
+    """シミュレーション期間全体のコンタクトプランと、その上の経路表を作る"""
+    start_time = time.perf_counter()
+    env = SatelliteNetworkEnv(config, load_strategies(DEFAULT_STRATEGIES)[0][1])
+    plan = ContactPlan.from_network(env, config.SIMULATION_STEPS)
+    router = ContactGraphRouter(plan, env.is_geo)
+    elapsed = time.perf_counter() - start_time
+    print(f"コンタクトプラン: {len(plan)}件のコンタクト, 経路表の作成 {elapsed:.2f}秒")
+    return router
+
+
+def run_network_experiment(config, strategies=None, seed=0, router=None):
+    """
+    衛星ネットワーク環境で、各戦略をノードごとのスケジューラとして評価する。
+    routerを渡すと、コンタクトプランに基づく経路（Contact Graph Routing）で転送する。
+
+    Returns:
+        dict: {戦略の表示名: 配送成功率(%)}
+    """
+    print(f"=============== 実験開始: {config.NAME} ===============")
+    if strategies is None:
+        strategies = load_strategies(DEFAULT_STRATEGIES)
+
+    results = {}
+    for strategy_name, strategy_class in strategies:
+        print(f"\n--- 戦略 '{strategy_name}' の評価を開始 ---")
+        env = SatelliteNetworkEnv(config, strategy_class, seed=seed, router=router)
+        print(f"ノード数: GEO {env.num_geo} + LEO {env.num_leo}, リンク数: {len(env.link_src)}")
+
+        stats = {"generated": 0, "dropped": 0, "expired": 0, "forwarded": 0,
+                 "delivered": 0, "delivered_latency": 0}
+        start_time = time.perf_counter()
+        for step in range(config.SIMULATION_STEPS):
+            step_stats = env.advance(current_step=step)
+            for key in stats:
+                stats[key] += step_stats[key]
+        elapsed = time.perf_counter() - start_time
+
+        success_rate = stats["delivered"] / stats["generated"] * 100 if stats["generated"] else 0
+        results[strategy_name] = success_rate
+        print(f"結果: 総生成パケット数 = {stats['generated']}")
+        print(f"　　  配送パケット数　 = {stats['delivered']}")
+        print(f"　　  破棄パケット数　 = {stats['dropped']}")
+        print(f"　　  TTL切れ数　　　　= {stats['expired']}")
+        print(f"　　  総転送ホップ数　 = {stats['forwarded']}")
+        if stats["delivered"]:
+            print(f"　　  平均遅延　　　　 = {stats['delivered_latency'] / stats['delivered']:.2f}ステップ")
+        print(f"　　  配送成功率　　　 = {success_rate:.2f}%")
+        print(f"　　  実行時間　　　　 = {elapsed:.2f}秒")
+
+    print("\n=============== 全戦略の最終結果比較 ===============")
+    for strategy_name, success_rate in results.items():
+        print(f"{strategy_name:<30}: {success_rate:>6.2f}%")
+    print("=====================================================")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="衛星ネットワークでの転送戦略の比較実験")
+    parser.add_argument("--strategies", nargs="+", choices=NETWORK_STRATEGIES, default=DEFAULT_STRATEGIES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--steps", type=int, default=None)
+    parser.add_argument("--routing", choices=["hop", "cgr"], default="hop",
+                        help="hop: 毎ステップ最小ホップ経路を計算, cgr: コンタクトプランの経路表を使う")
+    args = parser.parse_args()
+
+    overrides = {} if args.steps is None else {"SIMULATION_STEPS": args.steps}
+    config = freeze(NetworkConfig, **overrides)
+    router = build_router(config) if args.routing == "cgr" else None
+    run_network_experiment(config, load_strategies(args.strategies), seed=args.seed, router=router)
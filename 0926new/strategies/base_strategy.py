@@ -1,11 +1,25 @@
 from abc import ABC, abstractmethod
+import numpy as np
 # environmentsフォルダのbase_envからBaseEnvをインポートして型ヒントに使う
 from environments.base_env import BaseEnv 
 
+def best_packet(env, scores):
+    """
+    スコアが最大のパケットの位置（同点ならバッファの前にあるもの）を、env.action_range()の中から選ぶ。
+    トラフィッククラスが複数あるときは、クラスのスケジューラが次に送るクラスの中から選ぶことになる。
+    """
+    start, end = env.action_range()
+    return start + int(np.argmax(scores[start:end]))
+
+
 class BaseStrategy(ABC):
     """
     全ての転送戦略クラスが継承すべき、基本となる設計図（抽象基底クラス）。
     """
+    # 戦略の版数。選択ロジックを変えたら上げると、結果キャッシュが無効になる
+    VERSION = 1
+    # 同じ設定・シードで同じ結果になる戦略だけ、結果をキャッシュしてよい
+    CACHEABLE = True
 
     @abstractmethod
     def __init__(self, config):
@@ -29,6 +43,44 @@ class BaseStrategy(ABC):
         """
         pass
 
+    # 実装が必須ではない
+    def score_packets(self, size, ttl, age):
+        """
+        バッファ内の全パケットの優先度（大きいほど先に送る）をNumPyの配列演算でまとめて計算する。
+        実装すると、環境がスコアの部分ソートで転送順を決めるので、
+        select_action()をパケットごとに呼ぶ必要がなくなる。
+        スコアは各パケット自身のサイズ・TTL・待ち時間だけから決まること
+        （他のパケットを送ると変わるようなスコアはselect_action()で実装する）。
+
+        Args:
+            size (np.ndarray): 各パケットのサイズ
+            ttl (np.ndarray): 各パケットの残りTTL
+            age (np.ndarray): 各パケットがバッファに入ってからのステップ数
+
+        Returns:
+            np.ndarray: 各パケットのスコア。配列で計算できない戦略はNone（デフォルト）
+        """
+        return None
+
+    # 実装が必須ではない
+    def select_rule(self, env: BaseEnv):
+        """
+        このステップの転送に使う規則（score_packets()を持つ戦略）を返す。
+        ステップごとに規則を切り替える戦略（macroモードのDQNなど）が実装する。
+        デフォルトでは戦略自身を返す。
+        """
+        return self
+
+    # 実装が必須ではない
+    def packet_priorities(self, env: BaseEnv):
+        """
+        バッファ内の各パケットの優先度（大きいほど先）を返す。
+        select_action()で1つずつ送った後の残り帯域幅に詰め込むとき（env.fill_residual()）に、
+        詰め込む順をこの戦略の優先順にそろえるために使う。
+        デフォルトではselect_rule()の規則のscore_packets()。計算できなければNone（バッファの前にあるほど優先）
+        """
+        return self.select_rule(env).score_packets(*env.packet_columns())
+
     # 実装が必須ではない
     def train(self, env: BaseEnv):
         """
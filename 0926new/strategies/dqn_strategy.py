@@ -0,0 +1,247 @@
+import os
+import sys
+import torch
+
+from .base_strategy import BaseStrategy, best_packet
+from environments.geoleo_env import default_macro_rules, state_size
+
+# DQNエージェント本体（ネットワーク・リプレイバッファ・学習処理）は
+# リポジトリ直下のdqn_agent.pyを共有して使う
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+from dqn_agent import DqnAgent, device
+from offline_dataset import OfflineDataset, ensure_dataset, write_dataset
+
+
+class DqnStrategy(BaseStrategy):
+    """
+    転送戦略: DQN
+    学習済みのQネットワークが最も高いQ値を出した行動を選択する。
+    config.ACTION_MODEが"packet"（デフォルト）なら行動は転送するパケットの位置、
+    "macro"なら行動はそのステップで使う規則（FIFO・最小TTL優先など）で、推論はステップごとに1回で済む。
+    configにDQN_MODEL_PATHがあれば、その重みを読み込んで学習を省略する。
+    configにOFFLINE_DATASET_PATHがあれば、学習の前にヒューリスティック戦略の遷移のデータセットで
+    事前学習し、リプレイバッファにもその遷移を入れておく（データセットが無ければ最小TTL優先で作る）。
+    事前学習は新しいエージェントで1回だけ行い、チェックポイントから再開した学習では繰り返さない。
+    """
+    # 学習結果がネットワークの初期値に左右されるため、結果はキャッシュしない
+    CACHEABLE = False
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.action_mode = getattr(config, 'ACTION_MODE', 'packet')
+        # 状態はバッファ内の各パケットの(TTL, サイズ)（と帯域幅の予報）、行動は転送するパケットの位置か規則の番号
+        if self.action_mode == "macro":
+            self.macro_rules = default_macro_rules(config)
+            action_size = len(self.macro_rules)
+        else:
+            self.macro_rules = None
+            action_size = config.BUFFER_PACKET_LIMIT
+        self.agent = DqnAgent(state_size(config), action_size, config)
+        self.trained = False
+        self.warm_started = False
+
+        model_path = getattr(config, 'DQN_MODEL_PATH', None)
+        if model_path:
+            self.load(model_path)
+
+    def _q_values(self, env):
+        """Qネットワークが今の状態に出す、各行動のQ値"""
+        state_tensor = torch.tensor(env.get_state(), device=device, dtype=torch.float32).unsqueeze(0)
+        with torch.no_grad():
+            return self.agent.policy_net(state_tensor)[0]
+
+    def _best_action(self, env, num_candidates, start=0):
+        """Qネットワークで、start番目からnum_candidates番目の手前までの行動のうち、Q値が最大のものの順位を返す"""
+        return int(self._q_values(env)[start:num_candidates].argmax().item())
+
+    def select_rule(self, env):
+        """macroモードでは、このステップで使う規則をQネットワークで選ぶ"""
+        if self.action_mode != "macro":
+            return self
+        return self.macro_rules[self._best_action(env, len(self.macro_rules))]
+
+    def select_action(self, env):
+        """
+        次に取るべき行動(action)を決定して返す。
+        """
+        if not env.buffer:
+            return None
+
+        if self.action_mode == "macro":
+            rule = self.select_rule(env)
+            return best_packet(env, rule.score_packets(*env.packet_columns()))
+        # バッファに実在するパケット（クラスが複数あれば、スケジューラが次に送るクラスのパケット）の中から、
+        # Q値が最大のものを選ぶ
+        start, end = env.action_range()
+        return start + self._best_action(env, min(end, self.agent.action_size), start)
+
+    def packet_priorities(self, env):
+        """packetモードでは、各パケットの位置の行動のQ値を優先度にする（残り帯域幅への詰め込み用）"""
+        if self.action_mode == "macro":
+            return super().packet_priorities(env)
+        return self._q_values(env)[:len(env.buffer)].cpu().numpy()
+
+    def train(self, env, num_steps=None):
+        """
+        環境のstep()を使って、ε-greedyでQネットワークを学習する。
+
+        Args:
+            env (BaseEnv): 学習に使う環境（action_modeはこの戦略と同じであること）
+            num_steps (int): 学習するシミュレーションのステップ数（省略時はconfig.SIMULATION_STEPS）
+        """
+        if self.trained:
+            return
+        if num_steps is None:
+            num_steps = self.config.SIMULATION_STEPS
+
+        agent = self.agent
+        dataset_path = getattr(self.config, 'OFFLINE_DATASET_PATH', None)
+        if dataset_path and not self.warm_started:
+            self.warm_start(dataset_path)
+        steps_before = 0  # 前のエピソードまでに進んだステップ数
+        next_target_update = self.config.TARGET_UPDATE_FREQUENCY
+        state, _ = env.reset()
+        while True:
+            # 行動を選び、転送と時間の経過をまとめて進める
+            # クラスが複数あれば、スケジューラが次に送るクラスのパケットの中から選ぶ
+            action_tensor = agent.select_action(state, action_range=action_range(env))
+            next_state, reward, terminated, truncated, _ = env.step(action_tensor.item(),
+                                                                    priority=self.packet_priorities)
+            agent.remember(state, action_tensor, torch.tensor([reward], device=device), next_state)
+            state = next_state
+            agent.learn()
+
+            # ターゲットネットワークの更新（シミュレーションのステップ数で数える）
+            steps_run = steps_before + env.current_step + 1
+            # （TARGET_UPDATE_TAUを設定した場合は、agent.learn()の中で毎回少しずつ更新される）
+            if steps_run >= next_target_update:
+                if agent.target_tau is None:
+                    agent.update_target()
+                next_target_update += self.config.TARGET_UPDATE_FREQUENCY
+
+            if steps_run >= num_steps:
+                agent.end_episode()
+                break
+            if terminated or truncated:
+                # 環境の最後まで進んだら、リセットして学習を続ける
+                agent.end_episode()
+                steps_before = steps_run
+                state, _ = env.reset()
+
+        self.trained = True
+
+    def warm_start(self, path):
+        """pathのオフラインデータセット（無ければ最小TTL優先の戦略で作る）で事前学習し、リプレイバッファに入れる"""
+        ensure_offline_dataset(self.config, path)
+        seeded = self.agent.warm_start(OfflineDataset(path))
+        self.warm_started = True
+        print(f"オフラインデータセットで事前学習しました: {path}（リプレイバッファに{seeded}件）")
+
+    def save(self, path):
+        """Qネットワークの重みを保存する"""
+        torch.save(self.agent.policy_net.state_dict(), path)
+
+    def load(self, path):
+        """保存済みの重みを読み込み、学習済みとして扱う"""
+        state_dict = torch.load(path, map_location=device)
+        self.agent.policy_net.load_state_dict(state_dict)
+        self.agent.target_net.load_state_dict(state_dict)
+        self.trained = True
+
+    def save_checkpoint(self, path):
+        """学習を後から再開できるよう、ネットワーク・最適化器・行動選択回数・リプレイバッファを保存する"""
+        torch.save({
+            "policy_net": self.agent.policy_net.state_dict(),
+            "target_net": self.agent.target_net.state_dict(),
+            "optimizer": self.agent.optimizer.state_dict(),
+            "steps_done": self.agent.steps_done,
+            "epsilon_start": self.agent.epsilon_start,
+            "warm_started": self.warm_started,
+            "replay_buffer": self.agent.buffer.state_dict(),
+        }, path)
+
+    def load_checkpoint(self, path):
+        """save_checkpoint()で保存した状態を読み込む（続けてtrain()で学習を再開できる）"""
+        checkpoint = torch.load(path, map_location=device)
+        self.agent.policy_net.load_state_dict(checkpoint["policy_net"])
+        self.agent.target_net.load_state_dict(checkpoint["target_net"])
+        self.agent.optimizer.load_state_dict(checkpoint["optimizer"])
+        self.agent.steps_done = checkpoint["steps_done"]
+        self.agent.epsilon_start = checkpoint.get("epsilon_start", self.agent.epsilon_start)
+        # 再開したエージェントは新しくないので、フラグの無い古いチェックポイントでも事前学習し直さない
+        self.warm_started = checkpoint.get("warm_started", True)
+        if "replay_buffer" in checkpoint:
+            # 再開してもバッチサイズ分の経験が溜まるまで学習が止まらないよう、経験も戻す
+            self.agent.buffer.load_state_dict(checkpoint["replay_buffer"])
+        self.trained = False
+
+
+def action_range(env):
+    """
+    packetモードでクラスが複数あるときに、エージェントが選んでよい行動の区間（env.action_range()）。
+    それ以外はNone（全ての行動から選ぶ）
+    """
+    if env.action_mode == "macro" or env.class_scheduler is None:
+        return None
+    return env.action_range()
+
+
+def heuristic_policy(strategy, env):
+    """
+    ヒューリスティック戦略の選択を、envの行動（packetモードはパケットの位置、macroモードは規則の番号）に直す関数を返す。
+    macroモードでは、戦略と同じクラスの規則がenv.macro_rulesに含まれている必要がある。
+    """
+    if env.action_mode != "macro":
+        return strategy.select_action
+    for index, rule in enumerate(env.macro_rules):
+        if type(rule) is type(strategy):
+            return lambda env: index
+    raise ValueError(f"{type(strategy).__name__}はmacroモードの規則にありません")
+
+
+def ensure_offline_dataset(config, path=None):
+    """
+    オフラインデータセット（省略時はconfig.OFFLINE_DATASET_PATH）が書き終えた状態で無ければ
+    （途中で止まったものも含めて）、最小TTL優先の戦略で作る。
+    並列に学習するときは、ワーカーが同じファイルを同時に書かないよう、親プロセスで先に呼んでおく。
+    """
+    path = path or getattr(config, 'OFFLINE_DATASET_PATH', None)
+    if path:
+        from strategies.simple_strategies import ShortestTtlFirstStrategy
+        ensure_dataset(path, lambda path: make_offline_dataset(
+            config, path, [ShortestTtlFirstStrategy], getattr(config, 'OFFLINE_DATASET_STEPS', 20000)))
+    return path
+
+
+def make_offline_dataset(config, path, strategy_classes, num_steps, seed=None):
+    """
+    ヒューリスティック戦略をそれぞれnum_stepsステップ動かし、その遷移（状態, 行動, 報酬, 次の状態）を
+    pathのオフラインデータセット（memmapで読むファイル）に書き出す。ニューラルネットワークは使わないので、
+    シミュレータの速さのまま作れる。
+
+    Args:
+        config: 実験設定（状態・行動の種類はDqnStrategyと同じになる）
+        path (str): 保存先のフォルダ
+        strategy_classes (list): 行動を記録する戦略のクラス
+        num_steps (int): 戦略ごとのシミュレーションのステップ数
+        seed (int): 到着系列のシード（戦略ごとにseed, seed+1, ...を使う。省略時はランダム）
+
+    Returns:
+        int: 書き出した遷移の数
+    """
+    # 循環しないよう、環境は使う時に読み込む
+    from environments.geoleo_env import GeoLeoEnv
+
+    sources = []
+    for strategy_class in strategy_classes:
+        env = GeoLeoEnv(config)
+        strategy = strategy_class(config)
+        sources.append((env, heuristic_policy(strategy, env), strategy.packet_priorities))
+    names = [strategy_class.__name__ for strategy_class in strategy_classes]
+    num_transitions = write_dataset(path, state_size(config), sources, num_steps, seed=seed,
+                                    config=getattr(config, 'NAME', None),
+                                    action_mode=getattr(config, 'ACTION_MODE', 'packet'), strategies=names)
+    print(f"オフラインデータセットを作りました: {path}（{', '.join(names)}, {num_transitions}遷移）")
+    return num_transitions
@@ -0,0 +1,53 @@
+import math
+import random
+
+from .base_strategy import BaseStrategy, best_packet
+from environments.geoleo_env import default_macro_rules
+
+
+class RolloutStrategy(BaseStrategy):
+    """
+    転送戦略: ロールアウト（先読み）
+    ステップごとに、候補の規則（FIFO・最小TTL優先など）それぞれについて環境を複製し、
+    その規則で数ステップ先までシミュレーションした転送数の平均が最も多い規則を選ぶ。
+    複製の到着系列は乱数で作り直す（本物の未来の到着は使わない）。
+    configのROLLOUT_HORIZON（先読みステップ数）・ROLLOUT_COUNT（1規則あたりの試行数）・
+    ROLLOUT_SEEDで調整できる。
+    """
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.rules = default_macro_rules(config)
+        self.horizon = getattr(config, 'ROLLOUT_HORIZON', 5)
+        self.num_rollouts = getattr(config, 'ROLLOUT_COUNT', 4)
+        self.rng = random.Random(getattr(config, 'ROLLOUT_SEED', 0))
+
+    def select_rule(self, env):
+        """このステップで使う規則を、先読みシミュレーションで選ぶ"""
+        # 全ての規則を同じ到着系列の組で比べる（共通乱数）ので、少ない試行数でも差がはっきりする
+        seeds = [self.rng.getrandbits(32) for _ in range(self.num_rollouts)]
+        best_rule, best_value = self.rules[0], -math.inf
+        for rule in self.rules:
+            value = sum(self._rollout(env.clone(seed=seed), rule) for seed in seeds)
+            if value > best_value:
+                best_rule, best_value = rule, value
+        return best_rule
+
+    def select_action(self, env):
+        """
+        次に取るべき行動(action)を決定して返す。
+        """
+        if not env.buffer:
+            return None
+        rule = self.select_rule(env)
+        return best_packet(env, rule.score_packets(*env.packet_columns()))
+
+    def _rollout(self, env, rule):
+        """複製した環境でruleを使い続け、horizonステップ先までの転送数を返す"""
+        _, transmitted = env.transmit_ranked(rule.score_packets(*env.packet_columns()))
+        for _ in range(self.horizon):
+            env.update_time(current_step=env.current_step + 1)
+            if env.remaining_bandwidth > 0 and env.buffer:
+                _, count = env.transmit_ranked(rule.score_packets(*env.packet_columns()))
+                transmitted += count
+        return transmitted
@@ -1,13 +1,12 @@
-from .base_strategy import BaseStrategy
+from .base_strategy import BaseStrategy, best_packet
 
-class FifoStrategy(BaseStrategy):
+class ScoredStrategy(BaseStrategy):
     """
-    転送戦略: FIFO (First-In, First-Out)
-    バッファに最も古くから存在するパケット（キューの先頭）を常に選択する。
+    score_packets()で計算したスコアが最大のパケットを選ぶ戦略の共通部分。
+    子クラスはscore_packets()に配列の式を書くだけでよい。
     """
-    
+
     def __init__(self, config):
-        # 親クラスの初期化処理を呼び出す
         super().__init__(config)
 
     def select_action(self, env):
@@ -18,35 +17,55 @@ class FifoStrategy(BaseStrategy):
         if not env.buffer:
             # 送るべきパケットがないので、何もしない (Noneを返す)
             return None
-        
-        # 2. バッファの先頭（インデックス0）をactionとして選択
-        # これが最も古くからキューイングされているパケットになる
-        return 0
 
-class ShortestTtlFirstStrategy(BaseStrategy):
+        # 2. 全パケットのスコアを計算し、最大のもの（同点ならバッファの前にあるもの）を選ぶ
+        return best_packet(env, self.score_packets(*env.packet_columns()))
+
+class FifoStrategy(ScoredStrategy):
     """
-    転送戦略: 最小TTL優先 (Shortest TTL First)
-    バッファ内で最もTTLが小さいパケットを選択する。
+    転送戦略: FIFO (First-In, First-Out)
+    バッファに最も古くから存在するパケット（キューの先頭）を常に選択する。
     """
 
-    def __init__(self, config):
-        super().__init__(config)
-
     def select_action(self, env):
         """
         次に取るべき行動(action)を決定して返す。
         """
-        # 1. バッファが空かどうかをチェック
         if not env.buffer:
             return None
-            
-        # 2. バッファ内の全パケットを調べて、最もTTLが小さいパケットを見つける
-        min_ttl_packet = min(env.buffer, key=lambda packet: packet.ttl)
-        
-        # 3. 見つけたパケットのバッファ内でのインデックス(何番目か)を取得してactionとして返す
-        try:
-            action = list(env.buffer).index(min_ttl_packet)
-            return action
-        except ValueError:
-            # 非常に稀だが、探索中にパケットが消えた場合
-            return None
\ No newline at end of file
+        # バッファの先頭（インデックス0）が最も古くからキューイングされているパケット
+        # （クラスが複数あれば、スケジューラが次に送るクラスの先頭）
+        return env.action_range()[0]
+
+    def score_packets(self, size, ttl, age):
+        # 待ち時間が長いほど先（同じステップに来たものは到着順）
+        return age
+
+class ShortestTtlFirstStrategy(ScoredStrategy):
+    """
+    転送戦略: 最小TTL優先 (Shortest TTL First)
+    バッファ内で最もTTLが小さいパケットを選択する。
+    """
+
+    def score_packets(self, size, ttl, age):
+        return -ttl
+
+class SmallestSizeFirstStrategy(ScoredStrategy):
+    """
+    転送戦略: 最小サイズ優先 (Smallest Size First)
+    バッファ内で最もサイズが小さいパケットを選択する。
+    帯域幅あたりの転送数が最も多くなる。
+    """
+
+    def score_packets(self, size, ttl, age):
+        return -size
+
+class ValueDensityStrategy(ScoredStrategy):
+    """
+    転送戦略: 価値密度優先 (Value Density)
+    「締切の近さ ÷ サイズ」が最大のパケットを選択する。
+    TTLが小さく、かつ帯域幅を食わないパケットほど先に送る。
+    """
+
+    def score_packets(self, size, ttl, age):
+        return 1.0 / (ttl * size)
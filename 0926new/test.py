@@ -1,42 +1,32 @@
-import math
+import sys
 import numpy as np
-from configs.experiment_configs import ConfigA, DqnTrainConfig
-import matplotlib.pyplot as plt
-from utils.link_models import calculate_shannon_capacity
+from configs.experiment_configs import DqnTrainConfig
+from utils.link_models import calculate_shannon_capacity_series
+from utils.plotting import plot_series
 
-# --- ▼▼▼ 変更点 ▼▼▼ ---
 # main関数もconfigオブジェクトを引数として受け取る
-def main(config):
-    """シミュレーションを実行し、結果をプロットする"""
+def main(config, path="link_capacity.png"):
+    """シミュレーションを実行し、結果を画像ファイルにプロットする"""
     print(f"--- {config.NAME} の設定でリンク容量シミュレーションを実行 ---")
-    
-    timesteps = list(range(config.SIMULATION_STEPS))
-    # calculate_link_capacityにconfigを渡す
-    capacities = [calculate_shannon_capacity(step, config) for step in timesteps]
 
-    for step in timesteps:
-        if step % (config.SIMULATION_STEPS // 4) == 0:
-            print(f"ステップ {step:>4}: リンク容量 = {capacities[step]:.2f} Mbps")
+    timesteps = np.arange(config.SIMULATION_STEPS)
+    # 全ステップのリンク容量を配列でまとめて計算
+    capacities = calculate_shannon_capacity_series(timesteps, config)
+
+    for step in timesteps[::max(config.SIMULATION_STEPS // 4, 1)]:
+        print(f"ステップ {step:>4}: リンク容量 = {capacities[step]:.2f} Mbps")
 
     print("シミュレーション完了")
-    
-    plt.figure(figsize=(10, 6))
-    plt.plot(timesteps, capacities)
-    plt.title(f"Link Capacity ({config.NAME})")
-    plt.xlabel("Simulation Step")
-    plt.ylabel("Capacity (Mbps)")
-    plt.grid(True)
-    plt.ylim(bottom=0)
-    plt.show()
-# --- ▲▲▲ 変更点 ▲▲▲ ---
+
+    # 点数を間引いてからファイルに描く（画面のないサーバーでも動き、表示を待たない）
+    plot_series(path, [(None, timesteps, capacities)], title=f"Link Capacity ({config.NAME})",
+                ylabel="Capacity (Mbps)", ymin=0)
+    print(f"プロットを保存しました: {path}")
 
 
 if __name__ == "__main__":
-    # --- ▼▼▼ 変更点 ▼▼▼ ---
     # 1. ここで実行したい設定クラスを選択する
-    config_to_run = ConfigA()
-    # config_to_run = DqnTrainConfig() # こちらの行のコメントを外せばDQN用の設定で試せる
+    config_to_run = DqnTrainConfig()
 
-    # 2. 選択した設定オブジェクトをmain関数に渡して実行
-    main(config=config_to_run)
-    # --- ▲▲▲ 変更点 ▲▲▲ ---
\ No newline at end of file
+    # 2. 選択した設定オブジェクトをmain関数に渡して実行（引数で保存先を変えられる）
+    main(config=config_to_run, path=sys.argv[1] if len(sys.argv) > 1 else "link_capacity.png")
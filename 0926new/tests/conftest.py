@@ -0,0 +1,5 @@
+import os
+import sys
+
+# テストからも、0926newを起点にしたimport（environments・utils・strategiesなど）を使う
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+
+from configs.experiment_configs import DqnTrainConfig
+from configs.frozen import freeze
+from environments.geoleo_env import GeoLeoEnv
+from environments.packet_buffer import PacketBuffer
+from main0926 import simulate_strategy
+from strategies.simple_strategies import FifoStrategy, ShortestTtlFirstStrategy, ValueDensityStrategy
+from test_residual_packing import PerPacket
+from utils.class_scheduling import StrictPriorityScheduler, WeightedFairScheduler
+
+
+def class_config(**overrides):
+    """2クラス（優先クラス3割）で、帯域幅の足りない負荷の設定"""
+    settings = dict(SIMULATION_STEPS=300, PACKET_TTL_RANGE=(5, 20), MAX_PACKETS_PER_STEP=250,
+                    BUFFER_BYTE_LIMIT=5000, TRAFFIC_CLASS_SHARES=(0.3, 0.7))
+    settings.update(overrides)
+    return freeze(DqnTrainConfig, **settings)
+
+
+@pytest.mark.parametrize("packing_mode", [None, "knapsack"])
+@pytest.mark.parametrize("strategy_class", [FifoStrategy, ShortestTtlFirstStrategy, ValueDensityStrategy])
+def test_per_packet_strict_priority_matches_ranked(strategy_class, packing_mode):
+    config = class_config(CLASS_SCHEDULING="strict", PACKING_MODE=packing_mode)
+    strategy = strategy_class(config)
+    ranked_env, per_packet_env = GeoLeoEnv(config, seed=1), GeoLeoEnv(config, seed=1)
+    ranked = simulate_strategy(ranked_env, strategy, config.SIMULATION_STEPS)
+    per_packet = simulate_strategy(per_packet_env, PerPacket(strategy), config.SIMULATION_STEPS)
+    assert per_packet == ranked
+    assert (per_packet_env.class_stats["transmitted"] == ranked_env.class_stats["transmitted"]).all()
+
+
+@pytest.mark.parametrize("scheduling", ["strict", "wfq"])
+def test_per_packet_actions_are_limited_to_the_served_class(scheduling):
+    env = GeoLeoEnv(class_config(CLASS_SCHEDULING=scheduling), seed=2)
+    env.reset()
+    while env.buffer.backlog != 0b11:
+        env.update_time(env.current_step + 1)
+    start, end = env.action_range()
+    served = int(env.buffer.traffic_class[start])
+    assert (env.buffer.traffic_class[start:end] == served).all()
+
+    outside = end if start == 0 else 0
+    assert env.transmit_packet(outside) == (-20, 0, False)
+    _, transmitted, _ = env.transmit_packet(start)
+    assert transmitted == 1
+    assert env.class_stats["transmitted"][served] == 1
+
+
+# --- スケジューラ単体 ---
+MAX_SIZE = 10
+
+
+def saturated_buffer(rng, buffer, backlog=60):
+    """どのクラスもbacklog個以上のパケットを持つよう、足りない分を到着させる"""
+    for traffic_class in range(buffer.num_classes):
+        for _ in range(backlog - buffer.class_count(traffic_class)):
+            buffer.append(0, int(rng.integers(5, MAX_SIZE + 1)), 5, 0, traffic_class)
+
+
+def run_ranked(scheduler, num_classes=2, steps=400):
+    """全クラスが送りきれない負荷でselect()を繰り返し、クラスごとに送ったサイズの合計を返す"""
+    rng = np.random.default_rng(0)
+    buffer = PacketBuffer(num_classes=num_classes)
+    sent_bytes = np.zeros(num_classes)
+    for _ in range(steps):
+        saturated_buffer(rng, buffer)
+        bandwidth = int(rng.integers(30, 150))
+        sent = scheduler.select(buffer, rng.random(len(buffer)), bandwidth)
+        used = int(buffer.size[sent].sum())
+        assert len(set(sent.tolist())) == len(sent)
+        assert used <= bandwidth
+        # 送りきれない負荷なので、残るのは最大のパケットサイズ未満だけ
+        assert bandwidth - used < MAX_SIZE
+        np.add.at(sent_bytes, buffer.traffic_class[sent], buffer.size[sent])
+        keep = np.ones(len(buffer), dtype=bool)
+        keep[sent] = False
+        buffer.keep(keep)
+    return sent_bytes
+
+
+def test_strict_priority_serves_only_the_top_class_when_it_is_saturated():
+    sent_bytes = run_ranked(StrictPriorityScheduler())
+    assert sent_bytes[1] == 0
+
+
+@pytest.mark.parametrize("weights", [(1, 1), (3, 1), (1, 2, 5)])
+def test_weighted_fair_shares_follow_weights(weights):
+    scheduler = WeightedFairScheduler(weights, MAX_SIZE)
+    sent_bytes = run_ranked(scheduler, num_classes=len(weights))
+    np.testing.assert_allclose(sent_bytes / sent_bytes.sum(), np.array(weights) / sum(weights), atol=0.02)
+    # 持ち越すクレジットは最大のパケットサイズまで
+    assert max(scheduler.credits) <= MAX_SIZE
+
+
+def test_weighted_fair_per_packet_shares_follow_weights():
+    rng = np.random.default_rng(0)
+    scheduler = WeightedFairScheduler((3, 1), MAX_SIZE)
+    buffer = PacketBuffer(num_classes=2)
+    sent_bytes = np.zeros(2)
+    for _ in range(4000):
+        saturated_buffer(rng, buffer)
+        traffic_class = scheduler.serving_class(buffer)
+        position = buffer.class_range(traffic_class)[0]
+        size = int(buffer.size[position])
+        scheduler.charge(buffer, traffic_class, size)
+        sent_bytes[traffic_class] += size
+        buffer.remove_at(position)
+    np.testing.assert_allclose(sent_bytes / sent_bytes.sum(), [0.75, 0.25], atol=0.02)
+
+
+def test_weighted_fair_copy_keeps_credits_apart():
+    scheduler = WeightedFairScheduler((3, 1), MAX_SIZE)
+    run_ranked(scheduler, steps=3)
+    copy = scheduler.copy()
+    assert copy.get_state() == scheduler.get_state()
+    copy.credits[0] += 1
+    assert copy.get_state() != scheduler.get_state()
+    copy.set_state(scheduler.get_state())
+    assert copy.get_state() == scheduler.get_state()
+
+
+# --- 環境での成功率（帯域幅が足りない負荷） ---
+def class_success_rates(scheduling, weights=None):
+    config = class_config(MAX_PACKETS_PER_STEP=300, PACKET_TTL_RANGE=(5, 5), TRAFFIC_CLASS_SHARES=(0.5, 0.5),
+                          CLASS_SCHEDULING=scheduling, TRAFFIC_CLASS_WEIGHTS=weights)
+    env = GeoLeoEnv(config, seed=1)
+    simulate_strategy(env, ShortestTtlFirstStrategy(config), config.SIMULATION_STEPS)
+    return env.class_stats["transmitted"] / env.class_stats["generated"]
+
+
+def test_class_success_rates_under_binding_load():
+    strict = class_success_rates("strict")
+    weighted = class_success_rates("wfq", (3, 1))
+    equal = class_success_rates("wfq", (1, 1))
+    assert strict[0] > 0.99 and strict[1] < 0.7
+    assert weighted[0] > 0.95 and weighted[1] < 0.7
+    assert strict[0] >= weighted[0] and strict[1] <= weighted[1]
+    assert abs(equal[0] - equal[1]) < 0.02 and equal[0] < weighted[0]
@@ -0,0 +1,20 @@
+import pytest
+
+from configs.experiment_configs import BaseConfig, DqnTrainConfig, NetworkConfig
+from configs.frozen import NETWORK_REQUIRED_FIELDS, freeze, require_fields
+
+
+class NoByteLimitConfig(BaseConfig):
+    MAX_PACKETS_PER_STEP = 5
+    BUFFER_PACKET_LIMIT = 20
+
+
+def test_missing_byte_limit_is_rejected_up_front():
+    with pytest.raises(ValueError, match="BUFFER_BYTE_LIMIT"):
+        freeze(NoByteLimitConfig)
+
+
+def test_network_fields_are_checked_only_for_the_network():
+    require_fields(freeze(NetworkConfig), NETWORK_REQUIRED_FIELDS)
+    with pytest.raises(ValueError, match="NUM_GEO_SATELLITES"):
+        require_fields(freeze(DqnTrainConfig), NETWORK_REQUIRED_FIELDS)
@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+from configs.experiment_configs import DqnTrainConfig
+from configs.frozen import freeze
+from strategies.dqn_strategy import ensure_offline_dataset
+from offline_dataset import OfflineDataset, OfflineDatasetWriter, dataset_complete
+
+
+def test_interrupted_write_leaves_no_meta(tmp_path):
+    path = str(tmp_path / "dataset")
+    with pytest.raises(KeyboardInterrupt):
+        with OfflineDatasetWriter(path, 4) as writer:
+            writer.add_state([1, 2, 0, 0])
+            raise KeyboardInterrupt
+    assert os.path.isdir(path)
+    assert not dataset_complete(path)
+
+
+def test_ensure_rebuilds_an_incomplete_dataset(tmp_path):
+    config = freeze(DqnTrainConfig, BUFFER_PACKET_LIMIT=30, OFFLINE_DATASET_STEPS=50)
+    path = str(tmp_path / "dataset")
+    os.makedirs(path)
+    with open(os.path.join(path, "transitions.bin"), "wb") as f:
+        f.write(b"partial")
+
+    ensure_offline_dataset(config, path)
+    dataset = OfflineDataset(path)
+    assert len(dataset) > 0
+
+    # 書き終えたデータセットは作り直さない
+    mtime = os.path.getmtime(os.path.join(path, "meta.json"))
+    ensure_offline_dataset(config, path)
+    assert os.path.getmtime(os.path.join(path, "meta.json")) == mtime
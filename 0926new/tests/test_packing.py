@@ -0,0 +1,81 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from utils.packing import _best_fit, _bounded_knapsack, pack_residual, top_ranked
+
+
+def brute_force_best(class_sizes, counts, residual):
+    """全ての個数の組み合わせから、残り帯域幅以下で最大の合計サイズを求める"""
+    best = 0
+    for take in itertools.product(*(range(count + 1) for count in counts)):
+        total = sum(t * size for t, size in zip(take, class_sizes))
+        if total <= residual:
+            best = max(best, total)
+    return best
+
+
+def random_multisets(count=300):
+    rng = np.random.default_rng(0)
+    for _ in range(count):
+        num_sizes = int(rng.integers(1, 5))
+        class_sizes = np.sort(rng.choice(np.arange(1, 16), size=num_sizes, replace=False))
+        counts = rng.integers(1, 8, size=num_sizes)
+        residual = int(rng.integers(1, 60))
+        yield class_sizes, counts, residual
+
+
+def test_knapsack_is_optimal():
+    for class_sizes, counts, residual in random_multisets():
+        take = _bounded_knapsack(class_sizes, counts, residual)
+        assert (0 <= take).all() and (take <= counts).all()
+        total = int((take * class_sizes).sum())
+        assert total <= residual
+        assert total == brute_force_best(class_sizes, counts, residual)
+
+
+def test_best_fit_is_feasible_and_never_beats_knapsack():
+    for class_sizes, counts, residual in random_multisets():
+        take = _best_fit(class_sizes, counts, residual)
+        assert (0 <= take).all() and (take <= counts).all()
+        total = int((take * class_sizes).sum())
+        assert total <= residual
+        assert total <= brute_force_best(class_sizes, counts, residual)
+        # 何も入らない状態で止まっている（もう1つ入るサイズが残っていない）
+        left = residual - total
+        assert not ((take < counts) & (class_sizes <= left)).any()
+
+
+@pytest.mark.parametrize("mode", ["best_fit", "knapsack"])
+def test_pack_residual_fills_optimally_and_respects_priority(mode):
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        n = int(rng.integers(1, 15))
+        sizes = rng.integers(1, 8, size=n)
+        scores = rng.integers(0, 5, size=n).astype(float)  # 同点も含める
+        available = rng.random(n) < 0.8
+        residual = int(rng.integers(1, 30))
+        packed = pack_residual(sizes, scores, available, residual, mode)
+
+        assert available[packed].all()
+        assert len(set(packed.tolist())) == len(packed)
+        total = int(sizes[packed].sum())
+        assert total <= residual
+        if mode == "knapsack":
+            class_sizes, counts = np.unique(sizes[available & (sizes <= residual)], return_counts=True)
+            assert total == (brute_force_best(class_sizes, counts, residual) if len(counts) else 0)
+
+        # 送る順は優先度の高い順（同点なら前にあるもの）
+        assert (np.diff(-scores[packed]) >= 0).all()
+        # 同じサイズの中では、優先度の高い順（同点なら前にあるもの）に選ばれている
+        for size in np.unique(sizes[packed]):
+            same = np.flatnonzero(available & (sizes == size))
+            chosen = packed[sizes[packed] == size]
+            assert sorted(chosen.tolist()) == sorted(same[top_ranked(scores[same], len(chosen))].tolist())
+
+
+def test_pack_residual_without_scores_takes_buffer_order():
+    sizes = np.array([3, 5, 3, 5, 3])
+    packed = pack_residual(sizes, None, np.ones(5, dtype=bool), 6, "knapsack")
+    assert packed.tolist() == [0, 2]
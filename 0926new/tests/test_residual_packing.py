@@ -0,0 +1,35 @@
+import pytest
+
+from configs.experiment_configs import DqnTrainConfig
+from configs.frozen import freeze
+from environments.geoleo_env import GeoLeoEnv
+from main0926 import simulate_strategy
+from strategies.base_strategy import BaseStrategy
+from strategies.simple_strategies import (FifoStrategy, ShortestTtlFirstStrategy,
+                                          SmallestSizeFirstStrategy, ValueDensityStrategy)
+
+
+class PerPacket(BaseStrategy):
+    """score_packets()を隠して、simulate_strategy()にselect_action()で1つずつ送らせる戦略"""
+    def __init__(self, strategy):
+        super().__init__(strategy.config)
+        self.strategy = strategy
+
+    def select_action(self, env):
+        return self.strategy.select_action(env)
+
+    def packet_priorities(self, env):
+        return self.strategy.packet_priorities(env)
+
+
+@pytest.mark.parametrize("packing_mode", ["best_fit", "knapsack"])
+@pytest.mark.parametrize("strategy_class", [FifoStrategy, ShortestTtlFirstStrategy,
+                                            SmallestSizeFirstStrategy, ValueDensityStrategy])
+def test_per_packet_and_ranked_paths_deliver_the_same(strategy_class, packing_mode):
+    # 帯域幅が足りず、毎ステップ残り帯域幅への詰め込みが起きる負荷にする
+    config = freeze(DqnTrainConfig, SIMULATION_STEPS=300, PACKING_MODE=packing_mode, PACKET_TTL_RANGE=(5, 20),
+                    MAX_PACKETS_PER_STEP=250, BUFFER_BYTE_LIMIT=5000)
+    strategy = strategy_class(config)
+    ranked = simulate_strategy(GeoLeoEnv(config, seed=3), strategy, config.SIMULATION_STEPS)
+    per_packet = simulate_strategy(GeoLeoEnv(config, seed=3), PerPacket(strategy), config.SIMULATION_STEPS)
+    assert per_packet == ranked
@@ -0,0 +1,28 @@
+import os
+
+import utils.result_cache as result_cache
+from strategies.rollout_strategy import RolloutStrategy
+from strategies.simple_strategies import ShortestTtlFirstStrategy
+
+
+class OutsideStrategy(ShortestTtlFirstStrategy):
+    """strategiesの外で定義した戦略"""
+
+
+def _hashed_files(monkeypatch, strategy_class):
+    hashed = []
+    monkeypatch.setattr(result_cache, "_hash_file", lambda hasher, path: hashed.append(os.path.abspath(path)))
+    result_cache.code_version(strategy_class)
+    return hashed
+
+
+def test_code_version_covers_strategy_sources(monkeypatch):
+    strategies_dir = os.path.join(result_cache._PACKAGE_ROOT, "strategies")
+    # 先読みの規則（simple_strategies）と基底クラスも、ロールアウト戦略の結果に影響する
+    hashed = _hashed_files(monkeypatch, RolloutStrategy)
+    for name in ("base_strategy.py", "simple_strategies.py", "rollout_strategy.py"):
+        assert os.path.join(strategies_dir, name) in hashed
+    assert len(hashed) == len(set(hashed))
+
+    # strategiesの外で定義した戦略は、そのファイルも対象になる
+    assert os.path.abspath(__file__) in _hashed_files(monkeypatch, OutsideStrategy)
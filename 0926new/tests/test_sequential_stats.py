@@ -0,0 +1,40 @@
+import pytest
+
+from utils.sequential_stats import BatchMeans, mean_confidence_interval, t_quantile
+
+# t分布表の両側点（自由度, 90%, 95%, 99%）
+T_TABLE = [
+    (1, 6.314, 12.706, 63.657),
+    (2, 2.920, 4.303, 9.925),
+    (3, 2.353, 3.182, 5.841),
+    (4, 2.132, 2.776, 4.604),
+    (5, 2.015, 2.571, 4.032),
+    (7, 1.895, 2.365, 3.499),
+    (10, 1.812, 2.228, 3.169),
+    (20, 1.725, 2.086, 2.845),
+    (30, 1.697, 2.042, 2.750),
+    (60, 1.671, 2.000, 2.660),
+    (120, 1.658, 1.980, 2.617),
+]
+
+
+@pytest.mark.parametrize("df, t90, t95, t99", T_TABLE)
+def test_t_quantile_matches_table(df, t90, t95, t99):
+    assert t_quantile(df, 0.90) == pytest.approx(t90, abs=1e-3)
+    assert t_quantile(df, 0.95) == pytest.approx(t95, abs=1e-3)
+    assert t_quantile(df, 0.99) == pytest.approx(t99, abs=1e-3)
+
+
+def test_interval_of_two_batches_uses_the_exact_quantile():
+    # 差の標本が2個（自由度1）でも、半幅は t(1) * s / sqrt(n)
+    mean, half_width = mean_confidence_interval([1.0, 3.0])
+    assert mean == 2.0
+    assert half_width == pytest.approx(12.706, abs=1e-3)
+
+    stats = BatchMeans(["a", "b"])
+    for a, b in [(50, 48), (52, 48), (51, 50)]:
+        stats.add("a", a, 100)
+        stats.add("b", b, 100)
+    mean, half_width = stats.difference("a", "b")
+    assert mean == pytest.approx(7 / 3)
+    assert half_width == pytest.approx(4.303 * (7 / 3) ** 0.5 / 3 ** 0.5, abs=1e-3)
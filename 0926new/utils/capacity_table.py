@@ -0,0 +1,63 @@
+import numpy as np
+
+from utils.link_models import calculate_shannon_capacity_series
+
+
+class CapacityTable:
+    """
+    各ステップの帯域幅（リンク容量を整数に切り捨てた値）を前もってまとめて計算した表。
+    リンク容量はステップ（確率的なチャネルではステップとシード）だけで決まるので、
+    シミュレーション中にリンクモデルを呼ぶ代わりに表を引く。
+    累積和も持つので、任意の区間の合計容量を引き算1回で求められる。
+    表は読み取り専用で、範囲外のステップが要求されたら倍の長さで作り直す。
+    """
+    def __init__(self, config, num_steps, capacity_fn=None):
+        """
+        Args:
+            config: 実験設定オブジェクト
+            num_steps (int): 最初に計算しておくステップ数
+            capacity_fn: ステップの配列からリンク容量の配列を返す関数
+                （省略時はcalculate_shannon_capacity_series）
+        """
+        self.config = config
+        self._capacity_fn = capacity_fn or (lambda steps: calculate_shannon_capacity_series(steps, config))
+        self._build(max(num_steps, 1))
+
+    def _build(self, num_steps):
+        """0 ~ num_steps-1 ステップの表を作る"""
+        capacities = self._capacity_fn(np.arange(num_steps)).astype(np.int64)
+        cumulative = np.zeros(num_steps + 1, dtype=np.int64)
+        np.cumsum(capacities, out=cumulative[1:])
+        # 戦略などに渡したビューから書き換えられないようにする
+        capacities.flags.writeable = False
+        cumulative.flags.writeable = False
+        self.capacities = capacities
+        self.cumulative = cumulative   # cumulative[t] = ステップ0 ~ t-1 の容量の合計
+        self.peak = int(capacities.max())
+
+    def __len__(self):
+        return len(self.capacities)
+
+    def ensure(self, end_step):
+        """ステップend_step-1までが表に含まれるようにする"""
+        if end_step > len(self.capacities):
+            self._build(max(end_step, 2 * len(self.capacities)))
+
+    def __getitem__(self, step):
+        """ステップstepの帯域幅"""
+        if step >= len(self.capacities):
+            self.ensure(step + 1)
+        return int(self.capacities[step])
+
+    def window(self, start_step, length):
+        """ステップstart_stepからlength個分の帯域幅（表のビューなのでコピーしない）"""
+        self.ensure(start_step + length)
+        return self.capacities[start_step:start_step + length]
+
+    def total(self, start_step, end_step):
+        """
+        区間 [start_step, end_step) の帯域幅の合計。
+        引数に配列を渡すと、区間ごとの合計を配列でまとめて返す。
+        """
+        self.ensure(int(np.max(end_step)))
+        return self.cumulative[end_step] - self.cumulative[start_step]
@@ -0,0 +1,183 @@
+import math
+import random
+from statistics import NormalDist
+
+import numpy as np
+
+from utils.link_models import geo_leo_distance_series, shannon_capacity_from_snr, snr_from_distance
+
+# 自由空間損失だけのリンクモデルに重ねる、確率的なチャネルのモデル。
+#   フェージング: 直接波と、時間相関のある散乱波を合わせたライスフェージング（電力利得の平均は1）
+#   降雨減衰:     時間相関のあるガウス過程が閾値を超えている間を降雨とし、その間の減衰量[dB]を対数正規に近い分布にする
+#                 （Maseng-Bakkenモデルの考え方）
+# 乱数は時間の順に引くので、同じシードなら系列を長くしても前の部分は変わらない。
+CHANNEL_MODELS = ("stochastic",)
+
+# ガウス・マルコフ過程をブロックごとの累積和で解くときの、ブロック内の係数の最大値 (ρ^-ブロック長)
+_MAX_BLOCK_GROWTH = 1e6
+
+
+def gauss_markov(rng, num_steps, num_realizations, correlation_steps):
+    """
+    平均0・分散1で、ラグkの相関がexp(-k / correlation_steps)になるガウス・マルコフ過程（AR(1)）を、
+    多数の実現値についてまとめて作る。漸化式をステップごとのPythonのループで回さず、
+    ブロックごとの累積和で解く。
+
+    Args:
+        rng (np.random.Generator): 乱数生成器
+        num_steps (int): ステップ数
+        num_realizations (int): 実現値（モンテカルロの試行）の数
+        correlation_steps (float): 相関が1/eになるステップ数（0なら相関なし）
+
+    Returns:
+        np.ndarray: (num_steps, num_realizations) の配列
+    """
+    x = rng.standard_normal((num_steps, num_realizations))
+    if correlation_steps <= 0:
+        return x
+    rho = math.exp(-1.0 / correlation_steps)
+    # x[0] = e[0]（定常分布から始める）, x[t] = ρ x[t-1] + sqrt(1 - ρ^2) e[t]
+    x[1:] *= math.sqrt(1 - rho * rho)
+
+    # ブロックの先頭をsとすると x[s+j] = ρ^j (ρ x[s-1] + Σ_{k<=j} ρ^-k e[s+k])
+    # （大きな配列を作り直さないよう、乱数の配列をその場で書き換える）
+    block = max(1, int(math.log(_MAX_BLOCK_GROWTH) / -math.log(rho)))
+    powers = rho ** np.arange(min(block, num_steps), dtype=np.float64)[:, None]
+    previous = np.zeros(num_realizations)
+    for start in range(0, num_steps, block):
+        chunk = x[start:start + block]
+        chunk_powers = powers[:len(chunk)]
+        chunk /= chunk_powers
+        np.cumsum(chunk, axis=0, out=chunk)
+        chunk += rho * previous
+        chunk *= chunk_powers
+        previous = chunk[-1]
+    return x
+
+
+def rician_fading_gain(rng, num_steps, num_realizations, k_factor_db, coherence_steps):
+    """
+    時間相関のあるライスフェージングの電力利得（真値、平均1）を (num_steps, num_realizations) の配列で返す。
+    散乱波の同相・直交成分を、それぞれ独立なガウス・マルコフ過程で作る。
+    """
+    k = 10 ** (k_factor_db / 10)
+    # 2つの成分を1回で引く（成分ごとに引くと、後の成分の乱数がステップ数によってずれる）
+    components = gauss_markov(rng, num_steps, 2 * num_realizations, coherence_steps)
+    in_phase, quadrature = components[:, :num_realizations], components[:, num_realizations:]
+    scatter = math.sqrt(1 / (2 * (k + 1)))
+    line_of_sight = math.sqrt(k / (k + 1))
+    gain = in_phase * scatter
+    gain += line_of_sight
+    gain **= 2
+    quadrature *= scatter
+    gain += quadrature ** 2
+    return gain
+
+
+def rain_attenuation_db(rng, num_steps, num_realizations, probability, median_db, sigma, correlation_steps):
+    """
+    降雨減衰 [dB] を (num_steps, num_realizations) の配列で返す。
+    時間相関のあるガウス過程Xが閾値（降雨の割合がprobabilityになる値）を超えている間を降雨とし、
+    減衰量は median_db * exp(sigma * (X - 降雨時のXの中央値)) とする（降雨時の減衰量の中央値がmedian_db）。
+    """
+    x = gauss_markov(rng, num_steps, num_realizations, correlation_steps)
+    if probability <= 0:
+        return np.zeros_like(x)
+    if probability >= 1:
+        threshold, rain_median = -np.inf, 0.0
+    else:
+        normal = NormalDist()
+        threshold = normal.inv_cdf(1 - probability)
+        rain_median = normal.inv_cdf(1 - probability / 2)
+    # 指数の計算は降雨のステップだけで行う
+    raining = x > threshold
+    attenuation = np.zeros_like(x)
+    attenuation[raining] = median_db * np.exp(sigma * (x[raining] - rain_median))
+    return attenuation
+
+
+def _seed_sequence(seed):
+    """整数・文字列などのシードから、numpyのSeedSequenceを作る（Noneならランダム）"""
+    if seed is None or (isinstance(seed, int) and seed >= 0):
+        return np.random.SeedSequence(seed)
+    # 文字列などは、random.Randomと同じ方法で整数に直す
+    return np.random.SeedSequence(random.Random(seed).getrandbits(128))
+
+
+class StochasticChannel:
+    """
+    自由空間損失のSNRに、フェージングの利得と降雨減衰を掛けてリンク容量を計算するチャネル。
+    全ステップ・全実現値の乱数を1回の呼び出しでまとめて引いて計算する。
+
+    設定の項目（無ければ既定値）:
+        FADING_RICE_K_dB: ライスフェージングのKファクタ (dB)
+        FADING_COHERENCE_STEPS: フェージングの相関が1/eになるステップ数
+        RAIN_PROBABILITY: 降雨のある時間の割合
+        RAIN_ATTENUATION_MEDIAN_dB: 降雨時の減衰量の中央値 (dB)
+        RAIN_ATTENUATION_SIGMA: 降雨時の減衰量の対数のばらつき
+        RAIN_CORRELATION_STEPS: 降雨の相関が1/eになるステップ数
+    """
+    def __init__(self, config):
+        self.config = config
+        self.k_factor_db = getattr(config, 'FADING_RICE_K_dB', 10.0)
+        self.coherence_steps = getattr(config, 'FADING_COHERENCE_STEPS', 5.0)
+        self.rain_probability = getattr(config, 'RAIN_PROBABILITY', 0.05)
+        self.rain_median_db = getattr(config, 'RAIN_ATTENUATION_MEDIAN_dB', 3.0)
+        self.rain_sigma = getattr(config, 'RAIN_ATTENUATION_SIGMA', 1.0)
+        self.rain_correlation_steps = getattr(config, 'RAIN_CORRELATION_STEPS', 500.0)
+
+    def gain(self, num_steps, num_realizations=1, seed=None):
+        """
+        ステップ0からnum_stepsステップ分の、SNRに掛ける利得（真値）を返す。
+
+        Returns:
+            np.ndarray: (num_realizations, num_steps) の配列
+        """
+        # フェージングと降雨は別々の乱数列から引く（片方の設定を変えても、もう片方の系列は変わらない）
+        fading_rng, rain_rng = (np.random.default_rng(s) for s in _seed_sequence(seed).spawn(2))
+        fading = rician_fading_gain(fading_rng, num_steps, num_realizations,
+                                    self.k_factor_db, self.coherence_steps)
+        rain_db = rain_attenuation_db(rain_rng, num_steps, num_realizations, self.rain_probability,
+                                      self.rain_median_db, self.rain_sigma, self.rain_correlation_steps)
+        rain_db *= -0.1
+        fading *= np.power(10.0, rain_db, out=rain_db)
+        return fading.T
+
+    def capacity(self, steps, num_realizations=1, seed=None):
+        """
+        各ステップのリンク容量 (Mbps) を、num_realizations個の実現値についてまとめて計算する。
+
+        Args:
+            steps (np.ndarray): シミュレーションステップの配列（0以上）
+            num_realizations (int): モンテカルロの試行の数
+            seed: 乱数シード（同じシードなら同じ系列）
+
+        Returns:
+            np.ndarray: (num_realizations, len(steps)) の配列
+        """
+        steps = np.asarray(steps, dtype=np.int64)
+        num_steps = int(steps.max()) + 1 if len(steps) else 0
+        snr = snr_from_distance(geo_leo_distance_series(steps, self.config), self.config)
+        gain = self.gain(num_steps, num_realizations, seed)[:, steps]
+        return shannon_capacity_from_snr(snr * gain, self.config)
+
+
+def channel_capacity_fn(config, seed=None):
+    """
+    CapacityTableに渡す、ステップの配列からリンク容量の配列を返す関数を作る。
+    config.CHANNEL_MODELがNone（既定）なら、決定的なリンクモデルを使うのでNoneを返す。
+    config.CHANNEL_SEEDがあれば、seedの代わりにそれを使う（全ての実行で同じチャネルになる）。
+    """
+    model = getattr(config, 'CHANNEL_MODEL', None)
+    if model is None:
+        return None
+    if model not in CHANNEL_MODELS:
+        raise ValueError(f"未知のCHANNEL_MODEL: {model}")
+    channel_seed = getattr(config, 'CHANNEL_SEED', None)
+    if channel_seed is None:
+        channel_seed = seed
+    if channel_seed is None:
+        # シードが無くても、表を作り直したときに同じ系列になるよう、ここで1つ決めておく
+        channel_seed = np.random.SeedSequence().entropy
+    channel = StochasticChannel(config)
+    return lambda steps: channel.capacity(steps, 1, channel_seed)[0]
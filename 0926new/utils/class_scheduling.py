@@ -0,0 +1,192 @@
+import numpy as np
+
+from utils.packing import top_ranked
+
+# トラフィッククラスのあるバッファで、1ステップの帯域幅をクラスにどう割り当てるか
+#   strict: 完全優先。番号の小さいクラスから順に送り、そのクラスが空になるまで次のクラスは送らない
+#   wfq:    重み付き公平（Deficit Round Robin）。パケットのあるクラスで帯域幅を重みの比で分け合う
+# どちらもクラスの中の送る順は戦略のスコア（score_packets()）で決める。
+# パケットを1つずつ選ぶ戦略（select_action()）では、serving_class()のクラスの中から選ばせ、
+# 送ったパケットをcharge()でスケジューラに知らせる。
+CLASS_SCHEDULING_MODES = ("strict", "wfq")
+
+
+def _ranked_in_class(buffer, scores, traffic_class, bandwidth, min_size):
+    """クラスtraffic_classのパケットの位置を、スコアの大きい順（同点なら前にあるもの）に並べて返す"""
+    start, end = buffer.class_range(traffic_class)
+    # 送れるのは「帯域幅 ÷ 最小サイズ」個までなので、その1つ先までの順位が分かれば十分
+    limit = min(end - start, bandwidth // min_size + 1)
+    return start + top_ranked(scores[start:end], limit)
+
+
+def _backlogged_classes(buffer):
+    """パケットのあるクラスを、優先度の高い順に返す（ビットマスクの立っているビットだけをたどる）"""
+    backlog = buffer.backlog
+    while backlog:
+        lowest = backlog & -backlog
+        yield lowest.bit_length() - 1
+        backlog ^= lowest
+
+
+class StrictPriorityScheduler:
+    """
+    完全優先のスケジューラ。
+    優先度の高いクラスから、クラスの中はスコアの順に並べ、帯域幅に収まらないパケットに当たったら止める
+    （1クラスのときのtransmit_ranked()と同じ止め方）。
+    """
+    def select(self, buffer, scores, bandwidth):
+        """
+        このステップに送るパケットの位置を、送る順に返す。
+
+        Args:
+            buffer (PacketBuffer): クラス順に並んだバッファ
+            scores (np.ndarray): バッファ内の各パケットのスコア
+            bandwidth (int): このステップの残りの帯域幅
+
+        Returns:
+            np.ndarray: 送るパケットの位置
+        """
+        sizes = buffer.size
+        min_size = int(sizes.min())
+        remaining = bandwidth
+        sent = []
+        for traffic_class in _backlogged_classes(buffer):
+            order = _ranked_in_class(buffer, scores, traffic_class, remaining, min_size)
+            cum_size = np.cumsum(sizes[order])
+            num_sent = int(np.searchsorted(cum_size, remaining, side="right"))
+            sent.append(order[:num_sent])
+            if num_sent < len(order):
+                break  # 優先度の高いクラスのパケットが入らなければ、低いクラスには譲らない
+            remaining -= int(cum_size[-1]) if num_sent else 0
+        return np.concatenate(sent) if sent else np.zeros(0, dtype=np.int64)
+
+    def serving_class(self, buffer):
+        """次のパケットを1つ選ぶクラス（パケットのある最も優先度の高いクラス）。空なら-1"""
+        return buffer.first_class()
+
+    def charge(self, buffer, traffic_class, size):
+        pass
+
+    def copy(self):
+        return self
+
+    def get_state(self):
+        return None
+
+    def set_state(self, state):
+        pass
+
+
+class WeightedFairScheduler:
+    """
+    重み付き公平のスケジューラ（Deficit Round Robin）。
+    パケットのあるクラスに重みの比でクレジット（送ってよいサイズ）を配り、各クラスはクレジットの範囲で
+    スコア順にパケットを送る。クレジットを配る1巡ずつをループで回さず、
+    「どれかのクラスの次のパケットが送れるようになるまで」の巡回数を計算してまとめて進めるので、
+    ループの回数は送ったパケット数 + クラス数程度で済む。使い切らなかったクレジットは次のステップに持ち越す。
+    """
+    def __init__(self, weights, max_credit):
+        """
+        Args:
+            weights (tuple): クラスごとの重み（正の数）
+            max_credit (int): 持ち越せるクレジットの上限（最大のパケットサイズ）
+        """
+        self.weights = [float(weight) for weight in weights]
+        self.max_credit = max_credit
+        self.credits = [0.0] * len(self.weights)
+
+    def select(self, buffer, scores, bandwidth):
+        """このステップに送るパケットの位置を、送る順に返す（引数はStrictPrioritySchedulerと同じ）"""
+        sizes = buffer.size
+        min_size = int(sizes.min())
+        credits = self.credits
+        ranked, heads = {}, {}
+        for traffic_class in range(len(credits)):
+            if not buffer.backlog >> traffic_class & 1:
+                credits[traffic_class] = 0.0  # 空になったクラスはクレジットを持ち越さない
+                continue
+            ranked[traffic_class] = _ranked_in_class(buffer, scores, traffic_class, bandwidth, min_size).tolist()
+            heads[traffic_class] = 0
+
+        remaining = bandwidth
+        sent = []
+        active = list(ranked)
+        while active:
+            # 次のパケットが残りの帯域幅に入らないクラス・送り終えたクラスは、このステップでは休む
+            active = [c for c in active if heads[c] < len(ranked[c]) and sizes[ranked[c][heads[c]]] <= remaining]
+            if not active:
+                break
+            total_weight = sum(self.weights[c] for c in active)
+            # どれかのクラスの次のパケットが送れるようになるまで、重みの比でクレジットを配る
+            needed = min((sizes[ranked[c][heads[c]]] - credits[c]) * total_weight / self.weights[c]
+                         for c in active)
+            if needed > 0:
+                for c in active:
+                    credits[c] += needed * self.weights[c] / total_weight
+            for c in active:
+                # クレジットと残りの帯域幅の両方に収まる間、スコア順に送る
+                while heads[c] < len(ranked[c]):
+                    size = int(sizes[ranked[c][heads[c]]])
+                    if size > credits[c] + 1e-9 or size > remaining:
+                        break
+                    credits[c] -= size
+                    remaining -= size
+                    sent.append(ranked[c][heads[c]])
+                    heads[c] += 1
+        for c in range(len(credits)):
+            credits[c] = min(credits[c], self.max_credit)
+        return np.array(sent, dtype=np.int64)
+
+    def serving_class(self, buffer):
+        """
+        次のパケットを1つ選ぶクラス。パケットのあるクラスのうちクレジットが最も多いもの
+        （同じなら番号の小さいもの）。空なら-1
+        """
+        best, best_credit = -1, None
+        for c in _backlogged_classes(buffer):
+            if best_credit is None or self.credits[c] > best_credit:
+                best, best_credit = c, self.credits[c]
+        return best
+
+    def charge(self, buffer, traffic_class, size):
+        """
+        クラスtraffic_classのパケット（サイズsize）を1つ送ったことを記録する（bufferは送る前のもの）。
+        送ったサイズ分のクレジットをパケットのあるクラスに重みの比で配り、送ったクラスからは差し引く。
+        長く見ると、各クラスが送るサイズは重みの比になる。
+        """
+        credits = self.credits
+        active = [c for c in range(len(credits)) if buffer.backlog >> c & 1]
+        for c in range(len(credits)):
+            if c not in active:
+                credits[c] = 0.0  # 空のクラスはクレジットを持ち越さない
+        total_weight = sum(self.weights[c] for c in active)
+        for c in active:
+            credits[c] = min(credits[c] + size * self.weights[c] / total_weight, self.max_credit)
+        credits[traffic_class] -= size
+
+    def copy(self):
+        """クレジットを別に持つ複製（環境の複製用）"""
+        scheduler = WeightedFairScheduler(self.weights, self.max_credit)
+        scheduler.credits = list(self.credits)
+        return scheduler
+
+    def get_state(self):
+        return tuple(self.credits)
+
+    def set_state(self, state):
+        self.credits = list(state)
+
+
+def make_class_scheduler(config, num_classes):
+    """config.CLASS_SCHEDULING（省略時は"strict"）のスケジューラを作る。1クラスならNone"""
+    if num_classes <= 1:
+        return None
+    mode = getattr(config, 'CLASS_SCHEDULING', 'strict')
+    if mode == "strict":
+        return StrictPriorityScheduler()
+    if mode == "wfq":
+        weights = getattr(config, 'TRAFFIC_CLASS_WEIGHTS', None) or (1,) * num_classes
+        if len(weights) != num_classes or min(weights) <= 0:
+            raise ValueError(f"TRAFFIC_CLASS_WEIGHTSはクラスごとの正の数である必要があります: {weights}")
+        return WeightedFairScheduler(weights, config.PACKET_SIZE_RANGE[1])
+    raise ValueError(f"未知のCLASS_SCHEDULING: {mode}")
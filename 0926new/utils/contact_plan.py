@@ -0,0 +1,215 @@
+import numpy as np
+
+
+class ContactPlan:
+    """
+    コンタクトプラン: リンクごとに「容量がしきい値以上で通信できる期間（コンタクト）」を
+    事前計算し、区間検索できるように索引化したもの。
+    軌道は決定的なので、シミュレーション中に幾何計算をやり直す必要がなくなる。
+
+    各コンタクトは (リンク番号, 送信元, 宛先, 開始ステップ, 終了ステップ(含まない), 通信可能量, 平均レート) を持ち、
+    (リンク番号, 開始ステップ) の順に並べて保持する。同じリンクのコンタクト同士は重ならない。
+    """
+    def __init__(self, link_src, link_dst, num_steps, link, start, end, volume):
+        self.link_src = np.asarray(link_src)
+        self.link_dst = np.asarray(link_dst)
+        self.num_links = len(self.link_src)
+        self.num_steps = num_steps
+
+        order = np.lexsort((start, link))
+        self.link = np.asarray(link, dtype=np.int64)[order]
+        self.start = np.asarray(start, dtype=np.int64)[order]
+        self.end = np.asarray(end, dtype=np.int64)[order]
+        self.volume = np.asarray(volume, dtype=np.int64)[order]
+        self.src = self.link_src[self.link]
+        self.dst = self.link_dst[self.link]
+        # コンタクト中に1ステップあたりに送れる量（DTNのコンタクトプランと同じく一定レートとみなす）
+        self.rate = self.volume // np.maximum(self.end - self.start, 1)
+
+        # リンクごとのコンタクトの範囲（CSR形式）と、(リンク, 開始ステップ) を1つにまとめた検索キー
+        self.link_offsets = np.searchsorted(self.link, np.arange(self.num_links + 1))
+        self._keys = self.link * (num_steps + 1) + self.start
+
+    @classmethod
+    def build(cls, capacity_fn, link_src, link_dst, num_steps, threshold, chunk_steps=1024):
+        """
+        リンク容量の時系列からコンタクトプランを作る。
+        容量はchunk_stepsステップずつまとめて計算するので、長い期間でもメモリを使いすぎない。
+
+        Args:
+            capacity_fn: ステップの配列を受け取り、(ステップ数, リンク数) の容量配列を返す関数
+                （SatelliteNetworkEnv.link_capacitiesなど）
+            link_src, link_dst (np.ndarray): 各リンクの送信元・宛先ノード
+            num_steps (int): コンタクトプランを作る期間（ステップ数）
+            threshold (int): この容量以上のステップだけを「通信可能」とみなす
+
+        Returns:
+            ContactPlan
+        """
+        num_links = len(link_src)
+        links, starts, ends, volumes = [], [], [], []
+
+        # チャンクをまたいで続いているコンタクトの開始ステップと、その時点の累積容量
+        open_start = np.full(num_links, -1, dtype=np.int64)
+        open_cum = np.zeros(num_links, dtype=np.int64)
+        prev_above = np.zeros(num_links, dtype=bool)
+        base_cum = np.zeros(num_links, dtype=np.int64)
+
+        for t0 in range(0, num_steps, chunk_steps):
+            steps = np.arange(t0, min(t0 + chunk_steps, num_steps))
+            capacity = np.asarray(capacity_fn(steps), dtype=np.int64)
+            above = capacity >= threshold
+            usable_capacity = np.where(above, capacity, 0)
+            # cum[i, e]: ステップ0から(t0+i)の直前までにリンクeで送れる量の累計
+            cum = np.vstack([base_cum, base_cum + np.cumsum(usable_capacity, axis=0)])
+
+            padded = np.vstack([prev_above, above]).astype(np.int8)
+            change = np.diff(padded, axis=0)
+            start_t, start_e = np.nonzero(change == 1)
+            end_t, end_e = np.nonzero(change == -1)
+
+            # 前のチャンクから続くコンタクトの開始を先頭に加え、リンクごとにk番目の開始とk番目の終了を対応付ける
+            carried = np.flatnonzero(open_start >= 0)
+            s_link = np.concatenate([carried, start_e])
+            s_time = np.concatenate([open_start[carried], t0 + start_t])
+            s_cum = np.concatenate([open_cum[carried], cum[start_t, start_e]])
+            s_order = np.lexsort((s_time, s_link))
+            s_link, s_time, s_cum = s_link[s_order], s_time[s_order], s_cum[s_order]
+            e_order = np.lexsort((end_t, end_e))
+            e_link, e_row = end_e[e_order], end_t[e_order]
+
+            s_offsets = np.searchsorted(s_link, np.arange(num_links + 1))
+            e_offsets = np.searchsorted(e_link, np.arange(num_links + 1))
+            e_rank = np.arange(len(e_link)) - e_offsets[e_link]
+            matched = s_offsets[e_link] + e_rank
+
+            links.append(e_link)
+            starts.append(s_time[matched])
+            ends.append(t0 + e_row)
+            volumes.append(cum[e_row, e_link] - s_cum[matched])
+
+            # 終了が見つからなかった開始は、次のチャンクに持ち越す
+            s_rank = np.arange(len(s_link)) - s_offsets[s_link]
+            n_ends = np.diff(e_offsets)
+            still_open = s_rank >= n_ends[s_link]
+            open_start[:] = -1
+            open_start[s_link[still_open]] = s_time[still_open]
+            open_cum[s_link[still_open]] = s_cum[still_open]
+
+            prev_above = above[-1]
+            base_cum = cum[-1]
+
+        # 期間の最後まで続いているコンタクトは、期間の終わりで閉じる
+        carried = np.flatnonzero(open_start >= 0)
+        links.append(carried)
+        starts.append(open_start[carried])
+        ends.append(np.full(len(carried), num_steps, dtype=np.int64))
+        volumes.append(base_cum[carried] - open_cum[carried])
+
+        return cls(link_src, link_dst, num_steps, np.concatenate(links), np.concatenate(starts),
+                   np.concatenate(ends), np.concatenate(volumes))
+
+    @classmethod
+    def from_network(cls, env, num_steps, threshold=None):
+        """SatelliteNetworkEnvの軌道・リンク定義からコンタクトプランを作る"""
+        if threshold is None:
+            threshold = getattr(env.config, 'MIN_LINK_CAPACITY', 1)
+        return cls.build(env.link_capacities, env.link_src, env.link_dst, num_steps, threshold)
+
+    def __len__(self):
+        return len(self.link)
+
+    def query(self, link, t0, t1):
+        """
+        リンクlinkの、区間 [t0, t1) と重なるコンタクトの番号を返す。
+
+        Returns:
+            np.ndarray: コンタクト番号（開始ステップ順）
+        """
+        lo, hi = self.link_offsets[link], self.link_offsets[link + 1]
+        # 同じリンクのコンタクトは重ならないので、終了・開始のどちらも昇順に並んでいる
+        first = lo + np.searchsorted(self.end[lo:hi], t0, side="right")
+        last = lo + np.searchsorted(self.start[lo:hi], t1, side="left")
+        return np.arange(first, max(first, last))
+
+    def active_contacts(self, current_step):
+        """
+        各リンクで、current_stepに通信中のコンタクトの番号を返す（なければ-1）。
+        全リンク分を1回の二分探索でまとめて引く。
+        """
+        links = np.arange(self.num_links)
+        idx = np.searchsorted(self._keys, links * (self.num_steps + 1) + current_step, side="right") - 1
+        safe = np.maximum(idx, 0)
+        active = (idx >= 0) & (self.link[safe] == links) & (self.end[safe] > current_step)
+        return np.where(active, idx, -1)
+
+    def link_rates(self, current_step):
+        """各リンクのcurrent_stepにおける送信レート（通信できなければ0）"""
+        active = self.active_contacts(current_step)
+        return np.where(active >= 0, self.rate[np.maximum(active, 0)], 0)
+
+
+class ContactGraphRouter:
+    """
+    コンタクトプラン上の経路計算（Contact Graph Routing）。
+    各ノード・各ステップについて「GEOに最も早く届く」ための次の一手
+    （どのリンクで送るか、または次のコンタクトまで待つか）を事前に表にしておき、
+    転送時の経路判断を表引きだけで済ませる。
+
+    1ホップの転送に1ステップかかるとし、コンタクトの容量（通信可能量）は経路計算では考慮しない。
+    """
+    WAIT = -1
+
+    def __init__(self, plan, is_destination):
+        """
+        Args:
+            plan (ContactPlan): コンタクトプラン
+            is_destination (np.ndarray): 各ノードが宛先（GEOなど）かどうかの真偽値配列
+        """
+        self.plan = plan
+        num_nodes = len(is_destination)
+        num_steps = plan.num_steps
+        never = np.iinfo(np.int64).max
+
+        # 時間を逆向きにたどる動的計画法:
+        # arrival[u] = ステップtにノードuにいるパケットが宛先に届く最も早いステップ
+        #            = min(待った場合 arrival_{t+1}[u], 通信中のリンク u→v で送った場合 arrival_{t+1}[v])
+        self.next_link = np.full((num_steps, num_nodes), self.WAIT, dtype=np.int32)
+        self.delivery_step = np.full((num_steps, num_nodes), never, dtype=np.int64)
+        arrival = np.where(is_destination, num_steps, never)
+        link_ids = np.arange(plan.num_links)
+        for t in range(num_steps - 1, -1, -1):
+            # この時点のarrivalはステップt+1の値（宛先ノードはt+1）
+            active_idx = plan.active_contacts(t)
+            links = link_ids[active_idx >= 0]
+            src, dst = plan.link_src[links], plan.link_dst[links]
+            via = arrival[dst]
+            # 宛先ノードから送る必要はない。届かない先への送信も候補にしない
+            useful = ~is_destination[src] & (via != never)
+            links, src, via = links[useful], src[useful], via[useful]
+
+            # 送信元ごとに、到着が最も早い（同じならレートが高い）リンクを1本選ぶ
+            order = np.lexsort((-plan.rate[active_idx[links]], via, src))
+            _, first = np.unique(src[order], return_index=True)
+            best = order[first]
+            # 待つのと同じ到着時刻なら、今送る方を選ぶ
+            better = best[via[best] <= arrival[src[best]]]
+
+            arrival[src[better]] = via[better]
+            arrival[is_destination] = t
+            self.next_link[t, src[better]] = links[better]
+            self.delivery_step[t] = arrival
+
+    def next_hops(self, current_step):
+        """
+        各ノードのcurrent_stepにおける次ホップと、そのリンクの送信レートを返す。
+
+        Returns:
+            (np.ndarray, np.ndarray): 次ホップ（待機・宛先なら-1）, 送信レート
+        """
+        links = self.next_link[current_step]
+        sending = links >= 0
+        safe = np.maximum(links, 0)
+        next_hop = np.where(sending, self.plan.link_dst[safe], -1)
+        rates = self.plan.link_rates(current_step)
+        return next_hop, np.where(sending, rates[safe], 0)
@@ -0,0 +1,191 @@
+import numpy as np
+
+# --- イベント種別 ---
+# パケットの一生の中で起こりうる出来事を1バイトのコードで表す
+EVENT_ARRIVE = 0    # バッファに到着（格納）した
+EVENT_DROP = 1      # バッファ溢れで破棄された
+EVENT_EXPIRE = 2    # TTL切れで破棄された
+EVENT_TRANSMIT = 3  # 転送に成功した
+EVENT_NAMES = {
+    EVENT_ARRIVE: "arrive",
+    EVENT_DROP: "drop",
+    EVENT_EXPIRE: "expire",
+    EVENT_TRANSMIT: "transmit",
+}
+# まだバッファ内に残っている（終端イベントがない）パケットの運命
+FATE_PENDING = 255
+
+# 1イベント = 固定長のバイナリレコード（パディングなしで21バイト）
+TRACE_DTYPE = np.dtype([
+    ("packet_id", "<i8"),
+    ("step", "<i4"),
+    ("position", "<i4"),   # イベント発生時のバッファ内の位置（破棄時は-1）
+    ("size", "<i2"),
+    ("ttl", "<i2"),        # イベント発生時点のTTL
+    ("event", "u1"),
+])
+
+# ファイル先頭に置く識別子。形式を変えたら末尾の版数を上げる
+TRACE_MAGIC = b"PKTTRC01"
+
+
+class PacketEventTracer:
+    """
+    パケットのライフサイクルイベントを固定長レコードとして記録するトレーサ。
+    レコードは事前確保したリングバッファに書き込み、満杯になるか
+    flush()/close()が呼ばれた時点でまとめてディスクに書き出す。
+    """
+    def __init__(self, path, capacity=65536):
+        """
+        Args:
+            path (str): 書き出し先のファイルパス（既存ファイルは上書き）
+            capacity (int): リングバッファに保持できるレコード数
+        """
+        self.path = path
+        self.capacity = capacity
+        self._records = np.empty(capacity, dtype=TRACE_DTYPE)
+        self._count = 0
+        self.total_records = 0
+        self._file = open(path, "wb")
+        self._file.write(TRACE_MAGIC)
+
+    def record(self, step, packet_id, event, position, size, ttl):
+        """1件のイベントをリングバッファに書き込む"""
+        if self._count == self.capacity:
+            self.flush()
+        self._records[self._count] = (packet_id, step, position, size, ttl, event)
+        self._count += 1
+
+    def record_many(self, step, packet_ids, event, positions, sizes, ttls):
+        """
+        同じステップ・同じ種別のイベントを配列でまとめて書き込む。
+        配列引数はすべて同じ長さであること。
+        """
+        n = len(packet_ids)
+        start = 0
+        while start < n:
+            if self._count == self.capacity:
+                self.flush()
+            # リングバッファの空きに収まる分だけ一度にコピーする
+            chunk = min(n - start, self.capacity - self._count)
+            block = self._records[self._count:self._count + chunk]
+            block["packet_id"] = packet_ids[start:start + chunk]
+            block["step"] = step
+            block["position"] = positions[start:start + chunk]
+            block["size"] = sizes[start:start + chunk]
+            block["ttl"] = ttls[start:start + chunk]
+            block["event"] = event
+            self._count += chunk
+            start += chunk
+
+    def flush(self):
+        """リングバッファに溜まったレコードを一括でディスクに書き出す"""
+        if self._count:
+            self._records[:self._count].tofile(self._file)
+            self.total_records += self._count
+            self._count = 0
+        self._file.flush()
+
+    def close(self):
+        """残りのレコードを書き出してファイルを閉じる"""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def load_trace(path):
+    """
+    トレースファイルを読み込み、構造化配列として返す。
+
+    Args:
+        path (str): PacketEventTracerが書き出したファイルのパス
+
+    Returns:
+        np.ndarray: TRACE_DTYPE型のレコード配列（ファイル上の記録順）
+    """
+    with open(path, "rb") as f:
+        magic = f.read(len(TRACE_MAGIC))
+        if magic != TRACE_MAGIC:
+            raise ValueError(f"トレースファイルの形式が不正です: {path}")
+        return np.fromfile(f, dtype=TRACE_DTYPE)
+
+
+def build_timelines(records):
+    """
+    イベントレコードから、パケットごとのタイムライン（到着から最期まで）を再構成する。
+    ループを使わずソートと検索だけで処理するため、数百万パケットでも数秒で終わる。
+
+    Args:
+        records (np.ndarray): load_trace()が返すレコード配列
+
+    Returns:
+        np.ndarray: パケットID順に並んだ構造化配列。各フィールドは
+            packet_id, size, arrive_step, arrive_position, arrive_ttl,
+            end_step, end_position, fate（終端イベントのコード。未確定ならFATE_PENDING）,
+            wait_steps（到着から終端イベントまでのステップ数。未確定なら-1）
+    """
+    packet_ids = np.unique(records["packet_id"])
+    n = len(packet_ids)
+    timelines = np.zeros(n, dtype=[
+        ("packet_id", "<i8"), ("size", "<i2"),
+        ("arrive_step", "<i4"), ("arrive_position", "<i4"), ("arrive_ttl", "<i2"),
+        ("end_step", "<i4"), ("end_position", "<i4"), ("fate", "u1"),
+        ("wait_steps", "<i4"),
+    ])
+    timelines["packet_id"] = packet_ids
+    timelines["arrive_step"] = -1
+    timelines["arrive_position"] = -1
+    timelines["end_step"] = -1
+    timelines["end_position"] = -1
+    timelines["fate"] = FATE_PENDING
+
+    # 1パケットにつき「到着」は高々1件、終端イベント（破棄・期限切れ・転送）も高々1件
+    is_arrive = records["event"] == EVENT_ARRIVE
+    arrivals = records[is_arrive]
+    terminals = records[~is_arrive]
+
+    idx = np.searchsorted(packet_ids, arrivals["packet_id"])
+    timelines["size"][idx] = arrivals["size"]
+    timelines["arrive_step"][idx] = arrivals["step"]
+    timelines["arrive_position"][idx] = arrivals["position"]
+    timelines["arrive_ttl"][idx] = arrivals["ttl"]
+
+    idx = np.searchsorted(packet_ids, terminals["packet_id"])
+    timelines["end_step"][idx] = terminals["step"]
+    timelines["end_position"][idx] = terminals["position"]
+    timelines["fate"][idx] = terminals["event"]
+
+    # 破棄されたパケットには到着レコードがないので、破棄レコードから情報を補う
+    dropped = terminals[terminals["event"] == EVENT_DROP]
+    idx = np.searchsorted(packet_ids, dropped["packet_id"])
+    timelines["size"][idx] = dropped["size"]
+    timelines["arrive_step"][idx] = dropped["step"]
+    timelines["arrive_ttl"][idx] = dropped["ttl"]
+
+    finished = timelines["fate"] != FATE_PENDING
+    timelines["wait_steps"] = np.where(
+        finished, timelines["end_step"] - timelines["arrive_step"], -1)
+    return timelines
+
+
+def summarize_fates(timelines):
+    """
+    タイムラインから運命ごとのパケット数を集計する。
+
+    Returns:
+        dict: {"arrive"/"drop"/"expire"/"transmit"/"pending": パケット数}
+            "arrive"にはバッファに格納されたパケットの総数が入る
+    """
+    counts = np.bincount(timelines["fate"], minlength=FATE_PENDING + 1)
+    summary = {EVENT_NAMES[code]: int(counts[code])
+               for code in (EVENT_DROP, EVENT_EXPIRE, EVENT_TRANSMIT)}
+    summary["pending"] = int(counts[FATE_PENDING])
+    summary["arrive"] = int(np.count_nonzero(timelines["arrive_position"] >= 0))
+    return summary
@@ -1,11 +1,12 @@
 import math
 import numpy as np
-# from configs.experiment_configs import DqnTrainConfig
-import matplotlib.pyplot as plt
+
+from configs.frozen import derived_constants
 
 def calculate_shannon_capacity(current_step, config):
     """
     シャノン＝ハートレイの定理とFSPLに基づき、リンク容量を計算する。
+    設定だけで決まる値（軌道半径・送信電力[dBW]・ノイズ電力など）は、設定の派生定数から読む。
     
     Args:
         current_step (int): 現在のシミュレーションステップ。
@@ -14,44 +15,96 @@ def calculate_shannon_capacity(current_step, config):
     Returns:
         float: 計算されたリンク容量 (Mbps)。
     """
-    # 物理定数
-    BOLTZMANN_CONSTANT = 1.38e-23
+    derived = derived_constants(config)
 
     # --- 軌道と距離の計算 ---
-    # 軌道半径の計算
-    r_geo = config.GEO_ALTITUDE_KM + config.EARTH_RADIUS_KM
-    r_leo = config.LEO_ALTITUDE_KM + config.EARTH_RADIUS_KM
     # LEO衛星が円軌道上のどの位置にいるかを計算し，直交座標を計算
     angle_rad = (2 * math.pi * current_step) / config.LEO_ORBITAL_PERIOD_STEPS
-    leo_x = r_leo * math.cos(angle_rad)
-    leo_y = r_leo * math.sin(angle_rad)
+    leo_x = derived.r_leo_km * math.cos(angle_rad)
+    leo_y = derived.r_leo_km * math.sin(angle_rad)
     # GEO衛星の位置を定義し，2衛星の直線距離を計算．
-    geo_x = r_geo
+    geo_x = derived.r_geo_km
     distance_km = math.sqrt((geo_x - leo_x)**2 + leo_y**2)
 
     # --- FSPLの計算 ---
-    # 単位変換
+    # FSPLをデシベル単位で計算（周波数の項は派生定数）
     distance_m = distance_km * 1000
-    frequency_hz = config.FREQUENCY_GHz * 1e9
-    # FSPLをデシベル単位で計算
-    fspl_db = 20 * math.log10(distance_m) + 20 * math.log10(frequency_hz) - 147.55
+    fspl_db = 20 * math.log10(distance_m) + derived.frequency_db - 147.55
 
     # --- 受信信号電力 S の計算 ---
-    # 送信電力[W]をデシベルワットに変換
-    transmit_power_dbw = 10 * math.log10(config.TRANSMIT_POWER_W)
     # 受信電力 = 送信電力 + 送信アンテナ利得 + 受信アンテナ利得 - 伝搬損失
-    received_power_dbw = (transmit_power_dbw + config.TRANSMIT_ANTENNA_GAIN_dBi + 
-                          config.RECEIVE_ANTENNA_GAIN_dBi - fspl_db)
+    received_power_dbw = derived.power_and_gains_dbw - fspl_db
     # [dBW]→[W]
     s_watts = 10**(received_power_dbw / 10)
 
-    # --- ノイズ電力 N の計算 ---
-    # ノイズ電力 = ボルツマン定数 × 雑音温度 ×　チャネル帯域幅
-    channel_bandwidth_hz = config.CHANNEL_BANDWIDTH_MHz * 1e6
-    n_watts = BOLTZMANN_CONSTANT * config.SYSTEM_NOISE_TEMPERATURE_K * channel_bandwidth_hz
-    
     # --- リンク容量 C の計算 ---
-    snr = s_watts / n_watts
-    capacity_bps = channel_bandwidth_hz * np.log2(1 + snr)
+    # ノイズ電力 N = ボルツマン定数 × 雑音温度 ×　チャネル帯域幅 も派生定数
+    snr = s_watts / derived.noise_power_w
+    capacity_bps = derived.channel_bandwidth_hz * np.log2(1 + snr)
     
-    return capacity_bps / 1e6 # Mbpsに変換して返す
\ No newline at end of file
+    return capacity_bps / 1e6 # Mbpsに変換して返す
+
+def snr_from_distance(distance_km, config):
+    """
+    衛星間距離から、自由空間損失だけを考えた受信SNR（真値、dBではない）を配列でまとめて計算する。
+
+    Args:
+        distance_km (np.ndarray): 衛星間の直線距離 (km)。任意の形の配列
+        config: 必要なパラメータをすべて含む設定オブジェクト。
+
+    Returns:
+        np.ndarray: distance_kmと同じ形のSNR。
+    """
+    derived = derived_constants(config)
+
+    # FSPL [dB]
+    distance_m = np.asarray(distance_km, dtype=np.float64) * 1000
+    fspl_db = 20 * np.log10(distance_m) + derived.frequency_db - 147.55
+
+    # 受信電力 S [W]
+    s_watts = 10**((derived.power_and_gains_dbw - fspl_db) / 10)
+    return s_watts / derived.noise_power_w
+
+
+def shannon_capacity_from_snr(snr, config):
+    """SNR（真値）の配列から、シャノン＝ハートレイの定理でリンク容量 (Mbps) を計算する"""
+    derived = derived_constants(config)
+    return derived.channel_bandwidth_hz * np.log2(1 + snr) / 1e6
+
+
+def shannon_capacity_from_distance(distance_km, config):
+    """
+    衛星間距離からリンク容量を計算する（calculate_shannon_capacityの距離以降の計算を配列化したもの）。
+    多数のリンク・多数のステップの容量を1回の呼び出しでまとめて計算できる。
+
+    Args:
+        distance_km (np.ndarray): 衛星間の直線距離 (km)。任意の形の配列
+        config: 必要なパラメータをすべて含む設定オブジェクト。
+
+    Returns:
+        np.ndarray: distance_kmと同じ形のリンク容量 (Mbps)。
+    """
+    return shannon_capacity_from_snr(snr_from_distance(distance_km, config), config)
+
+
+def geo_leo_distance_series(steps, config):
+    """各ステップのGEO衛星とLEO衛星の直線距離 (km) をまとめて計算する"""
+    derived = derived_constants(config)
+    angle_rad = (2 * math.pi * np.asarray(steps, dtype=np.float64)) / config.LEO_ORBITAL_PERIOD_STEPS
+    leo_x = derived.r_leo_km * np.cos(angle_rad)
+    leo_y = derived.r_leo_km * np.sin(angle_rad)
+    return np.sqrt((derived.r_geo_km - leo_x)**2 + leo_y**2)
+
+
+def calculate_shannon_capacity_series(steps, config):
+    """
+    calculate_shannon_capacityを多数のステップについてまとめて計算する。
+
+    Args:
+        steps (np.ndarray): シミュレーションステップの配列。
+        config: 必要なパラメータをすべて含む設定オブジェクト。
+
+    Returns:
+        np.ndarray: 各ステップのリンク容量 (Mbps)。
+    """
+    return shannon_capacity_from_distance(geo_leo_distance_series(steps, config), config)
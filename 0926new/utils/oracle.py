@@ -0,0 +1,79 @@
+import heapq
+import numpy as np
+
+from utils.event_trace import EVENT_ARRIVE, EVENT_DROP
+
+
+def arrivals_from_trace(records):
+    """
+    イベントトレースから、発生した全パケット（バッファ溢れで破棄されたものも含む）の
+    到着ステップ・サイズ・TTLを取り出す。
+
+    Returns:
+        (np.ndarray, np.ndarray, np.ndarray): 到着ステップ, サイズ, 到着時のTTL
+    """
+    generated = records[(records["event"] == EVENT_ARRIVE) | (records["event"] == EVENT_DROP)]
+    return (generated["step"].astype(np.int64), generated["size"].astype(np.int64),
+            generated["ttl"].astype(np.int64))
+
+
+def max_deliverable(arrival_steps, sizes, ttls, capacities):
+    """
+    到着系列とリンク容量の時系列から、TTL切れまでに転送できるパケット数の上界を計算する。
+    どんなスケジューラもこの数を超えて転送することはできない。
+
+    次の緩和問題を解く（元の問題はステップ内のビンパッキングを含むため厳密解は求めにくい）:
+      - パケットは複数ステップに分割して送ってよい（容量はステップをまたいで流体として使える）
+      - バッファ上限は無視する（破棄されたパケットも送れたものとする）
+      - 送信可能期間の開始を、締切が遅いパケットの到着まで前倒しし、
+        「到着が早いほど締切も早い」順序に揃える
+    この緩和問題は、締切順にパケットを受け入れ、締切に間に合わなくなったら
+    現在の連続送信区間で最大のパケットを捨てる貪欲法（Moore-Hodgson法の拡張）で
+    O(n log n) で求める。
+
+    Args:
+        arrival_steps (np.ndarray): 各パケットが到着したステップ
+        sizes (np.ndarray): 各パケットのサイズ
+        ttls (np.ndarray): 各パケットの到着時のTTL
+        capacities (np.ndarray): 各ステップの帯域幅
+
+    Returns:
+        int: 転送できるパケット数の上界
+    """
+    arrival_steps = np.asarray(arrival_steps, dtype=np.int64)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    ttls = np.asarray(ttls, dtype=np.int64)
+    num_steps = len(capacities)
+
+    # 到着したステップにTTLが1減るので、送信できるのは到着ステップからTTL-2ステップ後まで
+    last_step = np.minimum(arrival_steps + ttls - 2, num_steps - 1)
+    feasible = last_step >= arrival_steps
+    arrival_steps, sizes, last_step = arrival_steps[feasible], sizes[feasible], last_step[feasible]
+
+    # 時間軸を「累積容量」に変換する（cum[t] = ステップtの直前までに送れる総量）
+    cum = np.concatenate([[0], np.cumsum(capacities)])
+    release = cum[arrival_steps]
+    deadline = cum[last_step + 1]
+
+    # 締切順に並べ、開始を後ろ側の最小値まで前倒しして順序を揃える
+    order = np.lexsort((release, deadline))
+    release = np.minimum.accumulate(release[order][::-1])[::-1]
+    deadline = deadline[order]
+    sizes = sizes[order]
+
+    count = 0
+    finish = -1
+    busy = []  # 現在の連続送信区間で受け入れたパケットのサイズ（最大ヒープにするため符号を反転）
+    for r, d, s in zip(release.tolist(), deadline.tolist(), sizes.tolist()):
+        if r >= finish:
+            # 前のパケットを送り終えてから到着した → 新しい連続送信区間
+            busy.clear()
+            finish = r
+        heapq.heappush(busy, -s)
+        finish += s
+        count += 1
+        if finish > d:
+            # 締切に間に合わない → 区間内で最大のパケットを諦めるのが最も損が少ない
+            finish += heapq.heappop(busy)
+            count -= 1
+    return count
@@ -0,0 +1,119 @@
+import numpy as np
+
+# 残り帯域幅への詰め込み方
+#   best_fit: 入る中で最も大きいサイズから順に貪欲に詰める
+#   knapsack: 残り帯域幅を最も多く使うサイズの組み合わせを、有界ナップサックで求める
+PACKING_MODES = ("best_fit", "knapsack")
+
+
+def top_ranked(scores, limit):
+    """
+    スコアの大きい順に上位limit個の位置を返す（同じスコアなら位置の小さい順）。
+    全体をソートせず、np.partitionで上位limit個を取り出してからそれだけを並べる。
+    """
+    n = len(scores)
+    negated = -scores
+    if limit >= n:
+        return np.argsort(negated, kind="stable")
+    threshold = np.partition(negated, limit - 1)[limit - 1]
+    above = np.flatnonzero(negated < threshold)
+    ties = np.flatnonzero(negated == threshold)[:limit - len(above)]
+    candidates = np.sort(np.concatenate([above, ties]))
+    return candidates[np.argsort(negated[candidates], kind="stable")]
+
+
+def pack_residual(sizes, scores, available, residual, mode="best_fit"):
+    """
+    ステップの残り帯域幅residualに、まだ送っていないパケットを詰め込む。
+    パケットのサイズは PACKET_SIZE_RANGE の小さな整数しかないので、候補をサイズごとの組に分け、
+    「どのサイズを何個送るか」だけを決める。同じサイズの中では元の戦略の優先度が高い順に送る。
+
+    Args:
+        sizes (np.ndarray): 各パケットのサイズ
+        scores (np.ndarray): 各パケットの優先度（大きいほど先）。Noneならバッファの前にあるほど優先
+        available (np.ndarray): まだ送っていないパケットの真偽値配列
+        residual (int): 残り帯域幅
+        mode (str): PACKING_MODESのいずれか
+
+    Returns:
+        np.ndarray: 送るパケットの位置（優先度の高い順）
+    """
+    if mode not in PACKING_MODES:
+        raise ValueError(f"未知のPACKING_MODE: {mode}")
+    candidates = available & (sizes <= residual)
+    if residual <= 0 or not candidates.any():
+        return np.zeros(0, dtype=np.int64)
+
+    # サイズごとに、入りうる個数分だけ優先度の高い順に候補を取り出す
+    class_sizes = np.unique(sizes[candidates])
+    members = []
+    for size in class_sizes.tolist():
+        indices = np.flatnonzero(candidates & (sizes == size))
+        limit = min(len(indices), residual // size)
+        if scores is None:
+            members.append(indices[:limit])
+        else:
+            members.append(indices[top_ranked(np.asarray(scores)[indices], limit)])
+    counts = np.array([len(m) for m in members])
+
+    if mode == "best_fit":
+        take = _best_fit(class_sizes, counts, residual)
+    else:
+        take = _bounded_knapsack(class_sizes, counts, residual)
+    chosen = np.concatenate([m[:t] for m, t in zip(members, take.tolist())])
+
+    # 選んだパケットを優先度の高い順に並べ直す
+    if scores is None:
+        return np.sort(chosen)
+    chosen = np.sort(chosen)
+    return chosen[np.argsort(-np.asarray(scores)[chosen], kind="stable")]
+
+
+def _best_fit(class_sizes, counts, residual):
+    """大きいサイズから順に、入るだけ詰める（サイズごとの個数を返す）"""
+    take = np.zeros(len(class_sizes), dtype=np.int64)
+    for i in range(len(class_sizes) - 1, -1, -1):
+        take[i] = min(counts[i], residual // class_sizes[i])
+        residual -= take[i] * class_sizes[i]
+    return take
+
+
+def _bounded_knapsack(class_sizes, counts, residual):
+    """
+    サイズclass_sizes[i]のパケットをcounts[i]個まで使って、合計がresidual以下で最大になる組み合わせを求める
+    （サイズごとの個数を返す）。
+    個数を1, 2, 4, ... 個のまとまりに分けて0/1ナップサックにし、
+    到達できる合計サイズを真偽値配列のシフトで更新する（O(residual × Σlog(個数))）。
+    """
+    chunk_class, chunk_count = [], []
+    for i, count in enumerate(counts.tolist()):
+        k = 1
+        while count > 0:
+            k = min(k, count)
+            chunk_class.append(i)
+            chunk_count.append(k)
+            count -= k
+            k *= 2
+
+    reachable = np.zeros(residual + 1, dtype=bool)
+    reachable[0] = True
+    # first_chunk[r] = 合計rに最初に到達したときに加えたまとまりの番号
+    first_chunk = np.full(residual + 1, -1, dtype=np.int64)
+    for j, (i, k) in enumerate(zip(chunk_class, chunk_count)):
+        weight = k * int(class_sizes[i])
+        if weight > residual:
+            continue
+        shifted = np.zeros_like(reachable)
+        shifted[weight:] = reachable[:-weight]
+        first_chunk[shifted & ~reachable] = j
+        reachable |= shifted
+
+    # 最大の到達可能な合計から、最初に到達したまとまりをたどって組み合わせを復元する
+    # （たどった先は必ずより前のまとまりで到達しているので、同じまとまりを二度使うことはない）
+    take = np.zeros(len(class_sizes), dtype=np.int64)
+    r = int(np.flatnonzero(reachable)[-1])
+    while r > 0:
+        j = first_chunk[r]
+        take[chunk_class[j]] += chunk_count[j]
+        r -= chunk_count[j] * int(class_sizes[chunk_class[j]])
+    return take
@@ -0,0 +1,154 @@
+import math
+
+import numpy as np
+
+# 画面を使わずにファイルへ描画するためのプロット関数。
+# 何万ステップもある時系列はそのまま渡さず、描画前に点数を減らす（間引く）。
+#   minmax: 区間ごとの最小値と最大値を残す（細い谷や山を取りこぼさない）
+#   lttb:   Largest-Triangle-Three-Buckets。区間ごとに、前後の点と作る三角形が最大の点を1つ残す
+DOWNSAMPLE_METHODS = ("minmax", "lttb")
+DEFAULT_MAX_POINTS = 2000
+# これより多い系列は、凡例を付けずに1つのLineCollectionでまとめて描く
+MAX_LEGEND_SERIES = 10
+
+
+def minmax_downsample(x, y, max_points):
+    """
+    max_points // 2 個の区間に分け、各区間の最小値と最大値の点を（元の順序のまま）残す。
+
+    Returns:
+        (np.ndarray, np.ndarray): 間引いた後のx, y
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    n = len(y)
+    num_bins = max(max_points // 2, 1)
+    if n <= max_points:
+        return x, y
+    bin_size = math.ceil(n / num_bins)
+    num_full = n // bin_size
+    blocks = y[:num_full * bin_size].reshape(num_full, bin_size)
+    offsets = np.arange(num_full) * bin_size
+    keep = [offsets + blocks.argmin(axis=1), offsets + blocks.argmax(axis=1)]
+    if num_full * bin_size < n:
+        tail = y[num_full * bin_size:]
+        keep.append(num_full * bin_size + np.array([tail.argmin(), tail.argmax()]))
+    keep = np.unique(np.concatenate(keep))
+    return x[keep], y[keep]
+
+
+def lttb_downsample(x, y, max_points):
+    """
+    LTTBでmax_points個の点を選ぶ（最初と最後の点は必ず残す）。
+
+    Returns:
+        (np.ndarray, np.ndarray): 間引いた後のx, y
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return x, y
+    xf, yf = x.astype(float), y.astype(float)
+    # 最初と最後を除いた点をmax_points-2個の区間に分ける
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    keep = np.empty(max_points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        # 次の区間の平均の点（最後の区間では最後の点）
+        if i + 2 < len(edges):
+            next_x = xf[end:edges[i + 2]].mean()
+            next_y = yf[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = xf[-1], yf[-1]
+        # 前に選んだ点・この区間の各点・次の区間の平均で作る三角形の面積（の2倍）
+        areas = np.abs((xf[previous] - next_x) * (yf[start:end] - yf[previous])
+                       - (xf[previous] - xf[start:end]) * (next_y - yf[previous]))
+        previous = start + int(areas.argmax())
+        keep[i + 1] = previous
+    return x[keep], y[keep]
+
+
+def downsample(x, y, max_points=DEFAULT_MAX_POINTS, method="minmax"):
+    """methodで指定した方法で、時系列をおよそmax_points個の点に間引く"""
+    if method == "minmax":
+        return minmax_downsample(x, y, max_points)
+    if method == "lttb":
+        return lttb_downsample(x, y, max_points)
+    raise ValueError(f"未知の間引き方: {method}")
+
+
+def _draw_series(ax, series, max_points, method):
+    """
+    1つの軸に、系列のリストを間引いてから描く。
+    seriesの要素は (ラベル, yの配列) か (ラベル, xの配列, yの配列)。
+    """
+    lines = []
+    for item in series:
+        label, *values = item
+        y = np.asarray(values[-1])
+        x = np.asarray(values[0]) if len(values) == 2 else np.arange(len(y))
+        lines.append((label, *downsample(x, y, max_points, method)))
+
+    if len(lines) <= MAX_LEGEND_SERIES:
+        for label, x, y in lines:
+            ax.plot(x, y, label=label, linewidth=1)
+        if any(label is not None for label, _, _ in lines):
+            ax.legend(loc="best", fontsize="small")
+        return
+
+    # 多数の実行は、線ごとのArtistを作らずに1つのLineCollectionとして描く
+    # （ラベルの付いた系列は、重ねた実行の上に個別の線として描いて凡例に出す）
+    from matplotlib.collections import LineCollection
+    runs = [(x, y) for label, x, y in lines if label is None]
+    if runs:
+        collection = LineCollection([np.column_stack([x, y]) for x, y in runs],
+                                    linewidths=0.6, alpha=0.5, cmap="viridis")
+        collection.set_array(np.arange(len(runs)))
+        ax.add_collection(collection)
+        ax.autoscale_view()
+    labeled = [line for line in lines if line[0] is not None]
+    for i, (label, x, y) in enumerate(labeled):
+        # viridisの色と紛れないよう、赤から始まる色で描く
+        ax.plot(x, y, label=label, linewidth=1.5, color=f"C{(3 + i) % 10}", zorder=3)
+    if labeled:
+        ax.legend(loc="best", fontsize="small")
+
+
+def plot_panels(path, panels, title=None, xlabel="Simulation Step",
+                max_points=DEFAULT_MAX_POINTS, method="minmax", panel_height=3.0, dpi=100, ymin=None):
+    """
+    縦に並べた複数の軸（帯域幅・バッファ占有量・報酬など）を1枚の画像に描き、pathに保存する。
+    pyplotを使わずにFigureを直接作るので、画面のないサーバーでも動き、描画の後に待たない。
+
+    Args:
+        path (str): 保存先（拡張子で形式が決まる。例: .png, .svg）
+        panels (list): (縦軸のラベル, 系列のリスト) のリスト。
+            系列は (ラベル, yの配列) か (ラベル, xの配列, yの配列)。多数の実行を1つの軸に重ねられる
+        title (str): 図のタイトル
+        max_points (int): 系列ごとの描画する点数の目安
+        method (str): DOWNSAMPLE_METHODSのいずれか
+        ymin (float): 指定すると、全ての軸の縦軸をこの値から始める（リンク容量なら0）
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, panel_height * len(panels)))
+    axes = fig.subplots(len(panels), 1, sharex=True, squeeze=False)[:, 0]
+    for ax, (ylabel, series) in zip(axes, panels):
+        _draw_series(ax, series, max_points, method)
+        if ylabel:
+            ax.set_ylabel(ylabel)
+        if ymin is not None:
+            ax.set_ylim(bottom=ymin)
+        ax.grid(True)
+    axes[-1].set_xlabel(xlabel)
+    if title:
+        fig.suptitle(title)
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi)
+    return path
+
+
+def plot_series(path, series, title=None, xlabel="Simulation Step", ylabel=None, **kwargs):
+    """系列のリストを1つの軸に描いてpathに保存する（plot_panelsの軸が1つの場合）"""
+    return plot_panels(path, [(ylabel, series)], title=title, xlabel=xlabel, **kwargs)
@@ -0,0 +1,119 @@
+import hashlib
+import inspect
+import json
+import os
+import sys
+
+# シミュレーション結果に影響するソースコード（環境・utils・設定・戦略と、評価ループのあるmain0926.py）。
+# フォルダは中の全ての.pyファイルが対象なので、utilsなどにモジュールを足してもここを変える必要はない。
+# strategiesは、基底クラスのselect_rule()・score_packets()や、RolloutStrategyが先読みに使う規則を含むので丸ごと対象
+_SIMULATION_SOURCES = ["environments", "utils", "configs", "strategies", "main0926.py"]
+_PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def config_fingerprint(config):
+    """
+    設定オブジェクトの全パラメータ（大文字で始まる属性。FREQUENCY_GHzなども含み、
+    親クラスから継承したものも含む）を並び順に依存しない辞書にまとめる。
+    """
+    params = {}
+    for name in dir(config):
+        if not name[:1].isupper():
+            continue
+        value = getattr(config, name)
+        if callable(value):
+            continue
+        params[name] = value
+    # タプルとリストの違いなどに左右されないよう、JSONに通して正規化する
+    return json.loads(json.dumps(params, sort_keys=True, default=repr))
+
+
+def strategy_fingerprint(strategy_class):
+    """戦略クラスを識別する文字列（モジュール名・クラス名・版数）を返す"""
+    version = getattr(strategy_class, 'VERSION', 0)
+    return f"{strategy_class.__module__}.{strategy_class.__qualname__}@{version}"
+
+
+def _hash_file(hasher, path):
+    with open(path, "rb") as f:
+        hasher.update(f.read())
+
+
+def code_version(strategy_class=None):
+    """
+    シミュレーション結果に影響するソースコードのハッシュ値を返す。
+    _SIMULATION_SOURCESと、戦略クラスとその親クラス（標準ライブラリのものを除く）が定義されたファイルが対象。
+    """
+    paths = []
+    for relative in _SIMULATION_SOURCES:
+        path = os.path.join(_PACKAGE_ROOT, relative)
+        if os.path.isdir(path):
+            paths.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".py"))
+        else:
+            paths.append(path)
+    if strategy_class is not None:
+        # strategies以外で定義した戦略や、その親クラスのファイルも含める
+        for cls in strategy_class.__mro__:
+            if cls.__module__.split(".")[0] in sys.stdlib_module_names or cls.__module__ == "builtins":
+                continue
+            paths.append(inspect.getsourcefile(cls))
+
+    hasher = hashlib.sha256()
+    seen = set()
+    for path in paths:
+        path = os.path.abspath(path)
+        if path not in seen:
+            seen.add(path)
+            _hash_file(hasher, path)
+    return hasher.hexdigest()
+
+
+class ResultCache:
+    """
+    実験結果（統計情報）をローカルに保存する、内容アドレス方式のキャッシュ。
+    設定・戦略・シード・コードが同じジョブは、保存済みの結果をそのまま返す。
+    """
+    def __init__(self, cache_dir):
+        """
+        Args:
+            cache_dir (str): 結果ファイルを保存するフォルダ
+        """
+        self.cache_dir = cache_dir
+        self._code_versions = {}
+
+    def make_key(self, config, strategy_class, seed):
+        """設定・戦略・シード・コードの版から、安定したキャッシュキーを計算する"""
+        if strategy_class not in self._code_versions:
+            self._code_versions[strategy_class] = code_version(strategy_class)
+        payload = {
+            "config": config_fingerprint(config),
+            "strategy": strategy_fingerprint(strategy_class),
+            "seed": seed,
+            "code": self._code_versions[strategy_class],
+        }
+        encoded = json.dumps(payload, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, key):
+        # 1フォルダにファイルが集中しないよう、キーの先頭2文字でフォルダを分ける
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """保存済みの統計情報を返す。なければNoneを返す"""
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)["stats"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+
+    def put(self, key, stats, **metadata):
+        """
+        統計情報を保存する。並列に動くワーカーが同じキーを書いても壊れないよう、
+        一時ファイルに書いてから置き換える。
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"stats": stats, "metadata": metadata}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
@@ -0,0 +1,113 @@
+import math
+from statistics import NormalDist
+
+
+def t_quantile(df, confidence=0.95):
+    """
+    自由度df（1以上の整数）のt分布の両側confidence点（例: 95%なら上側2.5%点）を返す。
+    scipyに頼らず、df=1・2は閉じた式で、df>=3は正規分布の分位点からのCornish-Fisher展開を
+    t分布の分布関数でのニュートン法で詰めて求める（どのdfでも数表の値と一致する）。
+    """
+    if df == 1:
+        return math.tan(math.pi * confidence / 2)
+    if df == 2:
+        return confidence * math.sqrt(2 / (1 - confidence**2))
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+    g1 = (z**3 + z) / 4
+    g2 = (5 * z**5 + 16 * z**3 + 3 * z) / 96
+    g3 = (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / 384
+    g4 = (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / 92160
+    t = z + g1 / df + g2 / df**2 + g3 / df**3 + g4 / df**4
+    # 展開の誤差（99%点のdf=3で0.05程度）を、P(|T| <= t) = confidence のニュートン法で詰める
+    log_density_scale = (math.lgamma((df + 1) / 2) - math.lgamma(df / 2)
+                         - 0.5 * math.log(df * math.pi))
+    for _ in range(4):
+        density = math.exp(log_density_scale - (df + 1) / 2 * math.log1p(t * t / df))
+        t -= (_t_central_probability(t, df) - confidence) / (2 * density)
+    return t
+
+
+def _t_central_probability(t, df):
+    """自由度df（整数）のt分布で P(|T| <= t) を、有限級数の閉じた式（Abramowitz-Stegun 26.7.3）で返す"""
+    theta = math.atan(t / math.sqrt(df))
+    sin, cos2 = math.sin(theta), math.cos(theta) ** 2
+    if df % 2 == 0:
+        term = total = 1.0
+        for k in range(2, df - 1, 2):
+            term *= cos2 * (k - 1) / k
+            total += term
+        return sin * total
+    if df == 1:
+        return 2 * theta / math.pi
+    term = total = 1.0
+    for k in range(3, df - 1, 2):
+        term *= cos2 * (k - 1) / k
+        total += term
+    return 2 / math.pi * (theta + sin * math.cos(theta) * total)
+
+
+def mean_confidence_interval(samples, confidence=0.95):
+    """
+    標本（バッチごとの平均など、ほぼ独立とみなせる値）の平均と、その信頼区間の半幅を返す。
+
+    Returns:
+        (float, float): 平均, 信頼区間の半幅（標本が2個未満なら無限大）
+    """
+    n = len(samples)
+    if n == 0:
+        return 0.0, math.inf
+    mean = sum(samples) / n
+    if n < 2:
+        return mean, math.inf
+    variance = sum((x - mean) ** 2 for x in samples) / (n - 1)
+    return mean, t_quantile(n - 1, confidence) * math.sqrt(variance / n)
+
+
+class BatchMeans:
+    """
+    バッチ平均法で、戦略ごとの転送成功率と、戦略間の差の信頼区間を追跡する。
+    各戦略を同じバッチ（同じ乱数で生成した到着系列）で動かし、バッチごとの成功率を記録していく。
+    戦略間の比較は、同じバッチの成功率の差（対応のある差）を標本とするので、
+    到着系列の揺らぎが打ち消され、少ないバッチ数で順位が決まる。
+    """
+    def __init__(self, names, confidence=0.95):
+        self.names = list(names)
+        self.confidence = confidence
+        self.rates = {name: [] for name in self.names}
+
+    @property
+    def num_batches(self):
+        return min(len(rates) for rates in self.rates.values())
+
+    def add(self, name, transmitted, generated):
+        """戦略nameの1バッチ分の転送数・生成数を記録する"""
+        self.rates[name].append(transmitted / generated * 100 if generated else 0.0)
+
+    def interval(self, name):
+        """戦略nameの成功率(%)の平均と信頼区間の半幅"""
+        return mean_confidence_interval(self.rates[name], self.confidence)
+
+    def difference(self, name_a, name_b):
+        """戦略aと戦略bの成功率の差(ポイント)の平均と信頼区間の半幅（同じバッチ同士の差から計算）"""
+        n = self.num_batches
+        diffs = [a - b for a, b in zip(self.rates[name_a][:n], self.rates[name_b][:n])]
+        return mean_confidence_interval(diffs, self.confidence)
+
+    def ranking(self):
+        """成功率の平均が高い順の戦略名"""
+        return sorted(self.names, key=lambda name: self.interval(name)[0], reverse=True)
+
+    def precision_reached(self, precision):
+        """全戦略の信頼区間の半幅がprecision(ポイント)以下になったか"""
+        return all(self.interval(name)[1] <= precision for name in self.names)
+
+    def ranking_settled(self):
+        """順位が隣り合う全ての戦略の組で、差の信頼区間が0を含まなくなったか"""
+        if len(self.names) < 2:
+            return False
+        ranked = self.ranking()
+        for better, worse in zip(ranked, ranked[1:]):
+            mean, half_width = self.difference(better, worse)
+            if mean - half_width <= 0:
+                return False
+        return True
@@ -1,15 +1,48 @@
+import csv
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import torch
 import numpy as np
 
-from config import DqnTrainConfig, ConfigA
+from config import DqnTrainConfig
 from simulation_env import Node
-from DQN_agent import DqnAgent
+from strategies import ShortestTtlFirstStrategy
+from dqn_agent import DqnAgent, QNetwork
+from telemetry import TelemetryServer
+from results_store import ResultsStore
+from offline_dataset import OfflineDataset, ensure_dataset, write_dataset
 
-def evaluate_agent(agent, env, eval_steps = 10000):
-    """学習済みエージェントの性能を評価"""
+def evaluate_agent(agent, config, eval_steps = 10000, store = None):
+    """学習済みエージェントの性能を評価（storeを渡すと結果をResultsStoreに記録）"""
     print("\n--- エージェントの性能評価開始 ---")
+    start_time = time.perf_counter()
+    stats = run_evaluation(agent.policy_net, config, eval_steps)
+    elapsed = time.perf_counter() - start_time
+    if store is not None:
+        store.add("evaluate_agent", config, "DQN", stats, elapsed=elapsed, eval_steps=eval_steps)
+
+    print("\n--- 評価結果 ---")
+    print(f"総生成データ数: {stats['generated']}")
+    print(f"総転送成功データ数: {stats['transmitted']}")
+    print(f"総TTL切れデータ数: {stats['expired']}")
     
-    env = Node(DqnTrainConfig)
+    if stats["generated"] > 0:
+        success_rate = (stats["transmitted"] / stats["generated"]) * 100
+        print(f"転送成功率: {success_rate:.2f}%")
+
+
+def run_evaluation(policy_net, config, eval_steps, seed=None):
+    """
+    Qネットワークが最大のQ値を出す行動を選び続けてeval_stepsステップ分シミュレーションし，統計を返す．
+    seedを指定すると，毎回同じ到着系列（トラフィック）で評価できる．
+    """
+    # 評価用の環境は，学習時と同じ行動の種類・状態の大きさになる設定で作る
+    env = Node(config)
 
     # カウンタの初期化
     total_generated = 0
@@ -17,20 +50,23 @@ def evaluate_agent(agent, env, eval_steps = 10000):
     total_expired = 0
     
     # シミュレーション環境の初期化
-    state = env.reset()
+    state, stats = env.reset(seed=seed)
+    total_generated += stats["generated"]
+    total_expired += stats["expired"]
     
-    for _ in range(eval_steps):
+    # eval_stepsステップ分のシミュレーションが終わるまで（行動はステップ内で何回か選ぶことがある）
+    while env.current_step < eval_steps:
         # 評価時はε-greedyを使わず、最適な行動のみを選択
         with torch.no_grad():
             state_tensor = torch.tensor(state, device="cpu", dtype=torch.float32).unsqueeze(0)
 
-            # agent.policy_net(state_tensor)：Qネットワークに現在の状態を入力し各行動のQ値を予測
-            action = agent.policy_net(state_tensor).max(1)[1].item()
+            # policy_net(state_tensor)：Qネットワークに現在の状態を入力し各行動のQ値を予測
+            action = policy_net(state_tensor).max(1)[1].item()
 
-        # 決定した最善の行動actionを環境に渡し、1ステップ進行
+        # 決定した最善の行動actionを環境に渡し、転送と時間の経過をまとめて進める
         # next_state（次の状態）と、そのステップでの統計情報stats（転送数など）を受け取る
         # 報酬_や終了フラグ_は評価では使わないため、アンダースコアで受け取って無視
-        next_state, _, _, stats = env.step(action)
+        next_state, _, _, truncated, stats = env.step(action)
         # 次のループに備えて、現在の状態を更新
         state = next_state
         
@@ -38,15 +74,141 @@ def evaluate_agent(agent, env, eval_steps = 10000):
         total_generated += stats["generated"]
         total_transmitted += stats["transmitted"]
         total_expired += stats["expired"]
+        if truncated:
+            break
 
-    print("\n--- 評価結果 ---")
-    print(f"総生成データ数: {total_generated}")
-    print(f"総転送成功データ数: {total_transmitted}")
-    print(f"総TTL切れデータ数: {total_expired}")
-    
-    if total_generated > 0:
-        success_rate = (total_transmitted / total_generated) * 100
-        print(f"転送成功率: {success_rate:.2f}%")
+    return {"generated": total_generated, "transmitted": total_transmitted, "expired": total_expired}
+
+
+def _evaluate_snapshot(weights, state_size, action_size, config, eval_steps, seeds):
+    """（評価用のプロセスで実行）保存した重みのQネットワークを，seedsの到着系列それぞれで評価して成功率(%)を返す"""
+    # 学習側のプロセスとCPUを取り合わないように，1スレッドで計算する
+    torch.set_num_threads(1)
+    policy_net = QNetwork(state_size, action_size, config.HIDDEN_LAYER_SIZES,
+                          getattr(config, "DUELING_DQN", False))
+    policy_net.load_state_dict(weights)
+    policy_net.eval()
+    rates = []
+    for seed in seeds:
+        stats = run_evaluation(policy_net, config, eval_steps, seed=seed)
+        rates.append(stats["transmitted"] / stats["generated"] * 100 if stats["generated"] else 0.0)
+    return rates
+
+
+class BackgroundEvaluator:
+    """
+    学習中のpolicy_netの重みを定期的に写し取り，別プロセスで評価する．
+    評価は固定したシード（EVAL_SEEDS）の到着系列で行うので，時点ごとの成績をそのまま比べられる．
+    結果が届くたびに学習曲線のファイル（CSV）に1行ずつ追記する．学習側は評価の終わりを待たない．
+    """
+    def __init__(self, state_size, action_size, config, path):
+        self.state_size = state_size
+        self.action_size = action_size
+        self.config = config
+        self.path = path
+        self.eval_steps = getattr(config, "EVAL_STEPS", 2000)
+        self.seeds = tuple(getattr(config, "EVAL_SEEDS", (0, 1, 2)))
+        # 評価が学習より遅い場合に溜め込まないよう，待ちがこの数以上なら新しい評価は見送る
+        self.max_pending = getattr(config, "EVAL_MAX_PENDING", 2)
+        self.pending = []
+        self.start_time = time.time()
+        # PyTorchを読み込んだプロセスをforkすると固まることがあるので，spawnで評価用のプロセスを作る
+        self.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        with open(self.path, "w", newline="") as f:
+            csv.writer(f).writerow(["step", "train_seconds", "success_rate"]
+                                   + [f"seed_{seed}" for seed in self.seeds])
+
+    def submit(self, step, policy_net, wait=False):
+        """
+        policy_netの今の重みの評価を依頼する（見送った場合はFalse）．
+        wait=Trueなら，待ちが多いときは古い評価が終わるのを待ってから必ず依頼する．
+        """
+        self.poll()
+        if len(self.pending) >= self.max_pending:
+            if not wait:
+                return False
+            self.pending[0][2].result()
+            self.poll()
+        weights = {name: tensor.detach().cpu().clone() for name, tensor in policy_net.state_dict().items()}
+        future = self.executor.submit(_evaluate_snapshot, weights, self.state_size, self.action_size,
+                                      self.config, self.eval_steps, self.seeds)
+        self.pending.append((step, time.time() - self.start_time, future))
+        return True
+
+    def poll(self):
+        """終わった評価の結果を学習曲線のファイルに書き出す（依頼した順に書く）"""
+        while self.pending and self.pending[0][2].done():
+            step, train_seconds, future = self.pending.pop(0)
+            rates = future.result()
+            with open(self.path, "a", newline="") as f:
+                csv.writer(f).writerow([step, f"{train_seconds:.1f}", f"{np.mean(rates):.2f}"]
+                                       + [f"{rate:.2f}" for rate in rates])
+            print(f"[評価] ステップ: {step}, 転送成功率(固定トラフィック{len(rates)}本の平均): {np.mean(rates):.2f}%")
+
+    def close(self):
+        """残っている評価を待って書き出し，評価用のプロセスを終了する"""
+        for _, _, future in self.pending:
+            future.result()
+        self.poll()
+        self.executor.shutdown()
+
+
+class TrainingHistory:
+    """
+    学習中のシミュレーションのステップごとの帯域幅・バッファ占有量・報酬の合計を記録し，
+    学習の後に学習曲線（BackgroundEvaluatorのCSV）と合わせて1枚の画像に描く．
+    """
+    def __init__(self):
+        self.steps, self.bandwidths, self.buffer_packets, self.rewards = [], [], [], []
+
+    def record(self, step, bandwidth, buffer_packets, reward):
+        """1回の行動の結果を記録する（同じステップの行動の報酬は足し合わせる）"""
+        if self.steps and self.steps[-1] == step:
+            self.rewards[-1] += reward
+            return
+        self.steps.append(step)
+        self.bandwidths.append(bandwidth)
+        self.buffer_packets.append(buffer_packets)
+        self.rewards.append(reward)
+
+    def plot(self, path, curve_path=None, title=None):
+        """記録した時系列（とcurve_pathの学習曲線があればそれも）を縦に並べてpathに保存する"""
+        # 描画は0926new/utils/plotting.pyのplot_panelsを共有して使う（matplotlibはここで初めて読み込む）
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "0926new"))
+        from utils.plotting import plot_panels
+
+        panels = [
+            ("Bandwidth", [(None, self.steps, self.bandwidths)]),
+            ("Buffer Packets", [(None, self.steps, self.buffer_packets)]),
+            ("Reward per Step", [(None, self.steps, self.rewards)]),
+        ]
+        if curve_path and os.path.exists(curve_path):
+            with open(curve_path, newline="") as f:
+                rows = list(csv.DictReader(f))
+            if rows:
+                curve_steps = [int(row["step"]) for row in rows]
+                seed_columns = [name for name in rows[0] if name.startswith("seed_")]
+                series = [(name, curve_steps, [float(row[name]) for row in rows]) for name in seed_columns]
+                series.append(("mean", curve_steps, [float(row["success_rate"]) for row in rows]))
+                panels.append(("Success Rate (%)", series))
+        plot_panels(path, panels, title=title)
+        print(f"学習の経過を描きました: {path}")
+
+
+def make_offline_dataset(config, path, num_steps, seed=None):
+    """最小TTL優先の戦略でnum_stepsステップ動かし，その遷移をpathのオフラインデータセットに書き出す"""
+    env = Node(config)
+    strategy = ShortestTtlFirstStrategy()
+    if env.action_mode == "macro":
+        # macroモードの行動は規則の番号
+        action = Node.MACRO_RULES.index(ShortestTtlFirstStrategy)
+        policy = lambda env: action
+    else:
+        policy = lambda env: env.buffer.index(strategy.select_packet(env.buffer))
+    num_transitions = write_dataset(path, config.BUFFER_PACKET_LIMIT * 2, [(env, policy, None)], num_steps,
+                                    seed=seed, config=config.NAME, action_mode=env.action_mode,
+                                    strategies=["ShortestTtlFirstStrategy"])
+    print(f"オフラインデータセットを作りました: {path}（{num_transitions}遷移）")
 
 
 def train_dqn():
@@ -56,61 +218,132 @@ def train_dqn():
     
     # 状態と行動の次元数を設定から取得
     state_size = config.BUFFER_PACKET_LIMIT * 2 # TTLとサイズの2つの特徴量
-    action_size = config.BUFFER_PACKET_LIMIT
+    action_size = env.num_actions # packetモードはパケットの位置，macroモードは戦略の番号
     
     agent = DqnAgent(state_size, action_size, config)
+
+    # OFFLINE_DATASET_PATHを設定すると，ヒューリスティック戦略の遷移で事前学習してから始める
+    dataset_path = getattr(config, "OFFLINE_DATASET_PATH", None)
+    if dataset_path:
+        # 書き終えたデータセットが無ければ（途中で止まったものも含めて）作り直す
+        ensure_dataset(dataset_path, lambda path: make_offline_dataset(
+            config, path, getattr(config, "OFFLINE_DATASET_STEPS", 20000)))
+        seeded = agent.warm_start(OfflineDataset(dataset_path))
+        print(f"オフラインデータセットで事前学習しました: {dataset_path}（リプレイバッファに{seeded}件）")
     
-    rewards_log = []
-    
-    print(f"--- {config.NAME} 開始 ---")
-    state = env.reset()
+    # 直近1000行動分の報酬（古いものは自動的に捨てる）
+    rewards_log = deque(maxlen=1000)
+
+    # TELEMETRY_PORTを設定すると，進み具合をローカルのHTTP/WebSocketで配信する
+    telemetry = None
+    telemetry_port = getattr(config, "TELEMETRY_PORT", None)
+    if telemetry_port is not None:
+        telemetry = TelemetryServer(telemetry_port).start()
+    telemetry_interval = getattr(config, "TELEMETRY_INTERVAL", 100)
+    next_telemetry = telemetry_interval
     
-    for step in range(1, config.SIMULATION_STEPS + 1):
-        # 1. 時間を1ステップ進める (現在のステップ数を渡す)
-        expired_reward, _ = env.update_time(current_step=step)
+    # EVAL_INTERVALステップごとに，学習を止めずに別プロセスで性能を評価する（0なら評価しない）
+    eval_interval = getattr(config, "EVAL_INTERVAL", 0)
+    evaluator = None
+    if eval_interval:
+        evaluator = BackgroundEvaluator(state_size, action_size, config,
+                                        getattr(config, "LEARNING_CURVE_PATH", "learning_curve.csv"))
 
-        # 2. エージェントが行動を選択
+    # TRAINING_PLOT_PATHを設定すると，ステップごとの帯域幅・バッファ占有量・報酬を記録して最後に描く
+    plot_path = getattr(config, "TRAINING_PLOT_PATH", None)
+    history = TrainingHistory() if plot_path else None
+
+    print(f"--- {config.NAME} 開始 (行動: {env.action_mode}) ---")
+    # 最初に行動を選ぶステップまで進めた状態を受け取る
+    state, _ = env.reset()
+    next_target_update = config.TARGET_UPDATE_FREQUENCY
+    next_report = 1000
+    next_eval = eval_interval
+    last_eval = None
+    
+    while True:
+        # 1. エージェントが行動を選択
         action_tensor = agent.select_action(state)
         action = action_tensor.item()
         
-        # 3. 環境が1ステップ進む
-        next_state, reward, done, _ = env.step(action)
+        # 2. 転送と時間の経過をまとめて進める（時間経過によるTTL切れの罰則も報酬に含まれる）
+        next_state, reward, terminated, truncated, _ = env.step(action)
         reward_tensor = torch.tensor([reward], device="cpu")
         
-        # 4. 経験をリプレイバッファに保存
-        agent.buffer.push(state, action_tensor, reward_tensor, next_state)
+        # 3. 経験をリプレイバッファに保存（N_STEP_RETURNSが2以上ならnステップ分まとめてから）
+        agent.remember(state, action_tensor, reward_tensor, next_state)
         
         state = next_state
         
-        # 5. エージェントの学習
+        # 4. エージェントの学習
         agent.learn()
         
-        # 6. ターゲットネットワークの更新
-        if step % config.TARGET_UPDATE_FREQUENCY == 0:
-            agent.target_net.load_state_dict(agent.policy_net.state_dict())
+        # 5. ターゲットネットワークの更新（シミュレーションのステップ数で数える）
+        # （TARGET_UPDATE_TAUを設定した場合は、agent.learn()の中で毎回少しずつ更新される）
+        step = env.current_step + 1
+        if step >= next_target_update:
+            if agent.target_tau is None:
+                agent.update_target()
+            next_target_update += config.TARGET_UPDATE_FREQUENCY
             
         rewards_log.append(reward)
+        if history is not None:
+            history.record(step, env.bandwidth, len(env.buffer), reward)
         
         # 定期的に進捗を表示
-        if step % 1000 == 0:
-            avg_reward = np.mean(rewards_log[-1000:])
-            print(f"ステップ: {step}/{config.SIMULATION_STEPS}, 平均報酬(直近1000): {avg_reward:.2f}")
+        if step >= next_report:
+            avg_reward = np.mean(rewards_log)
+            print(f"ステップ: {step}/{config.SIMULATION_STEPS}, 平均報酬(直近1000行動): {avg_reward:.2f}")
+            next_report += 1000
 
+        # TELEMETRY_INTERVALステップごとに記録を置く（値は記録するときにだけ取り出す）
+        if telemetry is not None and step >= next_telemetry:
+            telemetry.publish(
+                step=step, reward=reward, avg_reward=float(np.mean(rewards_log)), epsilon=float(agent.epsilon),
+                loss=None if agent.last_loss is None else agent.last_loss.item(),
+                buffer_packets=len(env.buffer), link_capacity=env.bandwidth)
+            next_telemetry += telemetry_interval
+
+        # 6. 重みを写し取って評価を依頼し，届いた結果を学習曲線に書き出す
+        if evaluator is not None:
+            if step >= next_eval:
+                evaluator.submit(step, agent.policy_net)
+                last_eval = step
+                next_eval += eval_interval
+            else:
+                evaluator.poll()
+
+        if terminated or truncated:
+            agent.end_episode()
+            break
+
+    if evaluator is not None:
+        # 最終的な重みも評価してから終了する
+        if last_eval != step:
+            evaluator.submit(step, agent.policy_net, wait=True)
+        evaluator.close()
+    if telemetry is not None:
+        telemetry.close()
+    if history is not None:
+        history.plot(plot_path, evaluator.path if evaluator is not None else None, title=config.NAME)
     print("--- 学習終了 ---")
     return agent
 
-    # 学習が終わったら評価関数を呼び出す
-    evaluate_agent(agent, env)
-
 if __name__ == "__main__":
     # 1. DQNエージェントを訓練する
     trained_agent = train_dqn()
 
-    # 2. 比較対象と同じテストシナリオ(ConfigA)を準備する
-    test_config = ConfigA()
+    # 2. 学習時と同じ状態・行動の大きさを持つシナリオで評価する
+    # （ConfigAはバッファの最大パケット数が違い、ネットワークの入力の大きさが合わない）
+    test_config = DqnTrainConfig()
 
-    # 3. 訓練済みエージェントを、テストシナリオで評価する
-    evaluate_agent(trained_agent, test_config)
+    # 3. 訓練済みエージェントを、テストシナリオで評価する（RESULTS_DB_PATHがあれば結果を記録）
+    results_db = getattr(test_config, "RESULTS_DB_PATH", None)
+    if results_db:
+        with ResultsStore(results_db) as store:
+            evaluate_agent(trained_agent, test_config, store=store)
+    else:
+        evaluate_agent(trained_agent, test_config)
 
 
 # if __name__ == "__main__":
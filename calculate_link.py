@@ -1,5 +1,10 @@
 import math
-import matplotlib.pyplot as plt
+import os
+import sys
+
+# 描画は0926new/utils/plotting.pyのplot_seriesを共有して使う（直下のモジュールが優先されるよう末尾に加える）
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "0926new"))
+from utils.plotting import plot_series
 
 # --- 1. 基本設定 ---
 # このセクションの値を変更することで、様々なシミュレーションが可能です。
@@ -57,9 +62,9 @@ def calculate_bandwidth_at_step(current_step):
         
     return current_bandwidth
 
-def main():
+def main(path="bandwidth.png"):
     """
-    シミュレーションを実行し、結果をプロットするメイン関数
+    シミュレーションを実行し、結果を画像ファイルpathにプロットするメイン関数
     """
     print("GEO-LEO間リンク容量シミュレーションを開始します。")
     
@@ -79,15 +84,12 @@ def main():
     print("シミュレーションが完了しました。")
 
     # --- 8. 結果をグラフで可視化 ---
-    plt.figure(figsize=(10, 6))
-    plt.plot(timesteps, bandwidths)
-    plt.title("Bandwidth Variation between GEO and LEO Satellites")
-    plt.xlabel("Simulation Step")
-    plt.ylabel(f"Bandwidth ({'Mbps' if MAX_BANDWIDTH else ''})")
-    plt.grid(True)
-    plt.ylim(bottom=0)
-    plt.show()
+    # 画像ファイルに描く（画面のないサーバーでも動き、表示を待たない）
+    plot_series(path, [(None, timesteps, bandwidths)], title="Bandwidth Variation between GEO and LEO Satellites",
+                ylabel=f"Bandwidth ({'Mbps' if MAX_BANDWIDTH else ''})", ymin=0)
+    print(f"プロットを保存しました: {path}")
 
 # このスクリプトが直接実行された場合にmain関数を呼び出す
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # 引数で保存先を変えられる
+    main(path=sys.argv[1] if len(sys.argv) > 1 else "bandwidth.png")
\ No newline at end of file
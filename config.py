@@ -44,6 +44,7 @@ class DqnTrainConfig(BaseConfig):
     MAX_PACKETS_PER_STEP = 5
     BUFFER_PACKET_LIMIT = 100    # バッファの最大パケット数を固定
     BUFFER_BYTE_LIMIT = 500      # こちらは参考値とする
+    ACTION_MODE = "packet"       # 行動の種類 ("packet": パケットごとに選ぶ, "macro": ステップごとに戦略を選ぶ)
 
     # --- DQN Hyperparameters ---
     HIDDEN_LAYER_SIZES = [128, 128] # 中間層のノード数をリストで指定
@@ -55,4 +56,30 @@ class DqnTrainConfig(BaseConfig):
     LEARNING_RATE = 1e-4            # 学習率
     BATCH_SIZE = 128                # バッチサイズ
     TARGET_UPDATE_FREQUENCY = 15    # ターゲットネットワークの更新頻度 (ステップ数)
+    TARGET_UPDATE_TAU = None        # 設定すると学習ごとにこの割合だけターゲットを近づける (Polyak平均)
+    DOUBLE_DQN = False              # Double DQNのターゲットを使うか
+    DUELING_DQN = False             # 状態価値とアドバンテージに分けたQネットワークを使うか
+    N_STEP_RETURNS = 1              # 報酬をまとめるステップ数 (nステップ・リターン)
+
+    # --- ヒューリスティック戦略の遷移による事前学習 ---
+    OFFLINE_DATASET_PATH = None     # データセットのフォルダ (Noneなら事前学習しない, 無ければ最小TTL優先で作る)
+    OFFLINE_DATASET_STEPS = 20000   # データセットを作るときのシミュレーションのステップ数
+    PRETRAIN_MODE = "bc"            # "bc": 行動クローニング, "td": データセットの遷移でのオフラインTD学習
+    PRETRAIN_UPDATES = 2000         # 事前学習の更新回数
+    OFFLINE_REPLAY_SIZE = None      # リプレイバッファに入れておく遷移の数 (Noneなら容量まで)
+    PRETRAIN_EPSILON_START = 0.2    # 事前学習した後のεの初期値
+
+    # --- 学習中の評価（別プロセスで実行） ---
+    EVAL_INTERVAL = 0               # 評価の間隔 (ステップ数, 0なら評価しない. 例: 5000)
+    EVAL_STEPS = 2000               # 1回の評価でシミュレーションするステップ数
+    EVAL_SEEDS = (0, 1, 2)          # 評価に使う到着系列のシード (毎回同じトラフィックで比べる)
+    LEARNING_CURVE_PATH = "learning_curve.csv" # 学習曲線の保存先
+    TRAINING_PLOT_PATH = None       # 学習中の帯域幅・バッファ占有量・報酬と学習曲線を描く画像 (Noneなら描かない)
+
+    # --- 進み具合の配信（ローカルのHTTP/WebSocket） ---
+    TELEMETRY_PORT = None           # 配信するポート番号 (Noneなら配信しない)
+    TELEMETRY_INTERVAL = 100        # 記録する間隔 (ステップ数)
+
+    # --- 結果の記録 ---
+    RESULTS_DB_PATH = "results.sqlite" # 評価結果を記録するSQLiteファイル (Noneなら記録しない)
 
@@ -11,7 +11,8 @@ import numpy as np
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 # エージェントが経験した「状態，行動．報酬，次の報酬」という一連の出来事をまとめて保存
-Experience = namedtuple('Experience', ('state', 'action', 'reward', 'next_state'))
+# discount：next_stateのQ値に掛ける割引（nステップ分まとめた経験ならγ^n．Noneならγ）
+Experience = namedtuple('Experience', ('state', 'action', 'reward', 'next_state', 'discount'), defaults=(None,))
 
 """ エージェントの経験を蓄積して，学習時にランダムに経験を抽出 """
 class ReplayBuffer:
@@ -33,12 +34,42 @@ class ReplayBuffer:
     def __len__(self):
         return len(self.memory)
 
+    # チェックポイントに保存できるよう，経験を列ごとのテンソルにまとめて返す（discountがNoneの経験はNaN）
+    def state_dict(self):
+        if not self.memory:
+            return {"capacity": self.memory.maxlen, "size": 0}
+        batch = Experience(*zip(*self.memory))
+        return {
+            "capacity": self.memory.maxlen,
+            "size": len(self.memory),
+            "state": torch.as_tensor(np.stack(batch.state)),
+            "action": torch.cat(batch.action).view(-1).cpu(),
+            "reward": torch.cat(batch.reward).view(-1).cpu(),
+            "next_state": torch.as_tensor(np.stack(batch.next_state)),
+            "discount": torch.tensor([float("nan") if d is None else d for d in batch.discount]),
+        }
+
+    # state_dict()で保存した経験を，古い順にバッファに戻す（今の容量を超える分は古いものから捨てる）
+    def load_state_dict(self, state):
+        self.memory.clear()
+        if not state["size"]:
+            return
+        for i in range(state["size"]):
+            discount = float(state["discount"][i])
+            self.memory.append(Experience(
+                state["state"][i].numpy(), state["action"][i].view(1, 1).to(device),
+                state["reward"][i].view(1).to(device), state["next_state"][i].numpy(),
+                None if np.isnan(discount) else discount))
+
 """ Q値を予測するためのNN本体 """
 class QNetwork(nn.Module):
     # ネットワークの構造を定義
-    def __init__(self, state_size, action_size, hidden_sizes):
+    # dueling=Trueなら，中間層の後を「状態価値V」と「各行動のアドバンテージA」の2つの出力に分け，
+    # Q = V + (A - Aの平均) として組み合わせる（Dueling DQN）
+    def __init__(self, state_size, action_size, hidden_sizes, dueling=False):
         # 親クラスの「nn.Module」も継承に必要
         super(QNetwork, self).__init__()
+        self.dueling = dueling
 
         layers = []
         input_size = state_size
@@ -48,8 +79,13 @@ class QNetwork(nn.Module):
             layers.append(nn.ReLU()) # 活性化関数ReLUを追加
             input_size = hidden_size # 次の層の入力サイズを更新
 
-        # 最終的な出力層を追加
-        layers.append(nn.Linear(input_size, action_size))
+        if dueling:
+            # 状態価値V（1つ）とアドバンテージA（行動の数）の出力層
+            self.value_head = nn.Linear(input_size, 1)
+            self.advantage_head = nn.Linear(input_size, action_size)
+        else:
+            # 最終的な出力層を追加
+            layers.append(nn.Linear(input_size, action_size))
 
         # layersリストの中に順番に格納した層（nn.Linear, nn.ReLUなど）を
         # 1つの連続したネットワークモジュールにまとめる
@@ -58,7 +94,11 @@ class QNetwork(nn.Module):
 
         # 入力データxをself.networkに渡すだけで，nn.Sequentialが自動的にリストの先頭から順番に層を適用して最終的な計算結果を返す
     def forward(self, x):
-        return self.network(x)
+        if not self.dueling:
+            return self.network(x)
+        features = self.network(x)
+        advantage = self.advantage_head(features)
+        return self.value_head(features) + advantage - advantage.mean(dim=1, keepdim=True)
 
     #     # 結合層を定義．
     #     # nn.Linear：データを分析して重みを学習する線形層．
@@ -89,11 +129,27 @@ class DqnAgent:
         # ステップ数カウンターの初期化
         self.steps_done = 0
 
+        # DQNの改良手法（configに無ければ通常のDQN）
+        # DOUBLE_DQN：次の状態の行動はpolicy_netで選び，そのQ値はtarget_netで評価する（Q値の過大評価を抑える）
+        self.double_dqn = getattr(config, 'DOUBLE_DQN', False)
+        # N_STEP_RETURNS：nステップ分の報酬をまとめてから，n個先の状態のQ値で補う（報酬が早く伝わる）
+        self.n_step = getattr(config, 'N_STEP_RETURNS', 1)
+        # TARGET_UPDATE_TAU：設定すると，学習のたびにtarget_netをpolicy_netへτだけ近づける（Polyak平均）
+        # Noneなら，呼び出し側がTARGET_UPDATE_FREQUENCYごとにupdate_target()で丸ごと写す
+        self.target_tau = getattr(config, 'TARGET_UPDATE_TAU', None)
+        # nステップ分の報酬をまとめる前の，直近の経験
+        self.n_step_queue = deque()
+        # 直近のlearn()での損失（まだ学習していなければNone）
+        self.last_loss = None
+        # εの初期値（warm_start()で事前学習した後は，PRETRAIN_EPSILON_STARTに下げる）
+        self.epsilon_start = config.EPSILON_START
+
         # QNetworkの初期化時に、configから隠れ層のサイズリストを渡す
+        dueling = getattr(config, 'DUELING_DQN', False)
         # policy_net：実際に行動を決定し、学習で更新されるメインのネットワーク
-        self.policy_net = QNetwork(state_size, action_size, config.HIDDEN_LAYER_SIZES).to(device)
+        self.policy_net = QNetwork(state_size, action_size, config.HIDDEN_LAYER_SIZES, dueling).to(device)
         # target_net：学習を安定させるために、学習目標（TDターゲット）の計算に使うネットワーク
-        self.target_net = QNetwork(state_size, action_size, config.HIDDEN_LAYER_SIZES).to(device)
+        self.target_net = QNetwork(state_size, action_size, config.HIDDEN_LAYER_SIZES, dueling).to(device)
 
         # target_netの重みをpolicy_netと全く同じ状態に初期化
         self.target_net.load_state_dict(self.policy_net.state_dict())
@@ -105,11 +161,16 @@ class DqnAgent:
         # ReplayBufferの初期化時に、configから容量を渡す
         self.buffer = ReplayBuffer(config.REPLAY_BUFFER_CAPACITY)
 
-    """ ε-greedy法に基づいて、現在の状態でどの行動をとるかを決定 """
-    def select_action(self, state):
-        # 探索（Exploration）を行う確率εを計算．学習が進むほど指数関数的に減少．
-        epsilon = self.config.EPSILON_END + (self.config.EPSILON_START - self.config.EPSILON_END) * \
-                  np.exp(-1. * self.steps_done / self.config.EPSILON_DECAY)  # ε_decay：εの減少速度
+    """ 探索（Exploration）を行う確率ε．学習が進むほど指数関数的に減少． """
+    @property
+    def epsilon(self):
+        return self.config.EPSILON_END + (self.epsilon_start - self.config.EPSILON_END) * \
+               np.exp(-1. * self.steps_done / self.config.EPSILON_DECAY)  # ε_decay：εの減少速度
+
+    """ ε-greedy法に基づいて、現在の状態でどの行動をとるかを決定（action_range=(開始, 終了+1)なら，その区間の行動だけから選ぶ） """
+    def select_action(self, state, action_range=None):
+        # 探索（Exploration）を行う確率ε
+        epsilon = self.epsilon
         # steps_done：行動選択回数．
         self.steps_done += 1
 
@@ -126,14 +187,56 @@ class DqnAgent:
                 # .max(1)： Q値のリストの中から、最大値とそのインデックスを検索
                 # [1]: .max(1)が返す(最大値, インデックス)のうち、インデックスの方だけを抽出 ==> Q値が最大となる「最善の行動」
                 # .view(1, 1): 結果の形を環境が受け取れるように[[行動インデックス]]の形に整えて出力
-                return self.policy_net(state_tensor).max(1)[1].view(1, 1)
+                if action_range is None:
+                    return self.policy_net(state_tensor).max(1)[1].view(1, 1)
+                # 区間の中でQ値が最大の行動
+                start, end = action_range
+                return (self.policy_net(state_tensor)[:, start:end].max(1)[1] + start).view(1, 1)
         # ε以下の乱数が出た場合は「探索：未知の行動をランダムに選択」
         else:
             # self.action_size: エージェントが取りうる行動の総数
             # random.randrange(range): 0から(range - 1)までの整数をランダムに選択
             # torch.tensor(action)： 選ばれた行動をテンソルに変換
             # torch.long： 64ビットの整数
-            return torch.tensor([[random.randrange(self.action_size)]], device = device, dtype = torch.long)
+            if action_range is None:
+                return torch.tensor([[random.randrange(self.action_size)]], device = device, dtype = torch.long)
+            return torch.tensor([[random.randrange(*action_range)]], device = device, dtype = torch.long)
+
+    """ 経験をリプレイバッファに保存（N_STEP_RETURNSが2以上なら，nステップ分の報酬をまとめてから保存） """
+    def remember(self, state, action, reward, next_state):
+        if self.n_step <= 1:
+            self.buffer.push(state, action, reward, next_state)
+            return
+        self.n_step_queue.append((state, action, reward, next_state))
+        if len(self.n_step_queue) >= self.n_step:
+            self._push_n_step()
+
+    """ エピソードの終わり（環境をリセットする前）に，まとめきれていない経験をステップ数の短いまま保存 """
+    def end_episode(self):
+        while self.n_step_queue:
+            self._push_n_step()
+
+    # キューの先頭の経験から，キューにある分だけの報酬をまとめた経験を1つ作って保存
+    def _push_n_step(self):
+        gamma = self.config.GAMMA
+        state, action, reward, _ = self.n_step_queue[0]
+        next_state = self.n_step_queue[-1][3]
+        discount = 1.0
+        for _, _, step_reward, _ in list(self.n_step_queue)[1:]:
+            discount *= gamma
+            reward = reward + discount * step_reward
+        self.buffer.push(state, action, reward, next_state, discount * gamma)
+        self.n_step_queue.popleft()
+
+    """ target_netをpolicy_netに合わせる（TARGET_UPDATE_TAUがあればτだけ近づける．hard=Trueなら必ず丸ごと写す） """
+    def update_target(self, hard=False):
+        # state_dictを作り直さず，パラメータをその場で書き換える
+        with torch.no_grad():
+            for target_param, policy_param in zip(self.target_net.parameters(), self.policy_net.parameters()):
+                if hard or self.target_tau is None:
+                    target_param.copy_(policy_param)
+                else:
+                    target_param.lerp_(policy_param, self.target_tau)
 
     """ リプレイバッファから経験をサンプリングし、ニューラルネットワークを更新 """
     def learn(self):
@@ -146,23 +249,38 @@ class DqnAgent:
         batch = Experience(*zip(*experiences))
 
         # 整理した各リストを、PyTorchが扱えるテンソルの形式に変換
-        state_batch = torch.cat([torch.tensor(s, device=device).unsqueeze(0) for s in batch.state])
+        # （状態はnumpyの配列にまとめてから1回で変換する）
+        state_batch = torch.as_tensor(np.stack(batch.state), device=device)
         action_batch = torch.cat(batch.action)
         reward_batch = torch.cat(batch.reward)
-        next_state_batch = torch.cat([torch.tensor(s, device=device).unsqueeze(0) for s in batch.next_state])
-        
+        next_state_batch = torch.as_tensor(np.stack(batch.next_state), device=device)
+        discount_batch = torch.tensor([self.config.GAMMA if d is None else d for d in batch.discount],
+                                      device=device, dtype=torch.float32)
+        self._td_update(state_batch, action_batch, reward_batch, next_state_batch, discount_batch)
+
+    # バッチの経験に対するTD誤差でpolicy_netを1回更新（learn()とオフラインの事前学習で共通）
+    def _td_update(self, state_batch, action_batch, reward_batch, next_state_batch, discount_batch):
         # policy_netで、バッチ内の各状態で「実際に取った行動」のQ値を計算
         state_action_values = self.policy_net(state_batch).gather(1, action_batch)
         
         # ターゲットQ値
         # target_netを使って、「次の状態」で取りうる行動の中で最大のQ値を計算。
-        # .detach()でこの部分が学習に影響しないよう  ???
-        next_state_values = self.target_net(next_state_batch).max(1)[0].detach()
+        # no_gradでこの部分が学習に影響しないようにする
+        with torch.no_grad():
+            if self.double_dqn:
+                # 行動はpolicy_netで選び、そのQ値をtarget_netで評価する
+                next_actions = self.policy_net(next_state_batch).argmax(1, keepdim=True)
+                next_state_values = self.target_net(next_state_batch).gather(1, next_actions).squeeze(1)
+            else:
+                next_state_values = self.target_net(next_state_batch).max(1)[0]
         # 報酬 + γ × (次の状態での最大Q値) というDQNの更新式に従い、学習の目標となる「理想的なQ値」を計算
-        expected_state_action_values = reward_batch + (next_state_values * self.config.GAMMA)
+        # （nステップ分まとめた経験では、報酬はnステップの割引和、γはγ^n）
+        expected_state_action_values = reward_batch + (next_state_values * discount_batch)
 
         # 「予測Q値」と「ターゲットQ値」の差（誤差）を計算
         loss = F.smooth_l1_loss(state_action_values, expected_state_action_values.unsqueeze(1))
+        # 進み具合の表示用に、直近の損失を（値を取り出さずに）残しておく
+        self.last_loss = loss.detach()
 
         """ネットワークの更新"""
         # 前回の勾配をリセット
@@ -173,4 +291,60 @@ class DqnAgent:
         for param in self.policy_net.parameters():
             param.grad.data.clamp_(-1, 1)
         # step：計算された勾配に基づいて、optimizerがネットワークの重みを更新
-        self.optimizer.step()
\ No newline at end of file
+        self.optimizer.step()
+
+        # Polyak平均では、学習のたびにtarget_netを少しずつ近づける
+        if self.target_tau is not None:
+            self.update_target()
+
+    """ オフラインのデータセット（ヒューリスティック戦略の遷移）からnum_updates回学習する """
+    def pretrain(self, dataset, num_updates, mode="bc"):
+        # mode="bc"：各状態でのヒューリスティックの行動を，Q値を分類のスコアとみなして真似る（行動クローニング）
+        # mode="td"：データセットの遷移で，learn()と同じTD誤差の学習をする（オフラインTD）
+        if mode not in ("bc", "td"):
+            raise ValueError(f"未知の事前学習の方法: {mode}")
+        if dataset.state_size != self.state_size:
+            raise ValueError(f"データセットの状態の大きさ({dataset.state_size})がエージェント({self.state_size})と違います")
+        # サンプリングの乱数はrandomから作る（実験側でrandom.seed()すれば再現できる）
+        rng = np.random.default_rng(random.getrandbits(32))
+        batch_size = min(self.config.BATCH_SIZE, len(dataset))
+        gamma = torch.full((batch_size,), self.config.GAMMA, device=device)
+        for update in range(1, num_updates + 1):
+            states, actions, rewards, next_states = dataset.sample(batch_size, rng)
+            state_batch = torch.as_tensor(states, device=device)
+            action_batch = torch.as_tensor(actions, device=device).unsqueeze(1)
+            if mode == "td":
+                self._td_update(state_batch, action_batch, torch.as_tensor(rewards, device=device),
+                                torch.as_tensor(next_states, device=device), gamma)
+                if self.target_tau is None and update % self.config.TARGET_UPDATE_FREQUENCY == 0:
+                    self.update_target()
+                continue
+            loss = F.cross_entropy(self.policy_net(state_batch), action_batch.squeeze(1))
+            self.last_loss = loss.detach()
+            self.optimizer.zero_grad()
+            loss.backward()
+            self.optimizer.step()
+        # オンラインの学習はtarget_netをpolicy_netと同じ状態から始める
+        self.update_target(hard=True)
+
+    """ データセットから無作為に選んだcount個（省略時はリプレイバッファの容量まで）の遷移をリプレイバッファに入れる """
+    def seed_replay(self, dataset, count=None):
+        capacity = self.buffer.memory.maxlen
+        count = min(len(dataset), capacity if count is None else count)
+        if count <= 0:
+            return 0
+        indices = np.array(random.sample(range(len(dataset)), count))
+        states, actions, rewards, next_states = dataset.batch(indices)
+        for state, action, reward, next_state in zip(states, actions, rewards, next_states):
+            self.buffer.push(state, torch.tensor([[action]], device=device, dtype=torch.long),
+                             torch.tensor([reward], device=device), next_state)
+        return count
+
+    """ configの設定（PRETRAIN_MODE, PRETRAIN_UPDATES, OFFLINE_REPLAY_SIZE, PRETRAIN_EPSILON_START）でデータセットから学習を始める """
+    def warm_start(self, dataset):
+        self.pretrain(dataset, getattr(self.config, 'PRETRAIN_UPDATES', 2000),
+                      getattr(self.config, 'PRETRAIN_MODE', 'bc'))
+        seeded = self.seed_replay(dataset, getattr(self.config, 'OFFLINE_REPLAY_SIZE', None))
+        # 事前学習で方策ができているので，最初から大きく探索しなくてよい
+        self.epsilon_start = getattr(self.config, 'PRETRAIN_EPSILON_START', self.epsilon_start)
+        return seeded
@@ -11,7 +11,6 @@ def run_simulation(config, strategy_class, title_prefix):
     stats = {"generated": 0, "transmitted": 0, "expired": 0, "dropped": 0}
 
     print(f"--- {title} ---")
-    env.reset()
 
     # 外側ループ：時間を進行
     for step in range(config.SIMULATION_STEPS):
@@ -0,0 +1,179 @@
+import json
+import os
+
+import numpy as np
+
+# 遷移（状態, 行動, 報酬, 次の状態）を1行とする表。状態は状態の表の行番号で指す
+# （ある遷移の次の状態は，続く遷移の状態と同じ行を共有する）
+_TRANSITION_DTYPE = np.dtype([("state", np.int64), ("action", np.int64),
+                              ("reward", np.float32), ("next_state", np.int64)])
+_META_FILE = "meta.json"
+_VALUES_FILE = "state_values.f32"
+_OFFSETS_FILE = "state_offsets.i64"
+_TRANSITIONS_FILE = "transitions.bin"
+# 書き込む前にメモリに溜めておく量の目安 [バイト]
+_FLUSH_BYTES = 16 * 1024 * 1024
+
+
+""" ヒューリスティック戦略などの行動を記録した遷移を，ファイルに追記していく """
+class OfflineDatasetWriter:
+    # 状態は末尾の0（空きのバッファ）を削って，可変長で詰めて保存する
+    def __init__(self, path, state_size, **metadata):
+        os.makedirs(path, exist_ok=True)
+        # meta.jsonは書き終えた印なので，作り直す間は消しておく（途中で止まったデータセットを開かないように）
+        meta_path = os.path.join(path, _META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        self.path = path
+        self.state_size = state_size
+        self.metadata = metadata
+        self.num_states = 0
+        self.num_transitions = 0
+        self.num_values = 0
+        self._values = open(os.path.join(path, _VALUES_FILE), "wb")
+        self._offsets = open(os.path.join(path, _OFFSETS_FILE), "wb")
+        self._transitions = open(os.path.join(path, _TRANSITIONS_FILE), "wb")
+        # 行番号rowの状態の値は，state_values[offsets[row]:offsets[row + 1]]
+        np.zeros(1, dtype=np.int64).tofile(self._offsets)
+        self._pending_values = []
+        self._pending_offsets = []
+        self._pending_transitions = []
+        self._pending_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # 例外（Ctrl+Cを含む）で抜けたときはファイルを閉じるだけで，meta.jsonは書かない
+        self.close(complete=exc_type is None)
+
+    """ 状態を1つ保存し，その行番号を返す """
+    def add_state(self, state):
+        state = np.asarray(state, dtype=np.float32)
+        nonzero = np.flatnonzero(state)
+        values = state[:nonzero[-1] + 1] if len(nonzero) else state[:0]
+        self._pending_values.append(values.copy())
+        self.num_values += len(values)
+        self._pending_offsets.append(self.num_values)
+        self._pending_bytes += values.nbytes
+        self.num_states += 1
+        if self._pending_bytes >= _FLUSH_BYTES:
+            self.flush()
+        return self.num_states - 1
+
+    """ add_state()の行番号で指した遷移を1つ保存 """
+    def add_transition(self, state_row, action, reward, next_state_row):
+        self._pending_transitions.append((state_row, action, reward, next_state_row))
+        self.num_transitions += 1
+
+    """ 溜めている状態と遷移をファイルに書き出す """
+    def flush(self):
+        if self._pending_values:
+            np.concatenate(self._pending_values).tofile(self._values)
+        np.array(self._pending_offsets, dtype=np.int64).tofile(self._offsets)
+        np.array(self._pending_transitions, dtype=_TRANSITION_DTYPE).tofile(self._transitions)
+        self._pending_values, self._pending_offsets, self._pending_transitions = [], [], []
+        self._pending_bytes = 0
+
+    """ 書き出して，大きさなどの情報をmeta.jsonに保存（meta.jsonは最後に一度に置くので，あれば書き終えている） """
+    def close(self, complete=True):
+        self.flush()
+        for f in (self._values, self._offsets, self._transitions):
+            f.close()
+        if not complete:
+            return
+        meta = dict(self.metadata, state_size=self.state_size, num_states=self.num_states,
+                    num_transitions=self.num_transitions, num_values=self.num_values)
+        meta_path = os.path.join(self.path, _META_FILE)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(meta_path + ".tmp", meta_path)
+
+
+""" OfflineDatasetWriterで作ったデータセットを，メモリに読み込まずに（memmapで）開く """
+class OfflineDataset:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, _META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.state_size = self.meta["state_size"]
+        self.values = self._open(_VALUES_FILE, np.float32, self.meta["num_values"])
+        self.offsets = self._open(_OFFSETS_FILE, np.int64, self.meta["num_states"] + 1)
+        self.transitions = self._open(_TRANSITIONS_FILE, _TRANSITION_DTYPE, self.meta["num_transitions"])
+
+    # 空のファイルはmemmapで開けないので，空の配列にする
+    def _open(self, name, dtype, length):
+        if length == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode="r", shape=(length,))
+
+    def __len__(self):
+        return len(self.transitions)
+
+    """ 行番号rowsの状態を，元の長さ（末尾の0を戻した形）の配列にまとめて返す """
+    def states(self, rows):
+        out = np.zeros((len(rows), self.state_size), dtype=np.float32)
+        for i, row in enumerate(rows):
+            start, end = self.offsets[row], self.offsets[row + 1]
+            out[i, :end - start] = self.values[start:end]
+        return out
+
+    """ 番号indicesの遷移を，(状態, 行動, 報酬, 次の状態) の配列で返す """
+    def batch(self, indices):
+        # ファイルの前から順に読めるよう，番号を並べ替えてから取り出す
+        rows = self.transitions[np.sort(indices)]
+        return (self.states(rows["state"]), rows["action"].astype(np.int64),
+                rows["reward"].astype(np.float32), self.states(rows["next_state"]))
+
+    """ batch_size個の遷移を無作為に選んで返す（rngはnp.random.Generator） """
+    def sample(self, batch_size, rng):
+        return self.batch(rng.integers(0, len(self), size=batch_size))
+
+
+""" pathに書き終えたデータセット（meta.jsonのあるもの）があるか """
+def dataset_complete(path):
+    return os.path.exists(os.path.join(path, _META_FILE))
+
+
+""" pathに書き終えたデータセットが無ければ（途中で止まったものも含めて）build(path)で作り直す """
+def ensure_dataset(path, build):
+    if not dataset_complete(path):
+        build(path)
+    return path
+
+
+"""
+sources（(環境, 行動を選ぶ関数, 詰め込む順の優先度またはNone) のリスト）をそれぞれnum_stepsステップ動かし，
+その遷移をpathのデータセットに書き出して遷移の数を返す（到着系列のシードはseed, seed+1, ...，省略時はランダム）
+"""
+def write_dataset(path, state_size, sources, num_steps, seed=None, **metadata):
+    with OfflineDatasetWriter(path, state_size, steps_per_strategy=num_steps, **metadata) as writer:
+        for i, (env, policy, priority) in enumerate(sources):
+            collect_transitions(env, policy, num_steps, writer, seed=None if seed is None else seed + i,
+                                priority=priority)
+    return writer.num_transitions
+
+
+""" policy(env)が選ぶ行動で環境をnum_steps（シミュレーションのステップ数）だけ動かし，遷移をwriterに書き込む """
+def collect_transitions(env, policy, num_steps, writer, seed=None, priority=None):
+    # 環境はGymnasiumと同じ形式（reset()とstep()）で，最後まで進んだら打ち切りフラグを返すもの
+    # priorityを渡すと，step()で残り帯域幅に詰め込む順の優先度（戦略のpacket_priorities()）として使う
+    step_options = {} if priority is None else {"priority": priority}
+    steps_before = 0
+    state, _ = env.reset(seed=seed)
+    state_row = writer.add_state(state)
+    while True:
+        action = policy(env)
+        next_state, reward, terminated, truncated, _ = env.step(action, **step_options)
+        next_state_row = writer.add_state(next_state)
+        writer.add_transition(state_row, action, reward, next_state_row)
+        state_row = next_state_row
+
+        steps_run = steps_before + env.current_step + 1
+        if steps_run >= num_steps:
+            return
+        if terminated or truncated:
+            # 環境の最後まで進んだら，リセットして続ける
+            steps_before = steps_run
+            state, _ = env.reset()
+            state_row = writer.add_state(state)
@@ -0,0 +1,171 @@
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import sqlite3
+import time
+
+# 1回の実行（1つの設定・戦略・シードでのシミュレーション）を1行として保存する表
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,      -- 記録した時刻 (UNIX時間)
+    source TEXT NOT NULL,          -- 記録した処理 (run_experiment, evaluate_agent, hparam_search など)
+    experiment TEXT,               -- 設定の表示名 (config.NAME)
+    config_hash TEXT NOT NULL,     -- 設定の全項目から計算したハッシュ
+    strategy TEXT NOT NULL,        -- 戦略の表示名
+    seed INTEGER,                  -- 乱数シード (指定なしならNULL)
+    steps INTEGER,                 -- シミュレーションしたステップ数
+    generated INTEGER,
+    transmitted INTEGER,
+    expired INTEGER,
+    dropped INTEGER,
+    success_rate REAL,             -- 転送成功率 (%)
+    elapsed REAL,                  -- 実行時間 (秒)
+    series TEXT,                   -- 時系列データ（トレース・学習曲線など）のファイルの場所
+    extra TEXT                     -- その他の値 (JSON)
+);
+CREATE INDEX IF NOT EXISTS runs_config_strategy ON runs (config_hash, strategy);
+CREATE INDEX IF NOT EXISTS runs_experiment_strategy ON runs (experiment, strategy);
+CREATE INDEX IF NOT EXISTS runs_created_at ON runs (created_at);
+"""
+_COLUMNS = ("created_at", "source", "experiment", "config_hash", "strategy", "seed", "steps",
+            "generated", "transmitted", "expired", "dropped", "success_rate", "elapsed", "series", "extra")
+# 絞り込み・集計に使える列
+_KEY_COLUMNS = ("source", "experiment", "config_hash", "strategy", "seed", "steps")
+
+
+""" 結果キャッシュ（0926new/utils/result_cache.py）の設定の指紋の関数を読み込む """
+def _load_config_fingerprint():
+    # 0926newをsys.pathに加えると，直下のstrategies.pyなどと名前が重なるので，ファイルから直接読み込む
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "0926new", "utils", "result_cache.py")
+    spec = importlib.util.spec_from_file_location("_result_cache", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.config_fingerprint
+
+
+# 設定の全項目の指紋．キャッシュのキーと同じ関数を使い，同じ設定がキャッシュと記録で同じ識別子になるようにする
+config_fingerprint = _load_config_fingerprint()
+
+
+""" 設定の指紋（config_fingerprint）から，設定を識別するハッシュを計算 """
+def config_hash(config):
+    encoded = json.dumps(config_fingerprint(config), sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+""" 実験結果を記録・検索する，ローカルのSQLiteファイル """
+class ResultsStore:
+    # 並列に動くワーカーはそれぞれResultsStoreを開いて書き込む（WALモードなので読み書きが互いを待たない）
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=timeout)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    """ 1回の実行の結果を表の1行の値にする（statsは転送数などの総数の辞書） """
+    @staticmethod
+    def make_row(source, config, strategy, stats, seed=None, elapsed=None, series=None, **extra):
+        generated = stats.get("generated", 0)
+        transmitted = stats.get("transmitted", 0)
+        return {
+            "created_at": time.time(),
+            "source": source,
+            "experiment": getattr(config, "NAME", None),
+            "config_hash": config_hash(config),
+            "strategy": strategy,
+            "seed": seed,
+            "steps": getattr(config, "SIMULATION_STEPS", None),
+            "generated": generated,
+            "transmitted": transmitted,
+            "expired": stats.get("expired"),
+            "dropped": stats.get("dropped"),
+            "success_rate": transmitted / generated * 100 if generated else 0.0,
+            "elapsed": elapsed,
+            "series": series,
+            "extra": json.dumps(extra, ensure_ascii=False, default=repr) if extra else None,
+        }
+
+    """ 1回の実行の結果を記録 """
+    def add(self, source, config, strategy, stats, seed=None, elapsed=None, series=None, **extra):
+        self.add_many([self.make_row(source, config, strategy, stats, seed, elapsed, series, **extra)])
+
+    """ make_row()で作った複数の行を，1回のトランザクションでまとめて記録 """
+    def add_many(self, rows):
+        placeholders = ", ".join("?" for _ in _COLUMNS)
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT INTO runs ({', '.join(_COLUMNS)}) VALUES ({placeholders})",
+                [tuple(row.get(column) for column in _COLUMNS) for row in rows])
+
+    """ 条件（列名=値，sinceは記録時刻の下限）に合う実行を，新しい順に辞書のリストで返す """
+    def runs(self, since=None, limit=None, **filters):
+        where, params = self._where(since, filters)
+        sql = f"SELECT * FROM runs{where} ORDER BY created_at DESC"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self.connection.execute(sql, params)]
+
+    """ 条件に合う実行を列byごとにまとめ，回数と成功率・実行時間の平均などを返す """
+    def summary(self, by=("experiment", "strategy"), since=None, **filters):
+        for column in by:
+            if column not in _KEY_COLUMNS:
+                raise ValueError(f"集計に使えない列: {column}")
+        where, params = self._where(since, filters)
+        keys = ", ".join(by)
+        sql = (f"SELECT {keys}, COUNT(*) AS runs, AVG(success_rate) AS mean_success_rate, "
+               f"MIN(success_rate) AS min_success_rate, MAX(success_rate) AS max_success_rate, "
+               f"SUM(transmitted) AS transmitted, SUM(generated) AS generated, AVG(elapsed) AS mean_elapsed "
+               f"FROM runs{where} GROUP BY {keys} ORDER BY {keys}")
+        return [dict(row) for row in self.connection.execute(sql, params)]
+
+    # 絞り込みのWHERE句と，そのパラメータ
+    @staticmethod
+    def _where(since, filters):
+        clauses, params = [], []
+        for column, value in filters.items():
+            if column not in _KEY_COLUMNS:
+                raise ValueError(f"絞り込みに使えない列: {column}")
+            if value is None:
+                clauses.append(f"{column} IS NULL")
+            else:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+if __name__ == "__main__":
+    # 例: python results_store.py results.sqlite --by strategy --experiment "DQN Training Config"
+    parser = argparse.ArgumentParser(description="記録した実験結果の集計")
+    parser.add_argument("path", help="結果を記録したSQLiteファイル")
+    parser.add_argument("--by", nargs="+", default=["experiment", "strategy"], choices=_KEY_COLUMNS,
+                        help="まとめる列")
+    parser.add_argument("--experiment", default=None, help="設定の表示名で絞り込む")
+    parser.add_argument("--strategy", default=None, help="戦略の表示名で絞り込む")
+    parser.add_argument("--days", type=float, default=None, help="直近の日数で絞り込む")
+    args = parser.parse_args()
+
+    filters = {name: value for name, value in (("experiment", args.experiment), ("strategy", args.strategy))
+               if value is not None}
+    since = time.time() - args.days * 86400 if args.days is not None else None
+    with ResultsStore(args.path) as store:
+        for row in store.summary(by=args.by, since=since, **filters):
+            keys = " / ".join(str(row[column]) for column in args.by)
+            print(f"{keys:<50}: {row['mean_success_rate']:>6.2f}% "
+                  f"(最小 {row['min_success_rate']:.2f}%, 最大 {row['max_success_rate']:.2f}%, {row['runs']}回)")
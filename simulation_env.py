@@ -4,6 +4,8 @@ from collections import deque
 import numpy as np
 import math
 
+from strategies import FifoStrategy, ShortestTtlFirstStrategy
+
 class DataPacket:
     def __init__(self, packet_id, size, ttl):
         self.id = packet_id
@@ -22,6 +24,9 @@ class DataPacket:
 
 """ ノードの環境クラス """
 class Node:
+    # macroモードで選べる転送戦略（行動の番号はこの並び順）
+    MACRO_RULES = (FifoStrategy, ShortestTtlFirstStrategy)
+
     """ オブジェクトの初期設定 """
     def __init__(self, config):
         self.config = config
@@ -30,7 +35,15 @@ class Node:
         # 新規パケットにIDを割り振るためのカウンタを初期化
         self.packet_id_counter = 0
         # 帯域幅の中心
-        self.remaining_bandwidth = self.config.BANDWIDTH_CENTER
+        self.bandwidth = self.config.BANDWIDTH_CENTER
+        self.remaining_bandwidth = self.bandwidth
+        # 現在のシミュレーションステップ
+        self.current_step = 0
+        # step()で受け付ける行動の種類．
+        # "packet"：行動 = 転送するパケットの位置．帯域幅が残っている間は同じステップ内で次の行動を待つ．
+        # "macro"：行動 = MACRO_RULESの番号．選んだ戦略でそのステップの転送をまとめて行う．
+        self.action_mode = getattr(config, "ACTION_MODE", "packet")
+        self.num_actions = len(self.MACRO_RULES) if self.action_mode == "macro" else config.BUFFER_PACKET_LIMIT
 
     """ 現在のバッファの状態をNNが理解できる固定長の数値リストに変換 """
     def _get_state(self):
@@ -48,21 +61,30 @@ class Node:
         # 2次元配列を1次元配列に変換
         return state.flatten()
 
-    """ シミュレーション環境を初期化 """
-    def reset(self):
+    """ シミュレーション環境を初期化し，最初に行動を選ぶ時点まで時間を進める（Gymnasiumと同じ形式） """
+    def reset(self, seed=None, options=None):
+        # シードが指定されたら乱数を初期化
+        if seed is not None:
+            random.seed(seed)
         # ノードのバッファリストを初期化
         self.buffer.clear()
         # パケットのIDカウンタを初期化
         self.packet_id_counter = 0
+        self.current_step = 0
         # 帯域幅の中心
         self.remaining_bandwidth = self.config.BANDWIDTH_CENTER
+        # ステップ0の到着を処理し，帯域幅とパケットがそろうステップまで進める
+        _, info = self.update_time(current_step=0)
+        info["transmitted"] = 0
+        self._advance_to_decision(info)
         # バッファリストをNNが読み込める数値リストに変換
-        return self._get_state()
+        return self._get_state(), info
 
     """ エージェントから行動を受け取り，時間が1ステップ進んだ時の環境の変化を計算 """
     def update_time(self, current_step):
         # # 生存ペナルティとして，行動するたびに報酬を減少．
         # reward = -1
+        self.current_step = current_step
         # 各カウンタを初期化
         generated_count = 0
         # transmitted_count = 0
@@ -76,8 +98,9 @@ class Node:
         period = self.config.BANDWIDTH_PERIOD
         # サイン波の計算 (-1.0 ~ 1.0 の値を生成)
         oscillation = math.sin(2 * math.pi * current_step / period)
-        # 最終的な帯域幅を計算
-        self.remaining_bandwidth = int(center + amplitude * oscillation)
+        # 最終的な帯域幅（このステップのリンク容量）を計算
+        self.bandwidth = int(center + amplitude * oscillation)
+        self.remaining_bandwidth = self.bandwidth
 
         # 2. 新規パケットの到来．
         # 0~最大数の間でランダムに決定．
@@ -136,6 +159,62 @@ class Node:
             "generated": generated_count, "expired": expired_count, "dropped": dropped_count
         }
         return expired_reward, stats
+
+    """ エージェントが選んだパケット（バッファ内の位置action）を転送 """
+    def transmit_packet(self, action):
+        # 存在しないパケットを選んだ場合は罰則
+        if action is None or not (0 <= action < len(self.buffer)):
+            return -20, 0, False # 罰則, 転送数, 成功フラグ
+        packet_to_send = self.buffer[action]
+        # 残りの帯域幅に収まれば転送
+        if packet_to_send.size <= self.remaining_bandwidth:
+            self.remaining_bandwidth -= packet_to_send.size
+            del self.buffer[action]
+            return 10, 1, True # 報酬, 転送数, 成功フラグ
+        # 帯域幅よりも大きいパケットを送ろうとした場合は罰則
+        return -5, 0, False
+
+    """ 行動を1つ受け取り，転送と時間の経過をまとめて処理（Gymnasiumと同じ形式） """
+    def step(self, action):
+        reward = 0
+        transmitted = 0
+        if self.action_mode == "macro":
+            # 選んだ戦略で，帯域幅が尽きるまでまとめて転送
+            strategy = self.MACRO_RULES[action]()
+            while self.remaining_bandwidth > 0 and self.buffer:
+                packet_to_send = strategy.select_packet(self.buffer)
+                step_reward, count, success = self.transmit_packet(self.buffer.index(packet_to_send))
+                reward += step_reward
+                transmitted += count
+                if not success:
+                    break
+            step_done = True
+        else:
+            reward, transmitted, success = self.transmit_packet(action)
+            # 失敗したか，もう送れるものがなければ次のステップへ
+            step_done = not success or self.remaining_bandwidth <= 0 or not self.buffer
+
+        info = {"transmitted": transmitted, "generated": 0, "expired": 0, "dropped": 0}
+        truncated = False
+        if step_done:
+            time_reward, truncated = self._advance_to_decision(info, force=True)
+            reward += time_reward
+        # 次の状態, 報酬, 終了フラグ（この環境では終了しない）, 打ち切りフラグ, 統計情報
+        return self._get_state(), reward, False, truncated, info
+
+    """ 行動を選ぶ必要のあるステップまで時間を進め，統計をinfoに加算 """
+    def _advance_to_decision(self, info, force=False):
+        reward = 0
+        while force or self.remaining_bandwidth <= 0 or not self.buffer:
+            force = False
+            # 設定したステップ数に達したら打ち切り
+            if self.current_step + 1 >= self.config.SIMULATION_STEPS:
+                return reward, True
+            time_reward, time_stats = self.update_time(current_step=self.current_step + 1)
+            reward += time_reward
+            for key in time_stats:
+                info[key] += time_stats[key]
+        return reward, False
     
     
 
@@ -0,0 +1,197 @@
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+# WebSocketの接続確立で、クライアントの鍵に連結する決まった文字列（RFC 6455）
+_WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+""" シミュレーションのループ（書き手1つ）とサーバーのスレッド（読み手）で共有する、固定長の記録 """
+class RingBuffer:
+    # 書き手はロックを取らず、空き枠に書いてから件数を進めるだけなので、ループを遅くしない
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        # これまでに書いた記録の数（次の記録の通し番号）
+        self.count = 0
+
+    # 記録を1件追加．満杯なら最も古い記録を上書き．
+    def append(self, record):
+        seq = self.count
+        self._slots[seq % self.capacity] = (seq, record)
+        self.count = seq + 1
+
+    # 通し番号start以降の記録を (次に読む通し番号, 記録のリスト) で返す．
+    # 読んでいる間に上書きされた枠は通し番号が合わないので飛ばす．
+    def since(self, start):
+        end = self.count
+        start = max(start, end - self.capacity, 0)
+        records = []
+        for seq in range(start, end):
+            slot = self._slots[seq % self.capacity]
+            if slot is not None and slot[0] == seq:
+                records.append(slot[1])
+        return end, records
+
+    # 最新の記録（まだ無ければNone）
+    def latest(self):
+        _, records = self.since(self.count - 1)
+        return records[-1] if records else None
+
+
+""" 学習・実験の進み具合を、ローカルのHTTP/WebSocketで配信するサーバー """
+class TelemetryServer:
+    # GET /latest         ：最新の記録（JSON）
+    # GET /history?since=N：通し番号N以降の記録（JSON，{"next": 次の通し番号, "records": [...]}）
+    # GET /ws             ：WebSocket．新しい記録をinterval秒ごとにJSONのテキストで送り続ける
+    # サーバーは別スレッドのasyncioのイベントループで動き，シミュレーションはpublish()で記録を置くだけ．
+    def __init__(self, port, host="127.0.0.1", capacity=4096, interval=0.5):
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.ring = RingBuffer(capacity)
+        self._loop = None
+        self._server = None
+        self._thread = None
+        # steps_per_secの計算用に，前回記録したときの（時刻, ステップ）
+        self._last_rate_point = None
+
+    """ サーバーのスレッドを起動し，待ち受けを始めるまで待つ """
+    def start(self):
+        started = threading.Event()
+        errors = []
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._server = self._loop.run_until_complete(
+                    asyncio.start_server(self._handle, self.host, self.port))
+            except OSError as e:
+                errors.append(e)
+                started.set()
+                return
+            # port=0なら空いているポートが割り当てられる
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            # close()が_shutdown()でサーバーと接続ごとの処理を片付けてから止める
+            self._loop.run_forever()
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="telemetry", daemon=True)
+        self._thread.start()
+        started.wait()
+        if errors:
+            raise errors[0]
+        print(f"テレメトリ: http://{self.host}:{self.port}/latest , ws://{self.host}:{self.port}/ws")
+        return self
+
+    """ サーバーを止める（接続中のWebSocketがあれば，その処理を取り消してから止める） """
+    def close(self):
+        if self._loop is not None and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(lambda: self._loop.create_task(self._shutdown()))
+            self._thread.join()
+
+    """ 記録を1件置く（値はJSONにできるものに限る）．stepを渡すと，前回からのsteps_per_secも加える． """
+    def publish(self, **values):
+        now = time.time()
+        values["time"] = now
+        step = values.get("step")
+        if step is not None:
+            if self._last_rate_point is not None and now > self._last_rate_point[0]:
+                last_time, last_step = self._last_rate_point
+                values["steps_per_sec"] = (step - last_step) / (now - last_time)
+            self._last_rate_point = (now, step)
+        self.ring.append(values)
+
+    # --- ここから下はサーバーのスレッドで動く ---
+    async def _shutdown(self):
+        # 新しい接続を受け付けないようにし，残っている処理を取り消して終わるのを待ってからループを止める
+        self._server.close()
+        tasks = [task for task in asyncio.all_tasks(self._loop) if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._server.wait_closed()
+        self._loop.stop()
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) < 2 or request_line[0] != "GET":
+                await self._respond(writer, 405, {"error": "GETのみ対応"})
+                return
+
+            url = urlsplit(request_line[1])
+            if url.path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                await self._stream(reader, writer, headers)
+            elif url.path == "/latest":
+                await self._respond(writer, 200, self.ring.latest())
+            elif url.path == "/history":
+                since = int(parse_qs(url.query).get("since", ["0"])[0])
+                next_seq, records = self.ring.since(since)
+                await self._respond(writer, 200, {"next": next_seq, "records": records})
+            else:
+                await self._respond(writer, 404, {"endpoints": ["/latest", "/history?since=N", "/ws"]})
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # close()で取り消された．取り消されたまま終わると，接続の後始末でエラーが表示されるので普通に終える
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        reason = {200: "OK", 404: "Not Found", 405: "Method Not Allowed"}[status]
+        writer.write(f"HTTP/1.1 {status} {reason}\r\n"
+                     "Content-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     "Access-Control-Allow-Origin: *\r\n"
+                     "Connection: close\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+
+    async def _stream(self, reader, writer, headers):
+        # 接続を確立し，その後はサーバーから記録を送るだけ（クライアントからの受信は切断の検知にだけ使う）
+        accept = base64.b64encode(
+            hashlib.sha1((headers["sec-websocket-key"] + _WEBSOCKET_GUID).encode("latin-1")).digest())
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\n"
+                     b"Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        await writer.drain()
+
+        closed = asyncio.ensure_future(reader.read())
+        next_seq = self.ring.count
+        try:
+            while not closed.done():
+                next_seq, records = self.ring.since(next_seq)
+                if records:
+                    writer.write(_websocket_text_frame(json.dumps(records, ensure_ascii=False)))
+                    await writer.drain()
+                await asyncio.wait([closed], timeout=self.interval)
+        finally:
+            closed.cancel()
+
+
+# サーバーからクライアントへ送るWebSocketのテキストフレーム（マスクなし）
+def _websocket_text_frame(text):
+    payload = text.encode("utf-8")
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x81, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x81, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x81, 127, length)
+    return header + payload
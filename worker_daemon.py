@@ -0,0 +1,351 @@
+import argparse
+import importlib
+import json
+import os
+import signal
+import socket
+import sys
+import time
+
+# 実験スクリプト（main0926.py・DQN_train.pyなど）を，重いモジュールを読み込み済みの常駐プロセスで実行する．
+#   python worker_daemon.py serve                           : 常駐プロセスを起動（Ctrl-Cかstopで終了）
+#   python worker_daemon.py run 0926new/main0926.py --steps 1000 : スクリプトを常駐プロセスで実行
+#   python worker_daemon.py stop                            : 常駐プロセスを終了
+# 常駐プロセスはtorch・matplotlibなどを読み込んでから，接続を待ち受けるワーカーを前もってfork()しておく．
+# ワーカーはジョブごとにさらにfork()した子プロセスでスクリプトを実行するので，
+# ジョブが設定や乱数・モジュールの状態を書き換えても，次のジョブには残らない．
+# クライアントは標準入出力のファイル記述子をUnixソケットで渡すので，ジョブの出力はそのまま手元の端末に出る．
+# （クライアント側は標準ライブラリだけを読み込むので，起動は数十ミリ秒で済む）
+
+# 常駐プロセスで前もって読み込むモジュール（無いものは飛ばす）
+DEFAULT_PRELOAD = ("numpy", "torch", "matplotlib.pyplot")
+# ソケットの場所の既定値（環境変数SIM_WORKER_SOCKETで変えられる）
+DEFAULT_SOCKET_PATH = os.environ.get("SIM_WORKER_SOCKET", f"/tmp/sim-worker-{os.getuid()}.sock")
+
+
+""" 1行のJSONを送る """
+def _send_message(conn, message, fds=()):
+    data = (json.dumps(message) + "\n").encode()
+    if fds:
+        socket.send_fds(conn, [data], list(fds))
+    else:
+        conn.sendall(data)
+
+
+""" 1行のJSONを受け取る（ファイル記述子が付いていれば一緒に返す）．接続が閉じられたら (None, []) """
+def _recv_message(conn, max_fds=0):
+    chunks, fds = [], []
+    while True:
+        if max_fds and not fds:
+            data, fds, _, _ = socket.recv_fds(conn, 65536, max_fds)
+        else:
+            data = conn.recv(65536)
+        if not data:
+            return None, fds
+        chunks.append(data)
+        if data.endswith(b"\n"):
+            return json.loads(b"".join(chunks)), fds
+
+
+""" 標準入出力のファイル記述子を受け取った記述子に差し替え，Pythonのsys.stdin/stdout/stderrも作り直す """
+def _attach_stdio(fds):
+    for target, fd in enumerate(fds[:3]):
+        os.dup2(fd, target)
+        os.close(fd)
+    # 新しく起動したPythonと同じく，端末なら行ごとに，ファイルやパイプならまとめて書き出す
+    sys.stdin = open(0, "r", closefd=False)
+    sys.stdout = open(1, "w", buffering=1 if os.isatty(1) else -1, closefd=False)
+    sys.stderr = open(2, "w", buffering=1, errors="backslashreplace", closefd=False)
+
+
+""" fork()した子プロセスの乱数を初期化し直す（親の状態を引き継ぐと，全てのジョブが同じ乱数列になる） """
+def _reseed():
+    import random
+    random.seed()
+    if "numpy" in sys.modules:
+        sys.modules["numpy"].random.seed()
+    if "torch" in sys.modules:
+        sys.modules["torch"].seed()
+
+
+""" ジョブの子プロセスでスクリプトを__main__として実行し，終了コードで終わる（戻らない） """
+def _run_job(request, fds):
+    import runpy
+    import traceback
+    code = 1
+    try:
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        _attach_stdio(fds)
+        _reseed()
+        os.chdir(request["cwd"])
+        if "env" in request:
+            os.environ.clear()
+            os.environ.update(request["env"])
+        script = os.path.abspath(request["script"])
+        # python script.py と同じく，スクリプトのフォルダを最初に探す
+        sys.path.insert(0, os.path.dirname(script))
+        sys.argv = [script] + list(request.get("argv", []))
+        try:
+            runpy.run_path(script, run_name="__main__")
+            code = 0
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            if not isinstance(e.code, (int, type(None))):
+                print(e.code, file=sys.stderr)
+        except KeyboardInterrupt:
+            code = 128 + signal.SIGINT
+        except BaseException as e:
+            # python script.py と同じく，スクリプトより外（runpy・このファイル）の呼び出しは表示しない
+            tb = e.__traceback__
+            while tb is not None and tb.tb_frame.f_code.co_filename != script:
+                tb = tb.tb_next
+            traceback.print_exception(type(e), e, tb or e.__traceback__)
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+""" ワーカーのSIGTERM：SystemExitで抜けて，実行中のジョブを止めてから終わる """
+def _exit_on_signal(signum, frame):
+    sys.exit(0)
+
+
+""" 接続を待ち受け，ジョブを子プロセスで実行する常駐プロセス """
+class WorkerDaemon:
+    # 親プロセスはワーカーの監視だけを行い，ワーカーが落ちたら作り直す．
+    # torchの演算（スレッドプールの起動）は親・ワーカーでは行わない（fork()した後の子が止まることがある）．
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, num_workers=2, preload=DEFAULT_PRELOAD):
+        self.socket_path = socket_path
+        self.num_workers = num_workers
+        self.preload = preload
+        self.listener = None
+        self.workers = set()
+        self._stopping = False
+
+    """ モジュールを読み込み，ソケットを開いてワーカーを起動し，終了するまで監視する """
+    def serve(self):
+        self._preload_modules()
+        self._listen()
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        print(f"ワーカー{self.num_workers}個で待ち受け中: {self.socket_path}", flush=True)
+        try:
+            while not self._stopping:
+                while len(self.workers) < self.num_workers:
+                    self._spawn_worker()
+                try:
+                    pid, _ = os.wait()
+                except ChildProcessError:
+                    continue
+                except InterruptedError:
+                    continue
+                self.workers.discard(pid)
+        finally:
+            self.close()
+
+    def _request_stop(self, signum, frame):
+        self._stopping = True
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    """ ワーカーを止めてソケットを消す """
+    def close(self):
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.workers.clear()
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+    def _preload_modules(self):
+        # 描画は画面を使わずファイルに書くので，読み込む前にバックエンドを決めておく
+        os.environ.setdefault("MPLBACKEND", "Agg")
+        for name in self.preload:
+            start = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                print(f"読み込めないモジュールを飛ばします: {name} ({e})", flush=True)
+                continue
+            print(f"読み込み済み: {name} ({time.perf_counter() - start:.2f}秒)", flush=True)
+
+    def _listen(self):
+        # 前回の常駐プロセスが残したソケットファイルは，つながらなければ消して作り直す
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.socket_path)
+            else:
+                raise RuntimeError(f"既に常駐プロセスが動いています: {self.socket_path}")
+            finally:
+                probe.close()
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)  # 他のユーザーからジョブを投げられないようにする
+        self.listener.listen(64)
+
+    def _spawn_worker(self):
+        pid = os.fork()
+        if pid:
+            self.workers.add(pid)
+            return
+        code = 0
+        try:
+            # Ctrl-Cは親だけが受け，ワーカーは親からのSIGTERMで（実行中のジョブも止めてから）終わる
+            signal.signal(signal.SIGTERM, _exit_on_signal)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            self._worker_loop()
+        except SystemExit:
+            pass
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+
+    """ ワーカー：接続を1つずつ受け付けて処理する（どのワーカーが受けるかはOSが決める） """
+    def _worker_loop(self):
+        while True:
+            conn, _ = self.listener.accept()
+            with conn:
+                request, fds = _recv_message(conn, max_fds=3)
+                if request is None:
+                    for fd in fds:
+                        os.close(fd)
+                    continue
+                if request.get("command") == "stop":
+                    _send_message(conn, {"exit": 0})
+                    os.kill(os.getppid(), signal.SIGTERM)
+                    continue
+                self._handle_job(conn, request, fds)
+
+    """ ジョブの子プロセスを作り，終わるまで待って終了コードを返す（途中でクライアントが切れたら止める） """
+    def _handle_job(self, conn, request, fds):
+        import select
+        pid = os.fork()
+        if pid == 0:
+            conn.close()
+            self.listener.close()
+            _run_job(request, fds)
+        for fd in fds:
+            os.close(fd)
+
+        start = time.perf_counter()
+        status = None
+        try:
+            while status is None:
+                readable, _, _ = select.select([conn], [], [], 0.05)
+                if readable:
+                    try:
+                        message, _ = _recv_message(conn)
+                    except (OSError, ValueError):
+                        message = None
+                    if message is None:
+                        return  # クライアントが切れたら，ジョブを止める（finally）
+                    if message.get("signal") == "SIGINT":
+                        os.kill(pid, signal.SIGINT)  # クライアントのCtrl-Cをジョブに伝える
+                done, wait_status = os.waitpid(pid, os.WNOHANG)
+                if done:
+                    status = os.waitstatus_to_exitcode(wait_status)
+        finally:
+            if status is None:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+        try:
+            _send_message(conn, {"exit": status if status >= 0 else 128 - status,
+                                 "elapsed": time.perf_counter() - start})
+        except OSError:
+            pass
+
+
+""" 常駐プロセスに接続する（動いていなければNone） """
+def connect(socket_path=DEFAULT_SOCKET_PATH):
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        conn.close()
+        return None
+    return conn
+
+
+""" スクリプトを常駐プロセスで実行し，終了コードを返す（出力は手元の標準出力・標準エラーにそのまま出る）．
+    envを省略すると，ジョブは呼び出し側と同じ環境変数で動く """
+def run_script(script, argv=(), socket_path=DEFAULT_SOCKET_PATH, env=None):
+    conn = connect(socket_path)
+    if conn is None:
+        raise ConnectionError(f"常駐プロセスが動いていません（python worker_daemon.py serve で起動）: {socket_path}")
+    with conn:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        request = {"script": os.path.abspath(script), "argv": list(argv), "cwd": os.getcwd(),
+                   "env": dict(os.environ if env is None else env)}
+        _send_message(conn, request, fds=(0, 1, 2))
+        while True:
+            try:
+                reply, _ = _recv_message(conn)
+            except KeyboardInterrupt:
+                _send_message(conn, {"signal": "SIGINT"})
+                continue
+            if reply is None:
+                return 1  # 常駐プロセスが途中で止まった
+            return reply["exit"]
+
+
+""" 常駐プロセスに終了を頼む """
+def stop(socket_path=DEFAULT_SOCKET_PATH):
+    conn = connect(socket_path)
+    if conn is None:
+        return False
+    with conn:
+        _send_message(conn, {"command": "stop"})
+        _recv_message(conn)
+    return True
+
+
+if __name__ == "__main__":
+    # 例: python worker_daemon.py serve --workers 4 &
+    #     python worker_daemon.py run 0926new/main0926.py --strategies fifo stf --steps 2000
+    parser = argparse.ArgumentParser(description="実験スクリプトを読み込み済みの常駐プロセスで実行する")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Unixソケットの場所")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="常駐プロセスを起動する")
+    serve_parser.add_argument("--workers", type=int, default=2, help="同時に実行できるジョブの数")
+    serve_parser.add_argument("--preload", nargs="*", default=list(DEFAULT_PRELOAD),
+                              help="前もって読み込むモジュール（リポジトリのモジュールは名前が重なるので指定しない）")
+    run_parser = commands.add_parser("run", help="スクリプトを常駐プロセスで実行する")
+    run_parser.add_argument("script", help="実行するスクリプト")
+    run_parser.add_argument("args", nargs=argparse.REMAINDER, help="スクリプトに渡す引数")
+    commands.add_parser("stop", help="常駐プロセスを終了する")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        WorkerDaemon(args.socket, args.workers, args.preload).serve()
+    elif args.command == "run":
+        try:
+            sys.exit(run_script(args.script, args.args, args.socket))
+        except ConnectionError as e:
+            print(e, file=sys.stderr)
+            sys.exit(2)
+    elif args.command == "stop":
+        if not stop(args.socket):
+            print(f"常駐プロセスが動いていません: {args.socket}", file=sys.stderr)
+            sys.exit(2)